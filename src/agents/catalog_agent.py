@@ -1,19 +1,25 @@
 # src/agents/catalog_agent.py
 
-from agents.tools.search_catalog import search_products, get_product_by_id
-from config import llm, PROMPTS_DIR
+from agents.tools.search_catalog import search_products, get_product_by_id, get_multiple_products
+from config import get_llm, PROMPTS_DIR
 
-from langchain.agents import create_agent
-from pathlib import Path
+from functools import cache
 
 ## Prompt
 PROMPT_PATH = PROMPTS_DIR / "catalog_agent.md"
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    prompt = f.read()
 
-## Init Agent
-catalog_agent = create_agent(
-    model=llm,
-    tools=[search_products, get_product_by_id],
-    system_prompt=prompt
-)
\ No newline at end of file
+## Init Agent (built on first use)
+@cache
+def get_catalog_agent():
+    """Return the catalog agent, building it on first call"""
+    from langchain.agents import create_agent
+
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        prompt = f.read()
+
+    return create_agent(
+        name="catalog_agent",
+        model=get_llm(),
+        tools=[search_products, get_product_by_id, get_multiple_products],
+        system_prompt=prompt
+    )
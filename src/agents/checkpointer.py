@@ -0,0 +1,308 @@
+# src/agents/checkpointer.py
+"""
+Durable checkpointer for the coordinator graph.
+
+Checkpoints are written through to a local SQLite file, so conversations
+survive a restart. Only the threads used most recently are kept in
+memory (an LRU of "hot" threads served by the in-memory saver); a cold
+thread is loaded back from SQLite on its next use. Each thread keeps the
+checkpoints of its last few turns only: when a new turn starts, the turns
+before them are pruned, together with the turns that failed and were
+rolled back, the sub-agent runs (namespaces of their own) of pruned
+turns, their pending writes and any channel values no remaining
+checkpoint refers to.
+
+The coordinator graph has no DeltaChannel, so the latest checkpoint
+alone is enough to rebuild the state and older turns can be dropped.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterator, List
+
+from loguru import logger
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config import CHECKPOINTS_DIR, load_environment
+
+# Default location of the checkpoint database
+CHECKPOINT_DB = CHECKPOINTS_DIR / "checkpoints.sqlite"
+
+# Turns of checkpoints kept per thread (at least 2: a cancelled turn rolls back to the previous one)
+KEEP_TURNS = 3
+
+# Threads kept in memory at once
+MAX_HOT_THREADS = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+"""
+
+
+class SQLiteSaver(InMemorySaver):
+    """Checkpointer persisted to SQLite, with the most recently used threads held in memory"""
+
+    def __init__(
+        self,
+        path: Path = CHECKPOINT_DB,
+        keep_turns: int = KEEP_TURNS,
+        max_hot_threads: int = MAX_HOT_THREADS,
+        serde=None
+    ):
+        super().__init__(serde=serde)
+        if keep_turns < 2:
+            raise ValueError("keep_turns must be at least 2")
+        self.path = Path(path)
+        self.keep_turns = keep_turns
+        self.max_hot_threads = max_hot_threads
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+        self._lock = threading.RLock()
+        self._hot: "OrderedDict[str, None]" = OrderedDict()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # ── Hot threads ────────────────────────────────────────────────────────────
+
+    def _touch(self, thread_id: str):
+        """Make a thread hot: load it from SQLite if needed, evict the coldest if over the limit"""
+        if thread_id in self._hot:
+            self._hot.move_to_end(thread_id)
+            return
+
+        self._load(thread_id)
+        self._hot[thread_id] = None
+        while len(self._hot) > self.max_hot_threads:
+            evicted, _ = self._hot.popitem(last=False)
+            InMemorySaver.delete_thread(self, evicted)  # memory only; SQLite keeps it
+            logger.debug(f"Checkpoint thread {evicted} evicted from memory")
+
+    def spill(self, thread_id: str):
+        """Drop a thread from memory; it stays in SQLite and is reloaded on its next use"""
+        with self._lock:
+            self._hot.pop(thread_id, None)
+            InMemorySaver.delete_thread(self, thread_id)
+
+    def _load(self, thread_id: str):
+        """Read a thread's checkpoints, writes and channel values into memory"""
+        rows = self.conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ?", (thread_id,)
+        )
+        for ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata in rows:
+            self.storage[thread_id][ns][checkpoint_id] = ((type_, checkpoint), (metadata_type, metadata), parent_id)
+
+        rows = self.conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path "
+            "FROM writes WHERE thread_id = ?", (thread_id,)
+        )
+        for ns, checkpoint_id, task_id, idx, channel, type_, value, task_path in rows:
+            self.writes[(thread_id, ns, checkpoint_id)][(task_id, idx)] = (task_id, channel, (type_, value), task_path)
+
+        rows = self.conn.execute(
+            "SELECT checkpoint_ns, channel, version, type, value FROM blobs WHERE thread_id = ?", (thread_id,)
+        )
+        for ns, channel, version, type_, value in rows:
+            self.blobs[(thread_id, ns, channel, version)] = (type_, value)
+
+    def thread_ids(self) -> List[str]:
+        """Every thread stored in SQLite"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT thread_id FROM checkpoints")]
+
+    # ── Reads ──────────────────────────────────────────────────────────────────
+
+    def get_tuple(self, config):
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[Any]:
+        if config is None:
+            # Every stored thread, one at a time so only one more is loaded at once
+            for thread_id in self.thread_ids():
+                if limit is not None and limit <= 0:
+                    return
+                items = list(self.list({"configurable": {"thread_id": thread_id}}, filter=filter, before=before, limit=limit))
+                if limit is not None:
+                    limit -= len(items)
+                yield from items
+            return
+
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def get_delta_channel_history(self, *, config, channels):
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_delta_channel_history(config=config, channels=channels)
+
+    # ── Writes ─────────────────────────────────────────────────────────────────
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+
+            checkpoint_id = next_config["configurable"]["checkpoint_id"]
+            saved, saved_metadata, parent_id = self.storage[thread_id][ns][checkpoint_id]
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint_id, parent_id, *saved, *saved_metadata)
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    [(thread_id, ns, channel, version, *self.blobs[(thread_id, ns, channel, version)])
+                     for channel, version in new_versions.items()]
+                )
+
+            # A new turn starts with an "input" checkpoint in the root namespace: drop the oldest turns
+            if not ns and metadata.get("source") == "input":
+                self._prune(thread_id, checkpoint_id)
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            self._touch(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+
+            stored = self.writes.get((thread_id, ns, checkpoint_id), {})
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(thread_id, ns, checkpoint_id, key_task, idx, channel, *value, path)
+                     for (key_task, idx), (_, channel, value, path) in stored.items() if key_task == task_id]
+                )
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            self._hot.pop(thread_id, None)
+            super().delete_thread(thread_id)
+            with self.conn:
+                for table in ("checkpoints", "writes", "blobs"):
+                    self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # ── Pruning ────────────────────────────────────────────────────────────────
+
+    def _prune(self, thread_id: str, head: str):
+        """
+        Keep the checkpoints of the last `keep_turns` turns leading to `head`,
+        the start of the new turn. Checkpoints off that line (rolled back turns)
+        and sub-agent namespaces older than the kept turns are dropped.
+        """
+        namespaces = self.storage[thread_id]
+        checkpoints = namespaces[""]
+        kept, turns, checkpoint_id = set(), 0, head
+        while checkpoint_id in checkpoints and turns < self.keep_turns:
+            kept.add(checkpoint_id)
+            _, metadata, parent_id = checkpoints[checkpoint_id]
+            if self.serde.loads_typed(metadata).get("source") == "input":
+                turns += 1
+            checkpoint_id = parent_id
+
+        cutoff = min(kept)
+        pruned = [("", checkpoint_id) for checkpoint_id in checkpoints if checkpoint_id not in kept]
+        pruned += [
+            (ns, checkpoint_id)
+            for ns, ns_checkpoints in namespaces.items() if ns
+            for checkpoint_id in ns_checkpoints if checkpoint_id < cutoff
+        ]
+        if not pruned:
+            return
+
+        for ns, checkpoint_id in pruned:
+            del namespaces[ns][checkpoint_id]
+            self.writes.pop((thread_id, ns, checkpoint_id), None)
+        for ns in [ns for ns, ns_checkpoints in namespaces.items() if ns and not ns_checkpoints]:
+            del namespaces[ns]
+
+        # Channel values no remaining checkpoint refers to
+        referenced = set()
+        for ns, ns_checkpoints in namespaces.items():
+            for saved, _, _ in ns_checkpoints.values():
+                referenced.update((ns, *item) for item in self.serde.loads_typed(saved)["channel_versions"].items())
+        orphans = [key for key in self.blobs if key[0] == thread_id and key[1:] not in referenced]
+        for key in orphans:
+            del self.blobs[key]
+
+        with self.conn:
+            for table in ("checkpoints", "writes"):
+                self.conn.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    [(thread_id, ns, checkpoint_id) for ns, checkpoint_id in pruned]
+                )
+            self.conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                orphans
+            )
+        logger.debug(f"Pruned {len(pruned)} checkpoints and {len(orphans)} values of thread {thread_id}")
+
+def get_checkpointer():
+    """
+    Build the checkpointer selected by CHECKPOINTER ("sqlite", the default, or "memory").
+    The SQLite one reads CHECKPOINT_DB, CHECKPOINT_KEEP_TURNS and CHECKPOINT_HOT_THREADS.
+    """
+    load_environment()
+    kind = os.environ.get("CHECKPOINTER", "sqlite").lower()
+
+    if kind == "memory":
+        logger.info("Using in-memory checkpointer")
+        return InMemorySaver()
+    if kind == "sqlite":
+        path = Path(os.environ.get("CHECKPOINT_DB", CHECKPOINT_DB))
+        logger.info(f"Using SQLite checkpointer: {path}")
+        return SQLiteSaver(
+            path,
+            keep_turns=int(os.environ.get("CHECKPOINT_KEEP_TURNS", KEEP_TURNS)),
+            max_hot_threads=int(os.environ.get("CHECKPOINT_HOT_THREADS", MAX_HOT_THREADS))
+        )
+    raise ValueError(f"Unknown CHECKPOINTER: {kind!r} (use 'sqlite' or 'memory')")
@@ -1,49 +1,61 @@
 # src/agents/coordinator.py
 
-from config import llm, PROMPTS_DIR
-from agents.state import SalesQuoteState
-from agents.tools.coordinator import (
-    lookup_products,
-    get_available_promotions,
-    add_product_to_cart,
-    remove_product_from_cart,
-    set_payment_method,
-    set_payment_plan,
-    set_customer_information,
-    generate_quote_pdf
-)
-
-from langchain.agents.middleware import SummarizationMiddleware
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.agents import create_agent
-
-## Middleware
-summarizer = SummarizationMiddleware(
-    model=llm,
-    trigger=("tokens", 10_000),  # Amount of tokens we allow the conversation to grow to until we start summarizing
-    keep=("messages", 3)         # Number of messages to keep after summarizing
-)
+from config import get_llm, PROMPTS_DIR
+
+from functools import cache
 
 ## Prompt
 PROMPT_PATH = PROMPTS_DIR / "coordinator.md"
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    prompt = f.read()
-
-## Init Agent
-coordinator = create_agent(
-    model=llm,
-    system_prompt=prompt,
-    state_schema=SalesQuoteState,
-    checkpointer=InMemorySaver(),
-    tools=[
+
+## Init Agent (built on first use)
+@cache
+def get_coordinator():
+    """Return the coordinator agent, building it (and its tools) on first call"""
+    from langchain.agents import create_agent
+    from agents.checkpointer import get_checkpointer
+    from agents.state import SalesQuoteState
+    from agents.summarization import BackgroundSummarizationMiddleware
+    from agents.tools.coordinator import (
         lookup_products,
         get_available_promotions,
+        compare_payment_options,
         add_product_to_cart,
         remove_product_from_cart,
         set_payment_method,
         set_payment_plan,
         set_customer_information,
         generate_quote_pdf
-    ],
-    middleware=[summarizer]
-)
\ No newline at end of file
+    )
+
+    llm = get_llm()
+
+    ## Middleware
+    summarizer = BackgroundSummarizationMiddleware(
+        model=llm,
+        trigger=("tokens", 10_000),  # Amount of tokens we allow the conversation to grow to until we start summarizing
+        keep=("messages", 3),        # Number of messages to keep after summarizing
+        hard_limit=20_000            # Past this, summarize inline instead of waiting for the background worker
+    )
+
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        prompt = f.read()
+
+    return create_agent(
+        name="coordinator",
+        model=llm,
+        system_prompt=prompt,
+        state_schema=SalesQuoteState,
+        checkpointer=get_checkpointer(),
+        tools=[
+            lookup_products,
+            get_available_promotions,
+            compare_payment_options,
+            add_product_to_cart,
+            remove_product_from_cart,
+            set_payment_method,
+            set_payment_plan,
+            set_customer_information,
+            generate_quote_pdf
+        ],
+        middleware=[summarizer]
+    )
@@ -5,19 +5,25 @@ from agents.tools.query_promotions import (
     get_promotion_by_id,
     list_all_promotions
     )
-from config import llm, PROMPTS_DIR
+from config import get_llm, PROMPTS_DIR
 
-from langchain.agents import create_agent
-from pathlib import Path
+from functools import cache
 
 ## Prompt
 PROMPT_PATH = PROMPTS_DIR / "promotions_agent.md"
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    prompt = f.read()
 
-## Init Agent
-promotions_agent = create_agent(
-    model=llm,
-    tools=[search_promotions, get_promotion_by_id, list_all_promotions],
-    system_prompt=prompt
-)
+## Init Agent (built on first use)
+@cache
+def get_promotions_agent():
+    """Return the promotions agent, building it on first call"""
+    from langchain.agents import create_agent
+
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        prompt = f.read()
+
+    return create_agent(
+        name="promotions_agent",
+        model=get_llm(),
+        tools=[search_promotions, get_promotion_by_id, list_all_promotions],
+        system_prompt=prompt
+    )
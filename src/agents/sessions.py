@@ -0,0 +1,181 @@
+# src/agents/sessions.py
+"""
+Session registry: activity tracking and memory accounting per thread.
+
+Tracks when each conversation thread was last used and approximately how
+many bytes its checkpoints take in memory (serialized checkpoints,
+pending writes and channel values, which include the messages). Idle
+threads are released after a TTL, and the least recently used idle
+threads are released whenever the total goes over a process-wide cap.
+
+Releasing spills a thread to disk when the checkpointer is durable (it
+is reloaded on its next use) and deletes it otherwise.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List
+
+from loguru import logger
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config import load_environment
+
+# Seconds without activity after which a thread is released
+IDLE_TTL = 30 * 60
+
+# Process-wide cap on checkpoint memory, in bytes
+MEMORY_CAP = 256 * 1024 * 1024
+
+# Seconds between background sweeps
+SWEEP_INTERVAL = 60
+
+
+def _size(serialized) -> int:
+    """Bytes of a serialized (type, data) pair"""
+    return len(serialized[1]) if serialized else 0
+
+
+def memory_by_thread(saver: InMemorySaver) -> Dict[str, int]:
+    """Approximate bytes held in memory by each thread of an in-memory checkpointer"""
+    usage: Dict[str, int] = {}
+    for thread_id, namespaces in list(saver.storage.items()):
+        usage[thread_id] = sum(
+            _size(checkpoint) + _size(metadata)
+            for checkpoints in list(namespaces.values())
+            for checkpoint, metadata, _ in list(checkpoints.values())
+        )
+    for (thread_id, _, _), writes in list(saver.writes.items()):
+        usage[thread_id] = usage.get(thread_id, 0) + sum(_size(value) for _, _, value, _ in list(writes.values()))
+    for (thread_id, _, _, _), value in list(saver.blobs.items()):
+        usage[thread_id] = usage.get(thread_id, 0) + _size(value)
+    return usage
+
+
+@dataclass
+class ThreadActivity:
+    last_active: float
+    busy: int = 0
+
+
+class SessionRegistry:
+    """Tracks conversation threads and releases idle ones to keep memory bounded"""
+
+    def __init__(
+        self,
+        checkpointer: InMemorySaver,
+        idle_ttl: float = IDLE_TTL,
+        memory_cap: int = MEMORY_CAP,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.checkpointer = checkpointer
+        self.idle_ttl = idle_ttl
+        self.memory_cap = memory_cap
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._threads: Dict[str, ThreadActivity] = {}
+        self.released = 0
+
+    @property
+    def durable(self) -> bool:
+        """True if released threads are spilled to disk rather than lost"""
+        return hasattr(self.checkpointer, "spill")
+
+    def touch(self, thread_id: str):
+        """Record activity on a thread"""
+        with self._lock:
+            activity = self._threads.get(thread_id)
+            if activity is None:
+                self._threads[thread_id] = ThreadActivity(last_active=self._clock())
+            else:
+                activity.last_active = self._clock()
+
+    @contextmanager
+    def active(self, thread_id: str) -> Iterator[None]:
+        """Mark a thread as in use (never released) for the duration of a turn"""
+        self.touch(thread_id)
+        with self._lock:
+            self._threads[thread_id].busy += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                activity = self._threads.get(thread_id)
+                if activity:
+                    activity.busy -= 1
+                    activity.last_active = self._clock()
+
+    def _release(self, thread_id: str):
+        if self.durable:
+            self.checkpointer.spill(thread_id)
+        else:
+            self.checkpointer.delete_thread(thread_id)
+        self.released += 1
+
+    def forget(self, thread_id: str):
+        """Stop tracking a thread that will not be used again and free its memory"""
+        with self._lock:
+            self._threads.pop(thread_id, None)
+        self._release(thread_id)
+        logger.debug(f"Session thread {thread_id} forgotten")
+
+    def sweep(self) -> List[str]:
+        """
+        Release threads idle for longer than the TTL, then the least recently
+        used idle ones while memory is over the cap. Returns the released thread IDs.
+        """
+        now = self._clock()
+        with self._lock:
+            idle = sorted(
+                (activity.last_active, thread_id)
+                for thread_id, activity in self._threads.items() if not activity.busy
+            )
+        released = [thread_id for last_active, thread_id in idle if now - last_active > self.idle_ttl]
+
+        usage = memory_by_thread(self.checkpointer)
+        total = sum(usage.values()) - sum(usage.get(thread_id, 0) for thread_id in released)
+        for _, thread_id in idle:
+            if total <= self.memory_cap:
+                break
+            if thread_id not in released:
+                released.append(thread_id)
+                total -= usage.get(thread_id, 0)
+
+        with self._lock:
+            for thread_id in released:
+                self._threads.pop(thread_id, None)
+        for thread_id in released:
+            self._release(thread_id)
+
+        if released:
+            logger.info(f"Released {len(released)} idle session threads; {total} bytes in use")
+        if total > self.memory_cap:
+            logger.warning(f"Checkpoint memory {total} bytes is over the cap of {self.memory_cap} (all threads busy)")
+        return released
+
+    def usage(self) -> dict:
+        """Current memory usage: total, cap and bytes per tracked thread in memory"""
+        usage = memory_by_thread(self.checkpointer)
+        with self._lock:
+            tracked = {thread_id: usage.get(thread_id, 0) for thread_id in self._threads}
+        return {
+            "threads": len(tracked),
+            "threads_in_memory": sum(1 for size in usage.values() if size),
+            "bytes": sum(usage.values()),
+            "memory_cap": self.memory_cap,
+            "released": self.released,
+            "per_thread": tracked,
+        }
+
+
+def registry_from_env(checkpointer: InMemorySaver) -> SessionRegistry:
+    """Build a registry with SESSION_IDLE_TTL (seconds) and SESSION_MEMORY_CAP (bytes) from the environment"""
+    load_environment()
+    return SessionRegistry(
+        checkpointer,
+        idle_ttl=float(os.environ.get("SESSION_IDLE_TTL", IDLE_TTL)),
+        memory_cap=int(os.environ.get("SESSION_MEMORY_CAP", MEMORY_CAP))
+    )
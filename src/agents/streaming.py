@@ -0,0 +1,94 @@
+# src/agents/streaming.py
+"""
+Streaming of coordinator turns.
+
+Runs a turn with the graph's "messages" and "updates" stream modes and
+turns them into display events: reply tokens from the coordinator model
+as they are generated, and a progress line for each tool call as soon as
+the model decides to make it.
+"""
+
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+from langchain.messages import AIMessage, AIMessageChunk, HumanMessage
+
+# Progress shown while a tool runs
+TOOL_PROGRESS = {
+    "lookup_products": "Buscando productos",
+    "get_available_promotions": "Consultando promociones",
+    "compare_payment_options": "Comparando opciones de pago",
+    "add_product_to_cart": "Agregando al carrito",
+    "remove_product_from_cart": "Quitando del carrito",
+    "set_payment_method": "Registrando método de pago",
+    "set_payment_plan": "Registrando plan de pago",
+    "set_customer_information": "Registrando datos del cliente",
+    "generate_quote_pdf": "Generando presupuesto",
+}
+
+# Graph node that runs the coordinator model
+MODEL_NODE = "model"
+
+# Reply tokens come from "messages", tool calls from "updates"
+STREAM_MODES = ["messages", "updates"]
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """A piece of a streamed turn: a reply token or a tool progress message"""
+    kind: str  # "token" or "tool"
+    text: str
+
+
+def _is_coordinator_model(metadata: dict) -> bool:
+    """True for chunks of the coordinator's own model (not middleware or nested agents)"""
+    return metadata.get("langgraph_node") == MODEL_NODE and \
+        "|" not in metadata.get("langgraph_checkpoint_ns", "")
+
+
+def _tool_events(update: dict) -> Iterator[StreamEvent]:
+    """Progress events for the tool calls in a model node update"""
+    node_update = update.get(MODEL_NODE)
+    if not isinstance(node_update, dict):
+        return
+    for message in node_update.get("messages") or []:
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                name = tool_call["name"]
+                yield StreamEvent("tool", TOOL_PROGRESS.get(name, name))
+
+
+def _events(mode: str, payload) -> Iterator[StreamEvent]:
+    """Display events for one item of a ["messages", "updates"] stream"""
+    if mode == "messages":
+        chunk, metadata = payload
+        if isinstance(chunk, AIMessageChunk) and chunk.text and _is_coordinator_model(metadata):
+            yield StreamEvent("token", chunk.text)
+    elif mode == "updates":
+        yield from _tool_events(payload)
+
+
+def stream_turn(agent, user_input: str, config: dict) -> Iterator[StreamEvent]:
+    """
+    Run one turn of the agent and yield its events as they happen.
+    The final state is in the agent's checkpointer once the iterator is exhausted.
+    """
+    stream = agent.stream(
+        {"messages": [HumanMessage(content=user_input)]},
+        config=config,
+        stream_mode=STREAM_MODES
+    )
+    for mode, payload in stream:
+        yield from _events(mode, payload)
+
+
+async def astream_turn(agent, user_input: str, config: dict) -> AsyncIterator[StreamEvent]:
+    """Async version of stream_turn; cancelling the consumer cancels the run"""
+    stream = agent.astream(
+        {"messages": [HumanMessage(content=user_input)]},
+        config=config,
+        stream_mode=STREAM_MODES
+    )
+    async for mode, payload in stream:
+        for event in _events(mode, payload):
+            yield event
@@ -0,0 +1,244 @@
+# src/agents/summarization.py
+"""
+Conversation summarization off the critical path.
+
+The stock SummarizationMiddleware summarizes inline, so the turn that
+crosses the token limit pays for an extra LLM call before its reply.
+BackgroundSummarizationMiddleware instead checks the limit once the turn
+has finished and summarizes in a worker thread (at most one job per
+conversation thread) while the consultant reads the reply. The next model
+call of that thread swaps the summarized messages for the summary.
+
+If the conversation grows past a hard limit before a summary is ready,
+the summary is waited for, or made inline if none is under way. A summary
+no turn picks up within a TTL (the thread was abandoned or deleted) is
+dropped.
+
+The conversation's token count is kept in the state and updated with the
+messages added since the last check, so checking the limits does not
+re-count the whole history every turn. It is recomputed whenever the
+messages are summarized, and from scratch if they were changed otherwise.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Annotated, Any, Callable, Dict, List, Optional
+
+from loguru import logger
+from langchain.agents.middleware import AgentState, SummarizationMiddleware
+from langchain.agents.middleware.types import PrivateStateAttr
+from langchain.messages import RemoveMessage
+from langgraph.config import get_config
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from typing_extensions import NotRequired
+
+# Conversations summarized at once
+MAX_SUMMARY_WORKERS = 4
+
+# Seconds a finished summary is kept for its thread's next turn (as long as an idle session)
+SUMMARY_TTL = 30 * 60
+
+
+class TokenCountState(AgentState):
+    """Agent state with the running token count of its messages"""
+    token_count: NotRequired[Annotated[int, PrivateStateAttr]]               # tokens in the counted messages
+    token_counted: NotRequired[Annotated[int, PrivateStateAttr]]             # messages counted so far
+    token_mark: NotRequired[Annotated[Optional[str], PrivateStateAttr]]      # ID of the last counted message
+
+
+@dataclass
+class Compaction:
+    """A summary of the first messages of a thread, ready to replace them"""
+    message_ids: List[str]
+    summary: str
+    finished_at: float
+
+
+class BackgroundSummarizationMiddleware(SummarizationMiddleware):
+    """SummarizationMiddleware that summarizes after the reply instead of before the model call"""
+
+    state_schema = TokenCountState
+
+    def __init__(
+        self,
+        model,
+        *,
+        hard_limit: int,
+        max_workers: int = MAX_SUMMARY_WORKERS,
+        summary_ttl: float = SUMMARY_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        **kwargs: Any
+    ):
+        super().__init__(model, **kwargs)
+        self.hard_limit = hard_limit
+        self.summary_ttl = summary_ttl
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _thread_id() -> Optional[str]:
+        return get_config().get("configurable", {}).get("thread_id")
+
+    @staticmethod
+    def _build_new_messages(summary: str):
+        # With IDs, the counter can recognize the summary as already counted
+        messages = SummarizationMiddleware._build_new_messages(summary)
+        for message in messages:
+            message.id = str(uuid.uuid4())
+        return messages
+
+    # ── Token count ────────────────────────────────────────────────────────────
+
+    def _count_tokens(self, state) -> int:
+        """Tokens in the conversation, counting only the messages added since the last count"""
+        messages = state["messages"]
+        counted = state.get("token_counted", 0)
+        total = state.get("token_count", 0)
+        if counted > len(messages) or (counted and messages[counted - 1].id != state.get("token_mark")):
+            counted, total = 0, 0  # messages were removed or rewritten: count them all again
+        if counted < len(messages):
+            total += self.token_counter(messages[counted:])
+        return total
+
+    @staticmethod
+    def _counter(total: int, messages) -> Dict[str, Any]:
+        """State update recording that `messages` hold `total` tokens"""
+        return {
+            "token_count": total,
+            "token_counted": len(messages),
+            "token_mark": messages[-1].id if messages else None,
+        }
+
+    def _compacted(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """A summarization update (remove all, then the new messages) with the counter of its result"""
+        messages = update["messages"][1:]
+        return {**update, **self._counter(self.token_counter(messages), messages)}
+
+    # ── Scheduling ─────────────────────────────────────────────────────────────
+
+    def _summarize(self, messages) -> Compaction:
+        cutoff = self._determine_cutoff_index(messages)
+        summary = self._create_summary(messages[:cutoff])
+        return Compaction(
+            message_ids=[message.id for message in messages[:cutoff]],
+            summary=summary,
+            finished_at=self._clock()
+        )
+
+    def _expire(self):
+        """Drop the summaries no turn of their thread picked up within the TTL, and failed ones"""
+        now = self._clock()
+        with self._lock:
+            expired = {
+                thread_id: job for thread_id, job in self._jobs.items()
+                if job.done() and (job.exception() or now - job.result().finished_at > self.summary_ttl)
+            }
+            for thread_id in expired:
+                del self._jobs[thread_id]
+        for thread_id, job in expired.items():
+            if job.exception():
+                logger.warning(f"Background summarization failed for thread {thread_id}: {job.exception()}")
+            else:
+                logger.debug(f"Dropped unclaimed summary of thread {thread_id}")
+
+    def _job(self, thread_id: Optional[str]) -> Optional[Future]:
+        """The thread's background summarization, if any"""
+        with self._lock:
+            return self._jobs.get(thread_id)
+
+    def _schedule(self, state) -> Dict[str, Any]:
+        """Start summarizing the thread in the background if it is over the trigger"""
+        self._expire()
+        thread_id = self._thread_id()
+        messages = list(state["messages"])
+        total = self._count_tokens(state)
+        counter = self._counter(total, messages)
+        if thread_id is None or self._job(thread_id) is not None:
+            return counter
+        if not self._should_summarize(messages, total):
+            return counter
+        if self._determine_cutoff_index(messages) <= 0:
+            return counter
+
+        self._ensure_message_ids(messages)
+        with self._lock:
+            if thread_id not in self._jobs:
+                self._jobs[thread_id] = self._executor.submit(self._summarize, messages)
+                logger.debug(f"Background summarization started for thread {thread_id} ({total} tokens)")
+        return counter
+
+    def after_agent(self, state, runtime) -> Optional[Dict[str, Any]]:
+        return self._schedule(state)
+
+    async def aafter_agent(self, state, runtime) -> Optional[Dict[str, Any]]:
+        return self._schedule(state)
+
+    # ── Applying ───────────────────────────────────────────────────────────────
+
+    def _apply(self, thread_id: str, job: Future, messages) -> Optional[Dict[str, Any]]:
+        """Replace the summarized messages with their summary, if they are still the thread's first ones"""
+        with self._lock:
+            if self._jobs.get(thread_id) is job:
+                del self._jobs[thread_id]
+        try:
+            compaction = job.result()
+        except Exception as e:
+            logger.warning(f"Background summarization failed for thread {thread_id}: {e}")
+            return None
+
+        count = len(compaction.message_ids)
+        if [message.id for message in messages[:count]] != compaction.message_ids:
+            logger.debug(f"Discarding stale summary of thread {thread_id}")
+            return None
+
+        logger.info(f"Applied background summary of {count} messages to thread {thread_id}")
+        return self._compacted({
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *self._build_new_messages(compaction.summary),
+                *messages[count:],
+            ]
+        })
+
+    def before_model(self, state, runtime) -> Optional[Dict[str, Any]]:
+        messages = state["messages"]
+        total = self._count_tokens(state)
+        thread_id = self._thread_id()
+        job = self._job(thread_id)
+        over_limit = total >= self.hard_limit
+
+        if job is not None and (job.done() or over_limit):
+            update = self._apply(thread_id, job, messages)  # blocks only over the hard limit
+            if update is not None:
+                return update
+        if over_limit:
+            logger.warning(f"Thread {thread_id} is over the hard limit ({total} tokens), summarizing inline")
+            update = super().before_model(state, runtime)
+            if update is not None:
+                return self._compacted(update)
+        return self._counter(total, messages)
+
+    async def abefore_model(self, state, runtime) -> Optional[Dict[str, Any]]:
+        messages = state["messages"]
+        total = self._count_tokens(state)
+        thread_id = self._thread_id()
+        job = self._job(thread_id)
+        over_limit = total >= self.hard_limit
+
+        if job is not None and (job.done() or over_limit):
+            await asyncio.to_thread(wait, [job])
+            update = self._apply(thread_id, job, messages)
+            if update is not None:
+                return update
+        if over_limit:
+            logger.warning(f"Thread {thread_id} is over the hard limit ({total} tokens), summarizing inline")
+            update = await super().abefore_model(state, runtime)
+            if update is not None:
+                return self._compacted(update)
+        return self._counter(total, messages)
@@ -0,0 +1,248 @@
+# src/agents/tools/catalog_index.py
+"""
+In-memory search index over product descriptions.
+Built once when the catalog is loaded and queried by the catalog tools.
+
+Query words that match no indexed word (typos such as "saten") are
+resolved through a trigram index over the vocabulary.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Words, and numbers with an optional decimal part ("2.2", "1,5")
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:[.,]\d+)?")
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Minimum trigram similarity for a misspelled word to match an indexed word
+SIMILARITY_CUTOFF = 0.4
+# Shorter words are never fuzzy matched (too many spurious candidates)
+FUZZY_MIN_LENGTH = 3
+
+# Units of sizes and packs ("24CM", "1,5 LTS", "X5"): a query need not spell them out to describe a product
+UNIT_TOKENS = frozenset({"cm", "mm", "cc", "ml", "l", "lt", "lts", "kg", "gr", "g", "x"})
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents (e.g. "Sartén" -> "sarten")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized search tokens.
+
+    Letters and digits are split apart so that "24CM" yields ["24", "cm"],
+    which makes "24", "24cm" and "24 cm" all match the same products.
+    """
+    return [t.replace(",", ".") for t in _TOKEN_RE.findall(fold(text))]
+
+
+def trigrams(word: str) -> Set[str]:
+    """Character trigrams of a word, padded so that word boundaries count"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """Inverted token index with BM25 ranking over a list of product descriptions"""
+
+    def __init__(self, descriptions: Sequence[str]):
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths: List[int] = []
+        distinct: List[int] = []
+        for doc_id, description in enumerate(descriptions):
+            tokens = tokenize(description)
+            counts = Counter(tokens)
+            lengths.append(len(tokens))
+            distinct.append(sum(1 for token in counts if token not in UNIT_TOKENS))
+            for token, count in counts.items():
+                postings.setdefault(token, {})[doc_id] = count
+
+        self.size = len(descriptions)
+        # Posting lists map doc id -> term frequency; the sorted vocabulary serves prefix lookups
+        self.postings: Dict[str, Dict[int, int]] = postings
+        self.vocabulary: List[str] = sorted(postings)
+        # Number of distinct non-unit terms per document, to tell when a query covers a whole description
+        self.distinct_terms: List[int] = distinct
+
+        # Trigram -> ids of vocabulary words containing it, for typo tolerance
+        self.trigram_postings: Dict[str, List[int]] = {}
+        self.trigram_counts: List[int] = []
+        for term_id, term in enumerate(self.vocabulary):
+            grams = trigrams(term)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_postings.setdefault(gram, []).append(term_id)
+
+        # Precomputed BM25 statistics
+        avg_length = (sum(lengths) / self.size) if self.size else 0.0
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+        self.length_norm: List[float] = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+            for length in lengths
+        ]
+
+    def _prefix_terms(self, token: str) -> List[str]:
+        """Return every indexed term that starts with the given token"""
+        start = bisect_left(self.vocabulary, token)
+        terms = []
+        for term in self.vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """
+        Return the indexed terms a query token stands for, with a weight.
+
+        The token itself weighs 1.0 and longer terms starting with it the
+        fraction of the term it spells out, so an exact word outranks a
+        rarer word it is only the start of ("tapa" vs "tapabocas"). When
+        there are none, words similar enough to be a typo of it are
+        weighted by their similarity.
+        """
+        terms = {term: len(token) / len(term) for term in self._prefix_terms(token)}
+        if not terms and token.isalpha():
+            terms = self.similar(token)
+        return terms
+
+    def similar(self, word: str, cutoff: float = SIMILARITY_CUTOFF) -> Dict[str, float]:
+        """Return indexed words whose trigram (Jaccard) similarity to word is at least cutoff"""
+        if len(word) < FUZZY_MIN_LENGTH:
+            return {}
+
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self.trigram_postings.get(gram, ()))
+
+        matches = {}
+        for term_id, common in shared.items():
+            similarity = common / (len(grams) + self.trigram_counts[term_id] - common)
+            if similarity >= cutoff:
+                matches[self.vocabulary[term_id]] = similarity
+        return matches
+
+    def lookup(self, token: str) -> Set[int]:
+        """Return the documents containing a term the token stands for"""
+        docs: Set[int] = set()
+        for term in self._expand(token):
+            docs.update(self.postings[term])
+        return docs
+
+    def search(self, query: str) -> List[int]:
+        """
+        Return the ids of documents matching every token in the query,
+        in catalog order. Each query token also matches as a prefix,
+        so "sart" finds "SARTEN", or as a typo, so "saten" does too.
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+
+        # Intersect starting from the rarest token to keep the working set small
+        candidates = sorted((self.lookup(t) for t in tokens), key=len)
+        result = candidates[0]
+        for docs in candidates[1:]:
+            if not result:
+                break
+            result = result & docs
+
+        return sorted(result)
+
+    def score(self, doc_id: int, terms: Dict[str, float]) -> float:
+        """BM25 score of a document for the given (already expanded) weighted terms"""
+        norm = self.length_norm[doc_id]
+        total = 0.0
+        for term, weight in terms.items():
+            tf = self.postings[term].get(doc_id)
+            if tf:
+                total += weight * self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        return total
+
+    def rank(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[int]]:
+        """
+        Return (total matches, ids of one page of matches by descending BM25 score).
+
+        Only the top ``offset + limit`` documents are selected (with a heap),
+        ties keep catalog order.
+        """
+        matches = self.search(query)
+        if not matches or offset >= len(matches):
+            return len(matches), []
+
+        terms: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            for term, weight in self._expand(token).items():
+                terms[term] = max(weight, terms.get(term, 0.0))
+        top = heapq.nsmallest(
+            offset + limit,
+            matches,
+            key=lambda doc_id: (-self.score(doc_id, terms), doc_id)
+        )
+        return len(matches), top[offset:]
+
+    def _query_terms(self, query: str) -> Optional[Set[str]]:
+        """Non-unit terms the query's tokens are prefixes of, or None if a token needs typo correction"""
+        tokens = set(tokenize(query))
+        if not tokens:
+            return None
+
+        terms = set()
+        for token in tokens:
+            prefix_terms = self._prefix_terms(token)
+            if not prefix_terms:
+                return None
+            terms.update(term for term in prefix_terms if term not in UNIT_TOKENS)
+        return terms
+
+    def best_match(self, query: str) -> Optional[int]:
+        """
+        Return the one document the query unambiguously refers to, or None.
+
+        A match is unambiguous when every query token matches without typo
+        correction and either a single document matches, or exactly one of
+        the matches is fully described by the query (all its words but
+        units such as "cm" are covered).
+        """
+        terms = self._query_terms(query)
+        if terms is None:
+            return None
+
+        matches = self.search(query)
+        if len(matches) == 1:
+            return matches[0]
+
+        covered = [
+            doc_id for doc_id in matches
+            if sum(1 for term in terms if doc_id in self.postings[term]) == self.distinct_terms[doc_id]
+        ]
+        return covered[0] if len(covered) == 1 else None
+
+    def variants(self, doc_id: int, query: str) -> List[int]:
+        """
+        Return the other documents matching the query that contain every
+        word of doc_id, e.g. the TERRA and CHERRY versions of SARTEN CHEF.
+        """
+        terms = self._query_terms(query) or set()
+        words = [term for term in terms if doc_id in self.postings[term]]
+        # Units aside, so "SARTEN 24 CAPRI" is a variant of "SARTEN 24CM CAPRI" whichever the query spells
+        matches = self.search(" ".join(token for token in tokenize(query) if token not in UNIT_TOKENS))
+        return [
+            other for other in matches
+            if other != doc_id and all(other in self.postings[term] for term in words)
+        ]
@@ -1,36 +1,176 @@
 # src/agents/tools/coordinator.py
 
 from config import OUTPUT_DIR
-from agents.catalog_agent import catalog_agent
-from agents.promotions_agent import promotions_agent
+from agents.catalog_agent import get_catalog_agent
 from agents.state import ProductLine, PaymentPlan, CustomerInformation
-from agents.tools.search_catalog import load_prices
-
-from typing import Optional, Dict, List
+from agents.tools.data_manager import data_manager
+from agents.tools.product_repository import Product, ProductRepository
+from agents.tools.search_catalog import format_product_details
+from agents.tools.query_promotions import find_promotions, format_promotion_matches
+from agents.tools.pricing import PricingMatrix, plan_for, STANDARD_INSTALLMENTS
+from agents.tools.catalog_index import fold
+from agents.tools.response_cache import ResponseCache
+
+from typing import Optional, Dict, Iterable, List, Tuple
+import asyncio
 from datetime import datetime
 from pathlib import Path
 import json
+from loguru import logger
 
 from langchain.messages import HumanMessage, ToolMessage
 from langchain.tools import tool, ToolRuntime
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.tools import StructuredTool
 from langgraph.types import Command
 
-# Load price data for budget calculations
-_prices = load_prices()
+# Upper bound on concurrent catalog sub-agent runs per lookup_products call
+MAX_LOOKUP_WORKERS = 8
 
-@tool
-def lookup_products(products: list[str]) -> str:
-    """Search the catalog for available products and their prices."""
-    query = f"""
-    Search the catalog for these products:
-    {'\n'.join(f"- {p}" for p in products)}
+# Variants listed under an exact match (products containing all its words, e.g. other colors)
+MAX_VARIANTS = 10
+
+# Catalog sub-agent answers by normalized query, shared across sessions
+lookup_cache = ResponseCache()
+
+def _resolve_locally(query: str, repository: ProductRepository) -> Optional[Tuple[Product, List[Product]]]:
     """
+    Return the product a query unambiguously refers to (by ID or description)
+    with the other products containing all its words, or None.
+    """
+    product = repository.get(query.strip())
+    if product:
+        return product, []
 
-    response = catalog_agent.invoke(
-        {"messages": [HumanMessage(content=query)]}
-        )
+    doc_id = repository.index.best_match(query)
+    if doc_id is None:
+        return None
+    return repository.products[doc_id], [repository.products[i] for i in repository.index.variants(doc_id, query)]
+
+
+def _format_exact_match(query: str, repository: ProductRepository, product: Product, variants: List[Product]) -> str:
+    """Details of a locally resolved product, followed by its variants so the coordinator can offer them"""
+    section = f"Exact match for '{query}':\n{format_product_details(repository, product)}"
+    if variants:
+        listed = ", ".join(f"{variant.description} (ID {variant.id})" for variant in variants[:MAX_VARIANTS])
+        more = f" and {len(variants) - MAX_VARIANTS} more" if len(variants) > MAX_VARIANTS else ""
+        section += f"Other products containing all its words: {listed}{more}\n"
+    return section
+
+
+def _lookup_key(query: str) -> str:
+    """Cache key of a product query: accent-folded, lowercase, single-spaced"""
+    return " ".join(fold(query).split())
+
+
+def _lookup_request(query: str) -> dict:
+    """Catalog sub-agent input for one product query"""
+    prompt = f"""
+    Search the catalog for this product:
+    - {query}
+    """
+    return {"messages": [HumanMessage(content=prompt)]}
+
+
+def _lookup_with_agent(query: str, version: str) -> str:
+    """Resolve one product query with the catalog sub-agent, caching successful answers"""
+    try:
+        response = get_catalog_agent().invoke(_lookup_request(query))
+    except Exception as e:
+        logger.exception(f"Catalog agent lookup failed for '{query}': {e}")
+        return f"Error looking up '{query}': {e}"
+
+    content = response['messages'][-1].content
+    lookup_cache.put(_lookup_key(query), version, content)
+    return content
 
-    return response['messages'][-1].content
+
+async def _alookup_with_agent(query: str, version: str, limit: asyncio.Semaphore) -> str:
+    """Async version of _lookup_with_agent; cancelling it cancels the sub-agent run"""
+    async with limit:
+        try:
+            response = await get_catalog_agent().ainvoke(_lookup_request(query))
+        except Exception as e:
+            logger.exception(f"Catalog agent lookup failed for '{query}': {e}")
+            return f"Error looking up '{query}': {e}"
+
+    content = response['messages'][-1].content
+    lookup_cache.put(_lookup_key(query), version, content)
+    return content
+
+
+def _plan_lookups(products: list[str]) -> Tuple[str, List[Optional[str]], Dict[str, Tuple[str, List[int]]]]:
+    """
+    Answer what can be answered without the sub-agent.
+    Returns (snapshot version, sections with None for pending ones,
+    pending lookup key -> (first query text, positions)).
+    """
+    # Fast path: answer unambiguous lookups straight from the index, without the sub-agent
+    snapshot = data_manager.current()
+    repository = snapshot.repository
+    sections: List[Optional[str]] = []
+    pending: Dict[str, Tuple[str, List[int]]] = {}
+    for query in products:
+        resolved = _resolve_locally(query, repository)
+        if resolved:
+            sections.append(_format_exact_match(query, repository, *resolved))
+            continue
+
+        # Then previous sub-agent answers for the same query and data version
+        key = _lookup_key(query)
+        cached = lookup_cache.get(key, snapshot.version)
+        if cached is None:
+            # Spelling variants of one product ("Sartén 24", "sarten  24") share a sub-agent run
+            pending.setdefault(key, (query, []))[1].append(len(sections))
+        sections.append(cached)
+
+    logger.info(f"lookup_products: {sum(len(positions) for _, positions in pending.values())} of {len(products)} sent to catalog agent")
+    return snapshot.version, sections, pending
+
+
+def _merge_lookups(
+    sections: List[Optional[str]],
+    pending: Dict[str, Tuple[str, List[int]]],
+    results: Iterable[str]
+) -> str:
+    """Fill the sub-agent answers into their positions and join all sections"""
+    for (_, positions), result in zip(pending.values(), results):
+        for position in positions:
+            sections[position] = result
+    return "\n---\n".join(sections)
+
+
+def _lookup_products(products: list[str]) -> str:
+    """Search the catalog for available products and their prices."""
+    version, sections, pending = _plan_lookups(products)
+
+    # One sub-agent run per product, concurrently: the wait is the slowest lookup, not the sum
+    if not pending:
+        return _merge_lookups(sections, pending, [])
+    get_catalog_agent()  # build the shared agent once, before the workers need it
+    workers = min(MAX_LOOKUP_WORKERS, len(pending))
+    queries = [query for query, _ in pending.values()]
+    # Context-copying workers, so the sub-agent runs report to the turn's callbacks
+    with ContextThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-lookup") as executor:
+        results = list(executor.map(_lookup_with_agent, queries, [version] * len(queries)))
+    return _merge_lookups(sections, pending, results)
+
+
+async def _alookup_products(products: list[str]) -> str:
+    """Search the catalog for available products and their prices."""
+    version, sections, pending = _plan_lookups(products)
+
+    # Same fan-out on the event loop; cancelling the turn cancels every pending sub-agent run
+    limit = asyncio.Semaphore(MAX_LOOKUP_WORKERS)
+    results = await asyncio.gather(*(_alookup_with_agent(query, version, limit) for query, _ in pending.values()))
+    return _merge_lookups(sections, pending, results)
+
+
+lookup_products = StructuredTool.from_function(
+    func=_lookup_products,
+    coroutine=_alookup_products,
+    name="lookup_products"
+)
 
 @tool
 def get_available_promotions(banks: list[str], installments: list[int], credit_cards: list[str]) -> str:
@@ -38,18 +178,10 @@ def get_available_promotions(banks: list[str], installments: list[int], credit_c
     Return available sales promotions and discounts
     for the given banks and credit card installment options.
     """
-    query = f"""
-    Find available promotions that satisfy **all** of the following conditions (logical AND):
-    - Bank is one of: {', '.join(banks)}
-    - Installments include: {', '.join(map(str, installments))}
-    - Credit card is one of: {', '.join(credit_cards)}
-    """
-
-    response = promotions_agent.invoke(
-        {"messages": [HumanMessage(content=query)]}
-        )
-
-    return response['messages'][-1].content
+    # Deterministic query over the promotion index: no sub-agent needed
+    logger.info(f"get_available_promotions - banks: {banks}, cards: {credit_cards}, installments: {installments}")
+    matches = find_promotions(banks, credit_cards, installments)
+    return format_promotion_matches(matches, banks, credit_cards, installments)
 
 @tool
 def add_product_to_cart(
@@ -226,62 +358,38 @@ def set_customer_information(
         }
     )
 
-def _parse_price(value: str) -> float:
-    """Parse price string to float, handling empty or invalid values."""
-    if not value or value == 'N/A':
-        return 0.0
-    try:
-        # Handle both comma and dot decimal separators
-        return float(str(value).replace(',', '.'))
-    except (ValueError, TypeError):
-        return 0.0
-
-
-def _get_unit_price(product_id: str, payment_method: str, payment_plan: Optional[PaymentPlan]) -> float:
+def _get_unit_price(
+    pricing: PricingMatrix,
+    product_id: str,
+    payment_method: str,
+    payment_plan: Optional[PaymentPlan]
+) -> int:
     """
-    Calculate the unit price for a product based on payment method and plan.
+    Calculate the unit price for a product, in cents, based on payment method and plan.
 
     Pricing logic:
     - CASH/WIRE: Use cash_price (or base_price if cash_price is 0)
     - CREDIT_CARD + promotion: Use base_price (promotional = base_price / installments)
     - CREDIT_CARD + no promotion: Use installment_n * n (total from standard installments)
     """
-    price_info = _prices.get(product_id, {})
-
-    if payment_method in ("CASH", "WIRE"):
-        cash_price = _parse_price(price_info.get('cash_price', '0'))
-        if cash_price > 0:
-            return cash_price
-        # Fallback to base_price if cash_price is 0
-        return _parse_price(price_info.get('base_price', '0'))
-
-    # CREDIT_CARD payment
-    if payment_plan and payment_plan.promotion_id:
-        # With promotion: use base_price (installment = base_price / n)
-        return _parse_price(price_info.get('base_price', '0'))
-
-    # Without promotion: total = installment_price * num_installments
-    if payment_plan:
-        installments = payment_plan.installments
-        installment_key = f'installments_{installments}'
-        installment_price = _parse_price(price_info.get(installment_key, '0'))
-
-        if installment_price > 0:
-            return installment_price * installments
-
-    # Fallback to base_price
-    return _parse_price(price_info.get('base_price', '0'))
+    plan = plan_for(
+        payment_method,
+        payment_plan.installments if payment_plan else None,
+        payment_plan.promotion_id if payment_plan else None
+    )
+    return pricing.unit_price(product_id, plan)
 
 
 def _calculate_budget(state: dict) -> List[dict]:
-    """Calculate budget line items with prices based on payment method."""
+    """Calculate budget line items with prices (in cents) based on payment method."""
     budget = []
     products = state.get("products", {})
     payment_method = state.get("payment_method", "CASH")
     payment_plan = state.get("payment_plan")
+    pricing = data_manager.current().pricing
 
     for product_id, product in products.items():
-        unit_price = _get_unit_price(product_id, payment_method, payment_plan)
+        unit_price = _get_unit_price(pricing, product_id, payment_method, payment_plan)
         subtotal = product.quantity * unit_price
 
         budget.append({
@@ -295,11 +403,68 @@ def _calculate_budget(state: dict) -> List[dict]:
     return budget
 
 
-def _calculate_total(budget: List[dict]) -> float:
-    """Calculate total amount from budget line items."""
+def _calculate_total(budget: List[dict]) -> int:
+    """Calculate total amount (in cents) from budget line items."""
     return sum(item["subtotal"] for item in budget)
 
 
+def _divide_cents(amount: int, parts: int) -> int:
+    """Split an amount in cents into equal parts, rounding half up to the cent."""
+    return (2 * amount + parts) // (2 * parts)
+
+
+def _format_amount(cents: int) -> str:
+    """Format an amount in cents for tool output (no decimals, as used in Argentina)."""
+    return f"{_divide_cents(cents, 100):,}".replace(",", ".")
+
+
+def _to_pesos(cents: int) -> float:
+    """Convert cents to a currency amount for the quote document."""
+    return cents / 100
+
+
+@tool
+def compare_payment_options(
+    runtime: ToolRuntime,
+    promotion_installments: Optional[List[int]] = None
+) -> str:
+    """
+    Compare the cart total for every payment option at once:
+    cash/wire, interest-free promotion and standard 6, 9 and 12 installments.
+
+    Args:
+        promotion_installments: Installment counts to show for an interest-free
+            promotion (e.g. [3, 6, 12]). Defaults to 3, 6, 9 and 12.
+    """
+    products = runtime.state.get("products", {})
+    if not products:
+        return "Cannot compare payment options: No products in cart"
+
+    totals, missing = data_manager.current().pricing.cart_totals(
+        {product_id: line.quantity for product_id, line in products.items()}
+    )
+
+    lines = [f"Cash / Wire: ${_format_amount(totals['CASH'])}"]
+
+    base_total = totals["BASE"]
+    lines.append(f"Credit card with interest-free promotion: ${_format_amount(base_total)}")
+    for n in promotion_installments or [3, 6, 9, 12]:
+        if n > 0:
+            lines.append(f"  - {n} installments of ${_format_amount(_divide_cents(base_total, n))}")
+
+    for n in STANDARD_INSTALLMENTS:
+        total = totals[f"INSTALLMENTS_{n}"]
+        lines.append(
+            f"Credit card, {n} installments without promotion: "
+            f"${_format_amount(total)} ({n} x ${_format_amount(_divide_cents(total, n))})"
+        )
+
+    if missing:
+        lines.append(f"Warning: no prices found for products {', '.join(missing)}")
+
+    return "Payment options for the current cart:\n" + "\n".join(lines)
+
+
 @tool
 def generate_quote_pdf(runtime: ToolRuntime) -> str:
     """
@@ -329,17 +494,24 @@ def generate_quote_pdf(runtime: ToolRuntime) -> str:
         installments = payment_plan.installments
         if payment_plan.promotion_id:
             # Promotional pricing: total / installments (interest-free)
-            price_per_installment = total_amount / installments
+            price_per_installment = _divide_cents(total_amount, installments)
         else:
             # Standard installments: sum of monthly payments
-            price_per_installment = total_amount / installments
+            price_per_installment = _divide_cents(total_amount, installments)
 
-    # Generate quote data
+    # Generate quote data (amounts are kept in cents until here)
     quote_data = {
         "date": datetime.now().isoformat(),
-        "products": budget,
+        "products": [
+            {
+                **item,
+                "unit_price": _to_pesos(item["unit_price"]),
+                "subtotal": _to_pesos(item["subtotal"])
+            }
+            for item in budget
+        ],
         "payment_method": payment_method,
-        "total_amount": total_amount
+        "total_amount": _to_pesos(total_amount)
     }
 
     # Add customer info if available
@@ -356,7 +528,9 @@ def generate_quote_pdf(runtime: ToolRuntime) -> str:
             "credit_card": payment_plan.credit_card,
             "installments": payment_plan.installments,
             "promotion_id": payment_plan.promotion_id,
-            "price_per_installment": price_per_installment
+            "price_per_installment": (
+                _to_pesos(price_per_installment) if price_per_installment is not None else None
+            )
         }
 
     # In production, this would:
@@ -369,6 +543,7 @@ def generate_quote_pdf(runtime: ToolRuntime) -> str:
     filename = f"quote_{timestamp}.json"
     filepath = OUTPUT_DIR / filename
 
+    OUTPUT_DIR.mkdir(exist_ok=True)
     with open(filepath, 'w', encoding='utf-8') as f:
         json.dump(quote_data, f, indent=2, ensure_ascii=False)
 
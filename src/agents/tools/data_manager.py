@@ -0,0 +1,174 @@
+# src/agents/tools/data_manager.py
+"""
+Data manager for the catalog, price list and promotions.
+
+All data and indexes live in an immutable DataSnapshot. Tools take the
+current snapshot once per call, so a call always sees one consistent
+version. A background watcher rebuilds the snapshot when a data file
+changes and swaps it in atomically, without restarting the agent.
+
+When snapshots are enabled and a precompiled snapshot file matches the
+data files it is loaded instead of parsing them (see agents.tools.snapshot_file).
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from agents.tools.product_repository import ProductRepository, CATALOG_FILE, PRICE_FILE, load_catalog, load_prices
+from agents.tools.pricing import PricingMatrix
+from agents.tools.promotion_index import PromotionIndex, AvailabilitySchedule, PROMOTIONS_FILE, load_promotions
+from agents.tools.snapshot_file import read_snapshot, snapshot_path
+
+# Seconds between checks for modified data files
+RELOAD_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """One consistent version of all data files and the indexes built from them"""
+    version: str
+    repository: ProductRepository
+    pricing: PricingMatrix
+    promotions: List[dict]
+    promotion_index: PromotionIndex
+    availability: AvailabilitySchedule
+
+
+def hash_files(paths: List[Path]) -> str:
+    """Content hash of a set of files (missing files hash as empty)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.name.encode())
+        try:
+            digest.update(path.read_bytes())
+        except FileNotFoundError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+class DataManager:
+    """Holds the current DataSnapshot and reloads it when the data files change"""
+
+    def __init__(
+        self,
+        catalog_file: Path = CATALOG_FILE,
+        price_file: Path = PRICE_FILE,
+        promotions_file: Path = PROMOTIONS_FILE,
+        snapshot_file: Optional[Path] = None
+    ):
+        self.catalog_file = catalog_file
+        self.price_file = price_file
+        self.promotions_file = promotions_file
+        self.snapshot_file = snapshot_file
+
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        self._stats = self._stat_files()
+        self._snapshot = self.build()
+
+    @property
+    def files(self) -> List[Path]:
+        return [self.catalog_file, self.price_file, self.promotions_file]
+
+    def _stat_files(self) -> Dict[Path, Optional[Tuple[int, int]]]:
+        """(mtime, size) of each data file, used as a cheap change check"""
+        stats = {}
+        for path in self.files:
+            try:
+                st = path.stat()
+                stats[path] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                stats[path] = None
+        return stats
+
+    def build(self) -> DataSnapshot:
+        """
+        Return a new snapshot of the data files: from the precompiled
+        snapshot file if it is up to date, otherwise parsed and indexed.
+        """
+        version = hash_files(self.files)
+
+        if self.snapshot_file is not None:
+            snapshot = read_snapshot(version, self.snapshot_file)
+            if isinstance(snapshot, DataSnapshot):
+                return snapshot
+
+        logger.info(f"Building data snapshot {version}")
+
+        repository = ProductRepository(load_catalog(self.catalog_file), load_prices(self.price_file))
+        promotions = load_promotions(self.promotions_file)
+
+        return DataSnapshot(
+            version=version,
+            repository=repository,
+            pricing=PricingMatrix(repository.prices),
+            promotions=promotions,
+            promotion_index=PromotionIndex(promotions),
+            availability=AvailabilitySchedule(promotions)
+        )
+
+    def current(self) -> DataSnapshot:
+        """Return the current snapshot. Take it once and use it for the whole call."""
+        return self._snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        Rebuild and swap in a new snapshot if a data file changed.
+        Returns True if a new snapshot was swapped in.
+        """
+        with self._reload_lock:
+            stats = self._stat_files()
+            if stats == self._stats:
+                return False
+            self._stats = stats
+
+            # mtime changed, but the content may not have (e.g. touch, editor save)
+            if hash_files(self.files) == self._snapshot.version:
+                return False
+
+            snapshot = self.build()
+
+            # A half-written or deleted file loads as empty: keep serving the old data
+            old = self._snapshot
+            if (len(old.repository) and not len(snapshot.repository)) or \
+               (len(old.repository.prices) and not len(snapshot.repository.prices)) or \
+               (old.promotions and not snapshot.promotions):
+                logger.error(f"Data snapshot {snapshot.version} is missing data, keeping {old.version}")
+                return False
+
+            self._snapshot = snapshot
+            logger.success(f"Data snapshot swapped: {old.version} -> {snapshot.version}")
+            return True
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                logger.exception(f"Error reloading data: {e}")
+
+    def start_watching(self, interval: float = RELOAD_INTERVAL):
+        """Start a background thread that reloads the data when the files change"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name="data-watcher")
+        self._watcher.start()
+        logger.info(f"Watching data files for changes every {interval}s")
+
+    def stop_watching(self):
+        """Stop the background watcher thread"""
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+
+# Shared data manager, loaded at import
+data_manager = DataManager(snapshot_file=snapshot_path())
@@ -0,0 +1,80 @@
+# src/agents/tools/pricing.py
+"""
+Quote pricing engine.
+The price list is laid out as a products x plans matrix of unit prices
+(in cents) with every fallback already resolved, so a whole cart can be
+priced for every payment option in a single pass.
+"""
+
+from array import array
+from operator import mul
+from typing import Dict, List, Optional, Tuple
+
+from agents.tools.product_repository import PriceList
+
+# Payment plans (matrix columns):
+# - CASH: cash/wire price, or base price when there is no cash price
+# - BASE: list price, used for interest-free promotions (total / installments)
+# - INSTALLMENTS_N: standard N-installment plan (monthly price * N), or base price if not offered
+PLANS = ("CASH", "BASE", "INSTALLMENTS_6", "INSTALLMENTS_9", "INSTALLMENTS_12")
+
+# Installment counts with a standard (non-promotional) price list column
+STANDARD_INSTALLMENTS = (6, 9, 12)
+
+
+def plan_for(payment_method: Optional[str], installments: Optional[int] = None, promotion_id: Optional[str] = None) -> str:
+    """Return the pricing plan for a payment method and (credit card) plan"""
+    if payment_method in (None, "CASH", "WIRE"):
+        return "CASH"
+    if promotion_id or installments not in STANDARD_INSTALLMENTS:
+        return "BASE"
+    return f"INSTALLMENTS_{installments}"
+
+
+class PricingMatrix:
+    """Unit prices in cents, one array per plan, aligned with the PriceList rows"""
+
+    def __init__(self, prices: PriceList):
+        self.prices = prices
+
+        def column(name: str) -> array:
+            return array('q', (max(v, 0) for v in prices.columns[name]))
+
+        base = column('base_price')
+        cash = column('cash_price')
+
+        self.columns: Dict[str, array] = {
+            "CASH": array('q', (c if c > 0 else b for c, b in zip(cash, base))),
+            "BASE": base,
+        }
+        for n in STANDARD_INSTALLMENTS:
+            monthly = column(f'installments_{n}')
+            self.columns[f"INSTALLMENTS_{n}"] = array('q', (m * n if m > 0 else b for m, b in zip(monthly, base)))
+
+    def unit_price(self, product_id: str, plan: str) -> int:
+        """Unit price of a product in cents for a plan (0 if the product has no prices)"""
+        row = self.prices.row(product_id)
+        return 0 if row is None else self.columns[plan][row]
+
+    def cart_totals(self, cart: Dict[str, int]) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Price a whole cart (product ID -> quantity) for every plan at once.
+
+        Returns (plan -> total in cents, IDs of products without prices).
+        """
+        rows, quantities, missing = [], [], []
+        for product_id, quantity in cart.items():
+            row = self.prices.row(product_id)
+            if row is None:
+                missing.append(product_id)
+                continue
+            rows.append(row)
+            quantities.append(quantity)
+
+        # Gather the cart rows of each column and take the dot product with the
+        # quantities; map/sum run in C, so there is no per-item Python loop
+        totals = {
+            plan: sum(map(mul, map(values.__getitem__, rows), quantities))
+            for plan, values in self.columns.items()
+        }
+        return totals, missing
@@ -0,0 +1,196 @@
+# src/agents/tools/product_repository.py
+"""
+Shared product repository.
+Loads the catalog and price list once, joins them by product ID and
+serves keyed lookups to every tool that needs product data.
+
+Prices are parsed once at load into integer cents, so money arithmetic
+downstream is exact and never re-parses CSV strings.
+"""
+
+import csv
+import re
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from loguru import logger
+
+from config import DATA_DIR
+from agents.tools.catalog_index import CatalogIndex
+
+# Path to data files
+CATALOG_FILE = DATA_DIR / "catalog.csv"
+PRICE_FILE = DATA_DIR / "price_list.csv"
+
+# Price list columns, in file order
+PRICE_COLUMNS = ("base_price", "cash_price", "installments_12", "installments_9", "installments_6")
+
+# Stored in the price arrays for blank or invalid values
+MISSING = -1
+
+# "435.094": dot-grouped thousands, as opposed to a decimal separator.
+# A dot followed by groups of exactly three digits is always read as
+# grouping, so "2.500" is 2500 pesos, never 2.5 (write "2,5" or "2.50")
+_THOUSANDS_RE = re.compile(r"^\d{1,3}(\.\d{3})+$")
+
+def load_catalog(path: Optional[Path] = None) -> List[Dict[str, str]]:
+    """Load catalog from CSV file"""
+    path = path or CATALOG_FILE
+    logger.debug(f"Loading catalog from: {path}")
+    products = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                products.append(row)
+        logger.debug(f"Loaded {len(products)} products from catalog")
+    except FileNotFoundError:
+        logger.error(f"Catalog file not found: {path}")
+    except Exception as e:
+        logger.exception(f"Error loading catalog: {e}")
+    return products
+
+def load_prices(path: Optional[Path] = None) -> Dict[str, Dict[str, str]]:
+    """Load prices from CSV file, indexed by product ID"""
+    path = path or PRICE_FILE
+    logger.debug(f"Loading prices from: {path}")
+    prices = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                prices[row['id']] = row
+        logger.debug(f"Loaded prices for {len(prices)} products")
+    except FileNotFoundError:
+        logger.error(f"Price file not found: {path}")
+    except Exception as e:
+        logger.exception(f"Error loading prices: {e}")
+    return prices
+
+
+def parse_price(value: Optional[str]) -> Optional[int]:
+    """
+    Parse a price list value into integer cents.
+
+    Values are whole pesos, optionally with Argentine separators: "." groups
+    thousands ("2.500" and "435.094" are 2500 and 435094) and "," marks the
+    decimals ("1500,50"). A dot with one or two digits after it ("1500.50")
+    is still read as decimals. Returns None for blank values; raises
+    ValueError for malformed ones.
+    """
+    value = (value or "").strip()
+    if not value or value == 'N/A':
+        return None
+    if _THOUSANDS_RE.match(value):
+        value = value.replace('.', '')
+    try:
+        amount = Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Invalid price: {value!r}")
+    if amount < 0:
+        raise ValueError(f"Negative price: {value!r}")
+    return int((amount * 100).to_integral_value())
+
+
+def format_price(cents: Optional[int]) -> str:
+    """Format integer cents as a price string (no decimals for whole amounts)"""
+    if cents is None:
+        return 'N/A'
+    pesos, cents = divmod(cents, 100)
+    return f"{pesos}.{cents:02d}" if cents else str(pesos)
+
+
+class PriceList:
+    """Price list in integer cents, stored as one compact array per column"""
+
+    def __init__(self, rows: Dict[str, Dict[str, str]]):
+        self._row_of: Dict[str, int] = {}
+        self.columns: Dict[str, array] = {column: array('q') for column in PRICE_COLUMNS}
+
+        invalid = 0
+        for product_id, row in rows.items():
+            self._row_of[product_id] = len(self._row_of)
+            for column in PRICE_COLUMNS:
+                try:
+                    cents = parse_price(row.get(column))
+                except ValueError as e:
+                    logger.warning(f"Product {product_id} {column}: {e}")
+                    cents, invalid = None, invalid + 1
+                self.columns[column].append(MISSING if cents is None else cents)
+
+        if invalid:
+            logger.warning(f"Ignored {invalid} invalid values in the price list")
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._row_of
+
+    def row(self, product_id: str) -> Optional[int]:
+        """Return the position of a product in the column arrays, or None"""
+        return self._row_of.get(product_id)
+
+    def get(self, product_id: str, column: str) -> Optional[int]:
+        """Return a price in cents, or None if the product or value is missing"""
+        row = self._row_of.get(product_id)
+        if row is None:
+            return None
+        cents = self.columns[column][row]
+        return None if cents == MISSING else cents
+
+    def prices(self, product_id: str) -> Dict[str, Optional[int]]:
+        """Return every price column for a product, in cents"""
+        return {column: self.get(product_id, column) for column in PRICE_COLUMNS}
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """A catalog entry; its prices live in the repository's PriceList"""
+    id: str
+    description: str
+
+
+class ProductRepository:
+    """Products keyed by ID, in catalog order, with a search index over descriptions"""
+
+    def __init__(self, catalog: List[Dict[str, str]], prices: Dict[str, Dict[str, str]]):
+        self.products: List[Product] = [
+            Product(id=row['id'], description=row['description'])
+            for row in catalog
+        ]
+        self._by_id: Dict[str, Product] = {p.id: p for p in self.products}
+        self.prices = PriceList(prices)
+        self.index = CatalogIndex([p.description for p in self.products])
+
+        missing = sum(1 for p in self.products if p.id not in self.prices)
+        if missing:
+            logger.warning(f"{missing} catalog products have no price list entry")
+
+    @classmethod
+    def load(cls, catalog_file: Optional[Path] = None, price_file: Optional[Path] = None) -> "ProductRepository":
+        """Load the repository from the catalog and price list files"""
+        return cls(load_catalog(catalog_file), load_prices(price_file))
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self.products)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._by_id
+
+    def get(self, product_id: str) -> Optional[Product]:
+        """Return the product with the given ID, or None"""
+        return self._by_id.get(product_id)
+
+    def price(self, product_id: str, column: str) -> Optional[int]:
+        """Return a product's price in cents for a price list column, or None"""
+        return self.prices.get(product_id, column)
+
+    def get_many(self, product_ids: Iterable[str]) -> Dict[str, Optional[Product]]:
+        """Return the products for several IDs at once (None for unknown IDs), in request order"""
+        return {product_id: self._by_id.get(product_id) for product_id in product_ids}
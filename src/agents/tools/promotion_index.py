@@ -0,0 +1,234 @@
+# src/agents/tools/promotion_index.py
+"""
+Bitset index over promotions.
+Each bank, credit card and installment count maps to an integer mask with
+one bit per promotion, so a query is an OR within each criterion and an
+AND across criteria.
+
+Availability windows are parsed once into a sorted list of boundaries;
+the mask of active promotions is cached until the next boundary passes.
+"""
+
+import json
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from config import DATA_DIR
+
+# Path to promotions file
+PROMOTIONS_FILE = DATA_DIR / "promotions.json"
+
+# Card names used by consultants -> names used in the promotions file
+CARD_ALIASES = {
+    "MASTERCARD": "MASTER",
+    "AMERICAN EXPRESS": "AMEX",
+    "AMERICAN_EXPRESS": "AMEX",
+    "NARANJA": "NAR",
+}
+
+# Availability ends are inclusive: a promotion stops being active one tick after its end
+_TICK = timedelta(microseconds=1)
+
+
+def load_promotions(path: Optional[Path] = None) -> List[dict]:
+    """Load promotions from JSON file"""
+    path = path or PROMOTIONS_FILE
+    logger.debug(f"Loading promotions from: {path}")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            promotions = json.load(f)
+        logger.debug(f"Loaded {len(promotions)} promotions")
+        return promotions
+    except FileNotFoundError:
+        logger.error(f"Promotions file not found: {path}")
+        return []
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON in promotions file: {e}")
+        return []
+    except Exception as e:
+        logger.exception(f"Error loading promotions: {e}")
+        return []
+
+
+def normalize_bank(bank: str) -> str:
+    """Canonical bank key (e.g. "bco neuquen" -> "BCO_NEUQUEN")"""
+    return "_".join(bank.upper().split())
+
+
+def normalize_card(card: str) -> str:
+    """Canonical credit card key, resolving aliases (e.g. "Mastercard" -> "MASTER")"""
+    key = " ".join(card.upper().split())
+    return CARD_ALIASES.get(key, key)
+
+
+def _bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits of a mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PromotionIndex:
+    """Promotions indexed by bank, credit card and installments as bitmasks"""
+
+    def __init__(self, promotions: List[dict]):
+        self.promotions = promotions
+        self.all = (1 << len(promotions)) - 1
+        self.by_bank: Dict[str, int] = {}
+        self.by_card: Dict[str, int] = {}
+        self.by_installments: Dict[int, int] = {}
+        self._position: Dict[str, int] = {}
+
+        for position, promo in enumerate(promotions):
+            bit = 1 << position
+            self._position.setdefault(promo['id'], position)
+            for bank in map(normalize_bank, promo.get('banks', [])):
+                self.by_bank[bank] = self.by_bank.get(bank, 0) | bit
+            for card in map(normalize_card, promo.get('credit_cards', [])):
+                self.by_card[card] = self.by_card.get(card, 0) | bit
+            for n in promo.get('installments', []):
+                self.by_installments[n] = self.by_installments.get(n, 0) | bit
+
+    def __len__(self) -> int:
+        return len(self.promotions)
+
+    def get(self, promotion_id: str) -> Optional[dict]:
+        """Return the promotion with the given ID, or None"""
+        position = self._position.get(promotion_id)
+        return None if position is None else self.promotions[position]
+
+    def mask_of(self, promotion_id: str) -> int:
+        """Return the bit of a promotion (0 if unknown)"""
+        position = self._position.get(promotion_id)
+        return 0 if position is None else 1 << position
+
+    @staticmethod
+    def _any_of(index: Dict, keys: Iterable) -> int:
+        """OR of the masks of every key"""
+        mask = 0
+        for key in keys:
+            mask |= index.get(key, 0)
+        return mask
+
+    def match(
+        self,
+        banks: Optional[Iterable[str]] = None,
+        credit_cards: Optional[Iterable[str]] = None,
+        installments: Optional[Iterable[int]] = None,
+        within: Optional[int] = None
+    ) -> int:
+        """
+        Return the mask of promotions matching any of the given banks AND any
+        of the given cards AND any of the given installments. Empty or None
+        criteria are not applied. ``within`` restricts the result to a mask.
+        """
+        mask = self.all if within is None else within
+        if banks:
+            mask &= self._any_of(self.by_bank, map(normalize_bank, banks))
+        if credit_cards:
+            mask &= self._any_of(self.by_card, map(normalize_card, credit_cards))
+        if installments:
+            mask &= self._any_of(self.by_installments, installments)
+        return mask
+
+    def select(self, mask: int) -> List[dict]:
+        """Return the promotions in a mask, in file order"""
+        return [self.promotions[position] for position in _bits(mask)]
+
+    def positions(self, mask: int) -> List[int]:
+        """Return the positions of the promotions in a mask, in file order"""
+        return list(_bits(mask))
+
+    def accepts(
+        self,
+        position: int,
+        banks: Iterable[str] = (),
+        credit_cards: Iterable[str] = (),
+        installments: Iterable[int] = ()
+    ) -> Tuple[List[str], List[str], List[int]]:
+        """Return which of the given banks, cards and installments a promotion accepts"""
+        bit = 1 << position
+        return (
+            [b for b in banks if self.by_bank.get(normalize_bank(b), 0) & bit],
+            [c for c in credit_cards if self.by_card.get(normalize_card(c), 0) & bit],
+            [n for n in installments if self.by_installments.get(n, 0) & bit],
+        )
+
+
+def parse_window(promotion: dict) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Parse a promotion's availability into a (start, end) window, both inclusive.
+    Returns None if the promotion is never available.
+    """
+    availability = promotion.get('availability', {})
+    avail_type = availability.get('type', 'always')
+
+    if avail_type == 'always':
+        return datetime.min, datetime.max
+    elif avail_type == 'date_range':
+        start = datetime.fromisoformat(availability.get('start', ''))
+        end = datetime.fromisoformat(availability.get('end', ''))
+        return start, end
+
+    return None
+
+
+class AvailabilitySchedule:
+    """Active-promotion masks over time, recomputed only when a window boundary passes"""
+
+    def __init__(self, promotions: List[dict]):
+        self.windows: List[Tuple[int, datetime, datetime]] = []
+        for position, promo in enumerate(promotions):
+            try:
+                window = parse_window(promo)
+            except ValueError as e:
+                logger.warning(f"Invalid availability for promotion {promo.get('id')}: {e}")
+                window = None
+            if window:
+                self.windows.append((position, *window))
+
+        # Sorted instants at which the active set can change
+        boundaries = set()
+        for _, start, end in self.windows:
+            if start != datetime.min:
+                boundaries.add(start)
+            if end != datetime.max:
+                boundaries.add(end + _TICK)
+        self.boundaries: List[datetime] = sorted(boundaries)
+
+        # (valid from, valid until, active mask) of the last computation
+        self._cached: Optional[Tuple[datetime, datetime, int]] = None
+
+    def _compute(self, current_date: datetime) -> int:
+        mask = 0
+        for position, start, end in self.windows:
+            if start <= current_date <= end:
+                mask |= 1 << position
+        return mask
+
+    def active_mask(self, current_date: Optional[datetime] = None) -> int:
+        """Return the mask of promotions available at the given time (default: now)"""
+        if current_date is None:
+            current_date = datetime.now()
+
+        cached = self._cached
+        if cached is not None and cached[0] <= current_date < cached[1]:
+            return cached[2]
+
+        slot = bisect_right(self.boundaries, current_date)
+        valid_from = self.boundaries[slot - 1] if slot > 0 else datetime.min
+        valid_until = self.boundaries[slot] if slot < len(self.boundaries) else datetime.max
+        mask = self._compute(current_date)
+        self._cached = (valid_from, valid_until, mask)
+        return mask
+
+    def next_change(self, current_date: Optional[datetime] = None) -> Optional[datetime]:
+        """Return the next instant at which the active set changes, if any"""
+        if current_date is None:
+            current_date = datetime.now()
+        slot = bisect_right(self.boundaries, current_date)
+        return self.boundaries[slot] if slot < len(self.boundaries) else None
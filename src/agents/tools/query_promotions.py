@@ -3,112 +3,173 @@
 Promotion query tools for the promotions agent.
 """
 
-import json
+from dataclasses import dataclass
 from typing import List, Optional
 from datetime import datetime
 from loguru import logger
-from langchain.tools import tool
-
-from config import DATA_DIR
-
-# Path to promotions file
-PROMOTIONS_FILE = DATA_DIR / "promotions.json"
-
-def load_promotions() -> List[dict]:
-    """Load promotions from JSON file"""
-    logger.debug(f"Loading promotions from: {PROMOTIONS_FILE}")
-    try:
-        with open(PROMOTIONS_FILE, 'r', encoding='utf-8') as f:
-            promotions = json.load(f)
-        logger.debug(f"Loaded {len(promotions)} promotions")
-        return promotions
-    except FileNotFoundError:
-        logger.error(f"Promotions file not found: {PROMOTIONS_FILE}")
-        return []
-    except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON in promotions file: {e}")
-        return []
-    except Exception as e:
-        logger.exception(f"Error loading promotions: {e}")
-        return []
+from langchain_core.tools import tool
+
+from agents.tools.data_manager import data_manager
+from agents.tools.promotion_index import parse_window
+from agents.tools.promotion_index import PROMOTIONS_FILE, load_promotions  # noqa: F401 (re-exported)
+from agents.tools.tool_output import compact_output, table
 
 def is_promotion_available(promotion: dict, current_date: datetime = None) -> bool:
     """Check if a promotion is currently available"""
     if current_date is None:
         current_date = datetime.now()
 
-    availability = promotion.get('availability', {})
-    avail_type = availability.get('type', 'always')
+    window = parse_window(promotion)
+    if window is None:
+        return False
+
+    start, end = window
+    return start <= current_date <= end
+
+def _reimbursement_text(reimbursement) -> str:
+    """Short text of a promotion's reimbursement (a dict or plain text), for one-line formats"""
+    if not reimbursement:
+        return ""
+    if isinstance(reimbursement, dict):
+        return reimbursement.get('description') or ";".join(f"{k}:{v}" for k, v in reimbursement.items())
+    return str(reimbursement)
+
+@dataclass
+class PromotionMatch:
+    """An available promotion matching a query, with the requested values it accepts"""
+    promotion: dict
+    banks: List[str]
+    credit_cards: List[str]
+    installments: List[int]
+
+
+def find_promotions(
+    banks: Optional[List[str]] = None,
+    credit_cards: Optional[List[str]] = None,
+    installments: Optional[List[int]] = None,
+    current_date: datetime = None
+) -> List[PromotionMatch]:
+    """
+    Return the available promotions accepting any of the banks AND any of the
+    cards AND any of the installments, evaluated in one pass over the index.
+    Empty criteria are not applied; the match then lists everything the promotion accepts.
+    """
+    snapshot = data_manager.current()
+    index = snapshot.promotion_index
+    mask = index.match(banks, credit_cards, installments, within=snapshot.availability.active_mask(current_date))
+
+    matches = []
+    for position in index.positions(mask):
+        promo = index.promotions[position]
+        accepted_banks, accepted_cards, accepted_installments = index.accepts(
+            position, banks or (), credit_cards or (), installments or ()
+        )
+        matches.append(PromotionMatch(
+            promotion=promo,
+            banks=accepted_banks if banks else promo.get('banks', []),
+            credit_cards=accepted_cards if credit_cards else promo.get('credit_cards', []),
+            installments=accepted_installments if installments else promo.get('installments', [])
+        ))
+    return matches
+
+
+def format_promotion_matches(
+    matches: List[PromotionMatch],
+    banks: Optional[List[str]] = None,
+    credit_cards: Optional[List[str]] = None,
+    installments: Optional[List[int]] = None
+) -> str:
+    """Format promotion matches compactly, one line per promotion"""
+    filters = []
+    if banks:
+        filters.append(f"banks: {', '.join(banks)}")
+    if credit_cards:
+        filters.append(f"credit cards: {', '.join(credit_cards)}")
+    if installments:
+        filters.append(f"installments: {', '.join(map(str, installments))}")
+    filter_str = "; ".join(filters) if filters else "any criteria"
+
+    if not matches:
+        return f"No available promotions for {filter_str}"
+
+    lines = []
+    for match in matches:
+        promo = match.promotion
+        line = (
+            f"- {promo['name']} (ID: {promo['id']}): "
+            f"{'/'.join(match.banks)} + {'/'.join(match.credit_cards)} "
+            f"in {', '.join(map(str, match.installments))} installments"
+        )
+
+        wallets = promo.get('wallets', [])
+        if wallets:
+            wallet_info = [f"{w['name']} ({'optional' if w.get('is_optional') else 'required'})" for w in wallets]
+            line += f" | Wallets: {', '.join(wallet_info)}"
 
-    if avail_type == 'always':
-        return True
-    elif avail_type == 'date_range':
-        start = datetime.fromisoformat(availability.get('start', ''))
-        end = datetime.fromisoformat(availability.get('end', ''))
-        return start <= current_date <= end
+        reimbursement = _reimbursement_text(promo.get('reimbursement'))
+        if reimbursement:
+            line += f" | Reimbursement: {reimbursement}"
 
-    return False
+        lines.append(line)
 
-# Load promotions in-memory
-promotions = load_promotions()
+    return f"Found {len(matches)} available promotions for {filter_str}:\n" + "\n".join(lines)
 
 @tool
 def search_promotions(
-    bank: Optional[str] = None,
-    credit_card: Optional[str] = None,
-    installments: Optional[int] = None
+    banks: Optional[List[str]] = None,
+    credit_cards: Optional[List[str]] = None,
+    installments: Optional[List[int]] = None
 ) -> str:
     """
     Search for available promotions based on bank, credit card, and installment criteria.
 
     Args:
-        bank: Bank name (e.g., "GALICIA", "MACRO")
-        credit_card: Credit card brand (e.g., "VISA", "MASTERCARD", "AMEX")
-        installments: Number of installments desired (e.g., 3, 6, 9, 12)
+        banks: Bank names (e.g., ["GALICIA"], ["GALICIA", "MACRO"])
+        credit_cards: Credit card brands (e.g., ["VISA"], ["VISA", "MASTERCARD", "AMEX"])
+        installments: Numbers of installments desired (e.g., [12], [3, 6, 9, 12])
 
     Note:
-        Any parameter set to None is ignored and will not be used as a filter.
-        Only the provided (non-None) parameters are applied when searching promotions.
+        A promotion matches if it accepts any of the given banks AND any of the
+        given credit cards AND any of the given installment counts.
+        Any parameter set to None (or empty) is ignored and will not be used as a filter.
     """
-    logger.info(f"Searching promotions - bank: {bank}, card: {credit_card}, installments: {installments}")
-
-    matches = []
-
-    for promo in promotions:
-        # Check if promotion is currently available
-        if not is_promotion_available(promo):
-            continue
+    logger.info(f"Searching promotions - banks: {banks}, cards: {credit_cards}, installments: {installments}")
 
-        # Filter by bank
-        if bank and bank.upper() not in [b.upper() for b in promo.get('banks', [])]:
-            continue
-
-        # Filter by credit card
-        if credit_card:
-            cards = [c.upper() for c in promo.get('credit_cards', [])]
-            if credit_card.upper() not in cards:
-                continue
-
-        # Filter by installments
-        if installments and installments not in promo.get('installments', []):
-            continue
-
-        matches.append(promo)
+    snapshot = data_manager.current()
+    index = snapshot.promotion_index
+    mask = index.match(banks, credit_cards, installments, within=snapshot.availability.active_mask())
+    matches = index.select(mask)
 
     logger.debug(f"Found {len(matches)} matching promotions")
 
     if not matches:
         filters = []
-        if bank:
-            filters.append(f"bank: {bank}")
-        if credit_card:
-            filters.append(f"credit card: {credit_card}")
+        if banks:
+            filters.append(f"banks: {', '.join(banks)}")
+        if credit_cards:
+            filters.append(f"credit cards: {', '.join(credit_cards)}")
         if installments:
-            filters.append(f"installments: {installments}")
+            filters.append(f"installments: {', '.join(map(str, installments))}")
 
         filter_str = ", ".join(filters) if filters else "the given criteria"
         return f"No promotions found for {filter_str}"
 
+    if compact_output():
+        rows = [
+            (
+                promo['id'],
+                promo['name'],
+                promo['banks'],
+                promo['credit_cards'],
+                promo['installments'],
+                [w['name'] for w in promo.get('wallets', [])],
+                _reimbursement_text(promo.get('reimbursement'))
+            )
+            for promo in matches
+        ]
+        return f"Found {len(matches)} promotions:\n" + \
+            table(["id", "name", "banks", "cards", "inst", "wallets", "reimb"], rows)
+
     # Format results
     results = []
     for promo in matches:
@@ -140,13 +201,14 @@ def get_promotion_by_id(promotion_id: str) -> str:
     """
     logger.info(f"Getting promotion details for ID: {promotion_id}")
 
-    promo = next((p for p in promotions if p['id'] == promotion_id), None)
+    snapshot = data_manager.current()
+    promo = snapshot.promotion_index.get(promotion_id)
 
     if not promo:
         logger.warning(f"Promotion not found: {promotion_id}")
         return f"Promotion with ID {promotion_id} not found"
 
-    if not is_promotion_available(promo):
+    if not snapshot.availability.active_mask() & snapshot.promotion_index.mask_of(promotion_id):
         logger.info(f"Promotion {promotion_id} is not currently available")
         return f"Promotion {promotion_id} is not currently available"
 
@@ -179,13 +241,25 @@ def list_all_promotions() -> str:
     """List all currently available promotions"""
     logger.info("Listing all available promotions")
 
-    available = [p for p in promotions if is_promotion_available(p)]
+    snapshot = data_manager.current()
+    available = snapshot.promotion_index.select(snapshot.availability.active_mask())
 
-    logger.debug(f"Found {len(available)} available promotions out of {len(promotions)} total")
+    logger.debug(f"Found {len(available)} available promotions out of {len(snapshot.promotion_index)} total")
 
     if not available:
         return "No promotions are currently available"
 
+    if compact_output():
+        rows = [
+            (
+                promo['id'],
+                promo['name'],
+                promo['banks'][:2] + ([f"+{len(promo['banks']) - 2}"] if len(promo['banks']) > 2 else [])
+            )
+            for promo in available
+        ]
+        return f"Available Promotions ({len(available)}):\n" + table(["id", "name", "banks"], rows)
+
     results = []
     for promo in available:
         results.append(
@@ -0,0 +1,92 @@
+# src/agents/tools/response_cache.py
+"""
+Bounded TTL/LRU cache for sub-agent responses.
+
+Entries are tagged with the data snapshot version they were computed
+from; when a lookup asks for a new snapshot version the whole cache is
+dropped, so a reload never serves answers about the old catalog or
+prices. Answers computed from a replaced version are discarded, so a
+slow lookup that started before the reload cannot roll the cache back.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple
+
+# Default bounds for sub-agent response caches
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 15 * 60
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._retired: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: str) -> bool:
+        """Switch to a newly seen version; False for versions already replaced"""
+        if version == self._version:
+            return True
+        if version in self._retired:
+            return False
+        if self._version is not None:
+            self._retired.add(self._version)
+        self._entries.clear()
+        self._version = version
+        return True
+
+    def get(self, key: Hashable, version: str) -> Optional[str]:
+        """Return the cached value for a key and snapshot version, or None"""
+        with self._lock:
+            entry = self._entries.get(key) if self._check_version(version) else None
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: str, value: str):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            # Only lookups switch versions: a late answer about an older snapshot is dropped
+            if self._version is None:
+                self._version = version
+            if version != self._version:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -3,94 +3,115 @@
 Catalog search tools for the product catalog agent.
 """
 
-import csv
-from typing import List, Dict
+from typing import List, Optional
 from loguru import logger
-from langchain.tools import tool
-
-from config import DATA_DIR
-
-# Path to data files
-CATALOG_FILE = DATA_DIR / "catalog.csv"
-PRICE_FILE = DATA_DIR / "price_list.csv"
-
-def load_catalog() -> List[Dict[str, str]]:
-    """Load catalog from CSV file"""
-    logger.debug(f"Loading catalog from: {CATALOG_FILE}")
-    products = []
-    try:
-        with open(CATALOG_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                products.append(row)
-        logger.debug(f"Loaded {len(products)} products from catalog")
-    except FileNotFoundError:
-        logger.error(f"Catalog file not found: {CATALOG_FILE}")
-    except Exception as e:
-        logger.exception(f"Error loading catalog: {e}")
-    return products
-
-def load_prices() -> Dict[str, Dict[str, str]]:
-    """Load prices from CSV file, indexed by product ID"""
-    logger.debug(f"Loading prices from: {PRICE_FILE}")
-    prices = {}
-    try:
-        with open(PRICE_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                prices[row['id']] = row
-        logger.debug(f"Loaded prices for {len(prices)} products")
-    except FileNotFoundError:
-        logger.error(f"Price file not found: {PRICE_FILE}")
-    except Exception as e:
-        logger.exception(f"Error loading prices: {e}")
-    return prices
-
-# Load catalog in-memory
-catalog = load_catalog()
-prices = load_prices()
+from langchain_core.tools import tool
+
+from agents.tools.data_manager import data_manager
+from agents.tools.product_repository import Product, ProductRepository, format_price
+from agents.tools.product_repository import load_catalog, load_prices  # noqa: F401 (re-exported)
+from agents.tools.tool_output import SAME_AS_BASE, compact_output, table
+
+# Maximum number of products returned per search call
+PAGE_SIZE = 20
+
+# Compact format: product detail columns (installment prices are per month)
+DETAIL_COLUMNS = ["id", "desc", "base", "cash", "12x", "9x", "6x"]
+DETAIL_NOTE = f"Prices in $; 12x/9x/6x per month; cash '{SAME_AS_BASE}' is same as base"
 
 @tool
-def search_products(query: str) -> str:
+def search_products(query: str, offset: int = 0) -> str:
     """
     Search for products in the catalog by name or description.
-    Returns matching products with their IDs, descriptions, and prices.
+    Returns matching products with their IDs, descriptions, and prices,
+    most relevant first, up to 20 per page.
 
     Args:
         query: Search term to find products (e.g., "sarten", "cacerola", "combo")
+        offset: Number of results to skip, to get the next page of a broad search
     """
-    logger.info(f"Searching products with query: '{query}'")
+    logger.info(f"Searching products with query: '{query}' (offset: {offset})")
 
-    # Simple case-insensitive substring search
-    query_lower = query.lower()
-    matches = [
-        p for p in catalog
-        if query_lower in p['description'].lower()
-    ]
+    # Ranked token search over the prebuilt index (case and accent insensitive)
+    offset = max(offset, 0)
+    repository = data_manager.current().repository
+    total, page = repository.index.rank(query, limit=PAGE_SIZE, offset=offset)
 
-    logger.debug(f"Found {len(matches)} matches for query '{query}'")
+    logger.debug(f"Found {total} matches for query '{query}'")
 
-    if not matches:
+    if not total:
         return f"No products found matching '{query}'"
 
-    # Format results
-    results = []
-    for product in matches[:20]:  # Limit to 20 results
-        product_id = product['id']
-        description = product['description']
-
-        price_info = prices.get(product_id, {})
-        base_price = price_info.get('base_price', 'N/A')
-        cash_price = price_info.get('cash_price', 'N/A')
-
-        results.append(
-            f"ID: {product_id}\n"
-            f"Description: {description}\n"
-            f"Base Price: ${base_price}\n"
-            f"Cash Price: ${cash_price if cash_price != '0' else 'Same as base'}\n"
-        )
-
-    return f"Found {len(matches)} products:\n\n" + "\n---\n".join(results)
+    if not page:
+        return f"Found {total} products matching '{query}', but none after offset {offset}"
+
+    products = [repository.products[i] for i in page]
+    if compact_output():
+        rows = []
+        for product in products:
+            cash_price = repository.price(product.id, 'cash_price')
+            rows.append((
+                product.id,
+                product.description,
+                format_price(repository.price(product.id, 'base_price')),
+                format_cash_price(cash_price, SAME_AS_BASE)
+            ))
+        output = f"Found {total} products (prices in $; cash '{SAME_AS_BASE}' is same as base):\n" + \
+            table(["id", "desc", "base", "cash"], rows)
+    else:
+        # Format results
+        results = []
+        for product in products:
+            product_id = product.id
+            description = product.description
+
+            base_price = repository.price(product_id, 'base_price')
+            cash_price = repository.price(product_id, 'cash_price')
+
+            results.append(
+                f"ID: {product_id}\n"
+                f"Description: {description}\n"
+                f"Base Price: ${format_price(base_price)}\n"
+                f"Cash Price: ${format_cash_price(cash_price)}\n"
+            )
+
+        output = f"Found {total} products:\n\n" + "\n---\n".join(results)
+
+    shown = offset + len(page)
+    if offset or shown < total:
+        output += f"\n\nShowing results {offset + 1}-{shown} of {total}."
+        if shown < total:
+            output += f" Use offset={shown} to see more."
+
+    return output
+
+def format_cash_price(cents: Optional[int], same_as_base: str = "Same as base") -> str:
+    """Format a cash price, where 0 means the product has none and sells at the base price"""
+    return same_as_base if cents == 0 else format_price(cents)
+
+def format_product_details(repository: ProductRepository, product: Product) -> str:
+    """Format the full pricing details of a product"""
+    price_info = repository.prices.prices(product.id)
+
+    result = f"Product ID: {product.id}\n"
+    result += f"Description: {product.description}\n"
+    result += f"Base Price: ${format_price(price_info['base_price'])}\n"
+    result += f"Cash/Wire Price: ${format_cash_price(price_info['cash_price'])}\n"
+    result += f"12 Installments: ${format_price(price_info['installments_12'])}/month\n"
+    result += f"9 Installments: ${format_price(price_info['installments_9'])}/month\n"
+    result += f"6 Installments: ${format_price(price_info['installments_6'])}/month\n"
+
+    return result
+
+def product_details_row(repository: ProductRepository, product: Product) -> list:
+    """The DETAIL_COLUMNS of a product, for the compact format"""
+    price_info = repository.prices.prices(product.id)
+    return [
+        product.id,
+        product.description,
+        format_price(price_info['base_price']),
+        format_cash_price(price_info['cash_price'], SAME_AS_BASE),
+    ] + [format_price(price_info[column]) for column in ('installments_12', 'installments_9', 'installments_6')]
 
 @tool
 def get_product_by_id(product_id: str) -> str:
@@ -102,22 +123,46 @@ def get_product_by_id(product_id: str) -> str:
     """
     logger.info(f"Getting product details for ID: {product_id}")
 
-    # Find product in catalog
-    product = next((p for p in catalog if p['id'] == product_id), None)
+    repository = data_manager.current().repository
+    product = repository.get(product_id)
 
     if not product:
         logger.warning(f"Product not found: {product_id}")
         return f"Product with ID {product_id} not found"
 
-    # Get price information
-    price_info = prices.get(product_id, {})
+    if compact_output():
+        return f"{DETAIL_NOTE}:\n" + table(DETAIL_COLUMNS, [product_details_row(repository, product)])
+    return format_product_details(repository, product)
 
-    result = f"Product ID: {product_id}\n"
-    result += f"Description: {product['description']}\n"
-    result += f"Base Price: ${price_info.get('base_price', 'N/A')}\n"
-    result += f"Cash/Wire Price: ${price_info.get('cash_price', 'N/A')}\n"
-    result += f"12 Installments: ${price_info.get('installments_12', 'N/A')}/month\n"
-    result += f"9 Installments: ${price_info.get('installments_9', 'N/A')}/month\n"
-    result += f"6 Installments: ${price_info.get('installments_6', 'N/A')}/month\n"
+@tool
+def get_multiple_products(product_ids: List[str]) -> str:
+    """
+    Get detailed information about several products at once by their IDs.
+
+    Args:
+        product_ids: List of unique product identifiers (e.g., ["80010010", "38252430"])
+    """
+    logger.info(f"Getting product details for IDs: {product_ids}")
 
-    return result
\ No newline at end of file
+    repository = data_manager.current().repository
+    found = repository.get_many(product_ids)
+
+    if compact_output():
+        rows = [product_details_row(repository, product) for product in found.values() if product]
+        missing = [product_id for product_id, product in found.items() if not product]
+        for product_id in missing:
+            logger.warning(f"Product not found: {product_id}")
+        output = f"{DETAIL_NOTE}:\n" + table(DETAIL_COLUMNS, rows) if rows else ""
+        if missing:
+            output += ("\n" if output else "") + f"Not found: {', '.join(missing)}"
+        return output
+
+    results = []
+    for product_id, product in found.items():
+        if not product:
+            logger.warning(f"Product not found: {product_id}")
+            results.append(f"Product with ID {product_id} not found\n")
+        else:
+            results.append(format_product_details(repository, product))
+
+    return "\n---\n".join(results)
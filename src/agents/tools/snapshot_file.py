@@ -0,0 +1,140 @@
+# src/agents/tools/snapshot_file.py
+"""
+Precompiled binary data snapshot.
+
+Stores a fully built DataSnapshot (products, price arrays, promotions and
+all indexes) so short-lived processes skip CSV/JSON parsing and index
+building. The file is keyed by the content hash of the source files, by
+a hash of the source code of the modules that parse and index them, and
+by a format version; a stale or unreadable file is ignored and the data
+manager falls back to the source files.
+
+It is opt-in (export DATA_SNAPSHOT=1, or a path): at the size of the shipped
+catalog, loading the snapshot takes about as long as rebuilding, so it
+only pays off for much larger catalogs. Only enable it where the cache
+directory is not writable by others, since the file is unpickled.
+
+Build it with:
+    python -m agents.tools.snapshot_file
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+from functools import cache
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Optional
+from loguru import logger
+
+from config import CACHE_DIR
+
+# Default location of the compiled snapshot
+SNAPSHOT_FILE = CACHE_DIR / "data_snapshot.bin"
+
+# Environment variable enabling the snapshot: "1" for the default location, or a path
+SNAPSHOT_ENV = "DATA_SNAPSHOT"
+
+# Bump whenever the layout of the snapshot file changes
+FORMAT_VERSION = 4
+
+# Modules whose code decides what a snapshot holds (parsing, normalization, indexing)
+INDEX_MODULES = [
+    "agents.tools.catalog_index",
+    "agents.tools.product_repository",
+    "agents.tools.pricing",
+    "agents.tools.promotion_index",
+    "agents.tools.data_manager",
+]
+
+# magic, format version, source hash, code hash (16 hex chars each), payload length
+_MAGIC = b"ESSENSNP"
+_HEADER = struct.Struct("<8sI16s16sQ")
+
+
+def snapshot_path() -> Optional[Path]:
+    """
+    The snapshot file selected by DATA_SNAPSHOT, or None when snapshots are off.
+    Read from the process environment, not .env: the data is loaded at import,
+    before dotenv is (see config.load_environment).
+    """
+    value = os.environ.get(SNAPSHOT_ENV, "").strip()
+    if value.lower() in ("", "0", "false", "no"):
+        return None
+    return SNAPSHOT_FILE if value.lower() in ("1", "true", "yes") else Path(value)
+
+
+@cache
+def code_version() -> str:
+    """Hash of the source of the indexing modules: a snapshot built by other code is stale"""
+    digest = hashlib.sha256()
+    for name in INDEX_MODULES:
+        digest.update(name.encode())
+        digest.update(Path(find_spec(name).origin).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def write_snapshot(snapshot: Any, path: Path = SNAPSHOT_FILE) -> Path:
+    """Write a snapshot atomically (temp file + rename)"""
+    payload = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+    header = _HEADER.pack(
+        _MAGIC, FORMAT_VERSION, snapshot.version.encode("ascii"), code_version().encode("ascii"), len(payload)
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp, path)
+
+    logger.info(f"Wrote data snapshot {snapshot.version} to {path} ({_HEADER.size + len(payload)} bytes)")
+    return path
+
+
+def read_snapshot(version: str, path: Path = SNAPSHOT_FILE) -> Optional[Any]:
+    """
+    Load the snapshot for the given source hash. Returns None if the file is
+    missing, stale (other data or indexing code), from another format version or corrupt.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, format_version, source_hash, code_hash, length = _HEADER.unpack(header)
+            if magic != _MAGIC or format_version != FORMAT_VERSION:
+                logger.debug(f"Ignoring snapshot {path}: unknown format")
+                return None
+            if source_hash.decode("ascii") != version:
+                logger.debug(f"Ignoring stale snapshot {path}")
+                return None
+            if code_hash.decode("ascii") != code_version():
+                logger.debug(f"Ignoring snapshot {path}: built by other indexing code")
+                return None
+            payload = f.read(length)
+    except FileNotFoundError:
+        return None
+
+    try:
+        snapshot = pickle.loads(payload)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    logger.debug(f"Loaded data snapshot {version} from {path}")
+    return snapshot
+
+
+def main():
+    """Compile the current data files into a snapshot"""
+    from agents.tools.data_manager import DataManager
+
+    manager = DataManager(snapshot_file=None)
+    path = write_snapshot(manager.current(), snapshot_path() or SNAPSHOT_FILE)
+    print(f"Snapshot {manager.current().version} written to {path} (used when {SNAPSHOT_ENV} is set)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# src/agents/tools/tool_output.py
+"""
+Output formats for the catalog and promotion tools.
+
+Tool results are fed back through the sub-agent and coordinator contexts,
+so their size is paid for again on every later model call. The compact
+format (TOOL_OUTPUT=compact) renders them as tab-separated tables with
+short column headers; a column holding the same non-empty value on every
+row is written once, as "header=value" above the table, instead of per row.
+"""
+
+import os
+from typing import Any, Sequence
+
+from config import load_environment
+
+# Environment variable selecting the format: "verbose" (default) or "compact"
+TOOL_OUTPUT_ENV = "TOOL_OUTPUT"
+
+# Compact cell for a cash price equal to the base price (no separate cash price)
+SAME_AS_BASE = "-"
+
+
+def compact_output() -> bool:
+    """True when tools should answer with compact tables"""
+    load_environment()
+    return os.environ.get(TOOL_OUTPUT_ENV, "verbose").lower() == "compact"
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(map(str, value))
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def table(headers: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Tab-separated table, with the columns shared by all rows (of several) hoisted above it"""
+    cells = [[_cell(value) for value in row] for row in rows]
+    shared = [
+        i for i in range(len(headers))
+        if len(cells) > 1 and cells[0][i] and len({row[i] for row in cells}) == 1
+    ]
+    if len(shared) == len(headers):
+        shared = []
+    columns = [i for i in range(len(headers)) if i not in shared]
+
+    lines = []
+    if shared:
+        lines.append(" ".join(f"{headers[i]}={cells[0][i]}" for i in shared))
+    lines.append("\t".join(headers[i] for i in columns))
+    lines.extend("\t".join(row[i] for i in columns) for row in cells)
+    return "\n".join(lines)
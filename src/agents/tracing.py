@@ -0,0 +1,217 @@
+# src/agents/tracing.py
+"""
+Local span tracing of agent turns.
+
+SpanTracer is a callback handler that turns the runs of a turn into spans
+with parent/child IDs: agent graphs (the coordinator and the sub-agents
+its tools invoke), graph nodes, tool calls and LLM calls. Internal
+runnables in between are skipped and their children attached to the
+nearest kept span, so a lookup reads
+coordinator > tools > lookup_products > catalog_agent > model.
+
+Each finished span is appended as one JSON line to a local file; no
+collector is needed. The file can be converted to the Chrome trace event
+format (chrome://tracing, Perfetto, speedscope) for a flame-graph timeline:
+
+    cd src && python -m agents.tracing ../logs/spans.jsonl -o trace.json
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from functools import cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from loguru import logger
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import load_environment
+
+
+class SpanTracer(BaseCallbackHandler):
+    """Callback handler writing the spans of agent runs to a JSONL file"""
+
+    run_inline = True  # spans must open before their children, also in async runs
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, dict] = {}                 # kept spans in progress
+        self._skipped: Dict[UUID, Optional[UUID]] = {}    # skipped run -> nearest kept ancestor
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    # ── Spans ──────────────────────────────────────────────────────────────────
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Optional[UUID]:
+        if parent_run_id in self._skipped:
+            return self._skipped[parent_run_id]
+        return parent_run_id if parent_run_id in self._open else None
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, metadata: Optional[dict]):
+        metadata = metadata or {}
+        with self._lock:
+            parent = self._parent(parent_run_id)
+            self._open[run_id] = {
+                "trace_id": self._open[parent]["trace_id"] if parent else str(run_id),
+                "span_id": str(run_id),
+                "parent_id": str(parent) if parent else None,
+                "name": name,
+                "kind": kind,
+                "agent": metadata.get("lc_agent_name"),
+                "thread_id": metadata.get("thread_id"),
+                "start": time.time(),
+                "_started": time.perf_counter(),
+            }
+
+    def _skip(self, run_id: UUID, parent_run_id: Optional[UUID]):
+        with self._lock:
+            self._skipped[run_id] = self._parent(parent_run_id)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None):
+        with self._lock:
+            self._skipped.pop(run_id, None)
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span["duration_ms"] = round((time.perf_counter() - span.pop("_started")) * 1000, 3)
+            span["status"] = "error" if error else "ok"
+            if error:
+                span["error"] = f"{type(error).__name__}: {error}"
+            try:
+                self._file.write(json.dumps(span, ensure_ascii=False) + "\n")
+                self._file.flush()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not write span {span['name']}: {e}")
+
+    # ── Callbacks ──────────────────────────────────────────────────────────────
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs: Any):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        metadata = metadata or {}
+        if parent_run_id is None or name == metadata.get("lc_agent_name"):
+            self._start(run_id, parent_run_id, name, "agent", metadata)
+        elif name == metadata.get("langgraph_node"):
+            self._start(run_id, parent_run_id, name, "node", metadata)
+        else:
+            self._skip(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs: Any):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, name, "tool", metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs: Any):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "llm"
+        self._start(run_id, parent_run_id, name, "llm", metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs: Any):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "llm"
+        self._start(run_id, parent_run_id, name, "llm", metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error)
+
+
+@cache
+def get_tracer() -> Optional[SpanTracer]:
+    """The process-wide tracer writing to SPAN_TRACE_FILE, or None when tracing is off"""
+    load_environment()
+    path = os.environ.get("SPAN_TRACE_FILE")
+    if not path:
+        return None
+    logger.info(f"Writing spans to {path}")
+    return SpanTracer(Path(path))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Timeline Export
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def load_spans(path: Path) -> List[dict]:
+    """Read the spans of a JSONL file, skipping unreadable lines"""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def to_chrome_trace(spans: List[dict]) -> dict:
+    """
+    Convert spans to Chrome trace events. Each trace is a process and each
+    agent run a thread of it, so concurrent sub-agent runs get lanes of
+    their own and every lane nests properly.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    traces: Dict[str, int] = {}
+    lanes: Dict[str, int] = {}
+    events = []
+
+    def lane_of(span: dict) -> str:
+        while span["kind"] != "agent" and span.get("parent_id") in by_id:
+            span = by_id[span["parent_id"]]
+        return span["span_id"]
+
+    for span in sorted(spans, key=lambda span: span["start"]):
+        pid = traces.setdefault(span["trace_id"], len(traces) + 1)
+        lane = lane_of(span)
+        if lane not in lanes:
+            lanes[lane] = len(lanes) + 1
+            events.append({
+                "ph": "M", "name": "thread_name", "pid": pid, "tid": lanes[lane],
+                "args": {"name": by_id.get(lane, span)["name"]},
+            })
+        events.append({
+            "ph": "X",
+            "name": span["name"],
+            "cat": span["kind"],
+            "pid": pid,
+            "tid": lanes[lane],
+            "ts": round(span["start"] * 1e6),
+            "dur": round(span["duration_ms"] * 1000),
+            "args": {key: span.get(key) for key in ("span_id", "parent_id", "agent", "thread_id", "status", "error")},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main():
+    """Convert a span file into a Chrome trace (flame-graph timeline)"""
+    parser = argparse.ArgumentParser(description="Convert agent spans (JSONL) to a Chrome trace")
+    parser.add_argument("spans", type=Path, help="span file written with SPAN_TRACE_FILE")
+    parser.add_argument("-o", "--output", type=Path, default=Path("trace.json"))
+    args = parser.parse_args()
+
+    spans = load_spans(args.spans)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(spans), f)
+    print(f"{len(spans)} spans written to {args.output} (open it in chrome://tracing or ui.perfetto.dev)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# src/agents/turn_stats.py
+"""
+Per-turn latency and token accounting.
+
+A TurnStatsHandler is passed as a callback to one turn of the coordinator.
+Callbacks propagate into the sub-agents the tools run, so it sees every
+LLM call (attributed to its agent by the agent's name) and every tool
+call of the turn. When the turn ends it yields a TurnStats record: wall
+time, calls, time and prompt/completion tokens per agent, and calls and
+time per tool.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+from uuid import UUID
+
+from loguru import logger
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Agent name used for LLM calls of an unnamed agent
+UNNAMED_AGENT = "agent"
+
+# Turns kept for session statistics
+STATS_HISTORY = 200
+
+
+@dataclass
+class LLMUsage:
+    calls: int = 0
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class ToolUsage:
+    calls: int = 0
+    seconds: float = 0.0
+    errors: int = 0
+
+
+@dataclass
+class TurnStats:
+    """Where the time and tokens of one turn went"""
+    thread_id: str
+    started_at: float                                          # epoch seconds
+    wall_seconds: float = 0.0
+    llm: Dict[str, LLMUsage] = field(default_factory=dict)     # by agent name
+    tools: Dict[str, ToolUsage] = field(default_factory=dict)  # by tool name
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(usage.prompt_tokens for usage in self.llm.values())
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(usage.completion_tokens for usage in self.llm.values())
+
+    def record(self) -> dict:
+        """Plain dict of the stats, for structured logging"""
+        return {
+            **asdict(self),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+def _token_usage(response) -> tuple:
+    """(prompt, completion) tokens reported for an LLM result, or (0, 0)"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class TurnStatsHandler(BaseCallbackHandler):
+    """Callback handler timing the LLM and tool calls of one turn"""
+
+    run_inline = True  # cheap and thread-safe: keep start/end order in async runs
+
+    def __init__(self, thread_id: str = ""):
+        self.stats = TurnStats(thread_id=thread_id, started_at=time.time())
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._llm_runs: Dict[UUID, tuple] = {}
+        self._tool_runs: Dict[UUID, tuple] = {}
+
+    # ── LLM calls ──────────────────────────────────────────────────────────────
+
+    def _start_llm(self, run_id: UUID, metadata: Optional[dict]):
+        agent = (metadata or {}).get("lc_agent_name") or UNNAMED_AGENT
+        with self._lock:
+            self._llm_runs[run_id] = (agent, time.perf_counter())
+
+    def _end_llm(self, run_id: UUID, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            run = self._llm_runs.pop(run_id, None)
+            if run is None:
+                return
+            agent, started = run
+            usage = self.stats.llm.setdefault(agent, LLMUsage())
+            usage.calls += 1
+            usage.seconds += time.perf_counter() - started
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs: Any):
+        self._start_llm(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs: Any):
+        self._start_llm(run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        self._end_llm(run_id, *_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end_llm(run_id)
+
+    # ── Tool calls ─────────────────────────────────────────────────────────────
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        with self._lock:
+            self._tool_runs[run_id] = (name, time.perf_counter())
+
+    def _end_tool(self, run_id: UUID, failed: bool):
+        with self._lock:
+            run = self._tool_runs.pop(run_id, None)
+            if run is None:
+                return
+            name, started = run
+            usage = self.stats.tools.setdefault(name, ToolUsage())
+            usage.calls += 1
+            usage.seconds += time.perf_counter() - started
+            usage.errors += failed
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._end_tool(run_id, failed=False)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._end_tool(run_id, failed=True)
+
+    # ── Result ─────────────────────────────────────────────────────────────────
+
+    def finish(self) -> TurnStats:
+        """Close the turn: record its wall time, log it and return the stats"""
+        self.stats.wall_seconds = time.perf_counter() - self._started
+        logger.info(f"Turn stats: {json.dumps(self.stats.record(), ensure_ascii=False)}")
+        return self.stats
+
+
+class StatsHistory:
+    """Stats of the latest turns of a session, with totals"""
+
+    def __init__(self, max_turns: int = STATS_HISTORY):
+        self.turns: Deque[TurnStats] = deque(maxlen=max_turns)
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def add(self, stats: TurnStats):
+        self.turns.append(stats)
+
+    @property
+    def last(self) -> Optional[TurnStats]:
+        return self.turns[-1] if self.turns else None
+
+    def totals(self) -> dict:
+        """Turns, wall time (total, mean, max) and tokens over the kept turns"""
+        walls: List[float] = [stats.wall_seconds for stats in self.turns]
+        return {
+            "turns": len(walls),
+            "wall_seconds": sum(walls),
+            "mean_wall_seconds": sum(walls) / len(walls) if walls else 0.0,
+            "max_wall_seconds": max(walls, default=0.0),
+            "prompt_tokens": sum(stats.prompt_tokens for stats in self.turns),
+            "completion_tokens": sum(stats.completion_tokens for stats in self.turns),
+        }
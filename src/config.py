@@ -2,19 +2,16 @@
 """
 Configuration module for Essen Sales Agent.
 Handles environment variables, model providers, and project paths.
+
+Importing this module is cheap: the environment is loaded and the LLM
+provider is built on first use (see get_llm).
 """
 
 import os
 import sys
+from functools import cache
 from pathlib import Path
 from loguru import logger
-from dotenv import load_dotenv
-
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
-
-# Load environment variables
-load_dotenv()
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Paths Configuration
@@ -27,50 +24,70 @@ PROMPTS_DIR = SRC_DIR / "agents" / "prompts"
 DATA_DIR = PROJECT_ROOT / "data"
 OUTPUT_DIR = PROJECT_ROOT / "output"
 LOGS_DIR = PROJECT_ROOT / "logs"
-
-# Ensure directories exist
-OUTPUT_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
+CACHE_DIR = PROJECT_ROOT / ".cache"
+CHECKPOINTS_DIR = PROJECT_ROOT / "checkpoints"
 
 logger.debug(f"Project root: {PROJECT_ROOT}")
 logger.debug(f"Prompts directory: {PROMPTS_DIR}")
 logger.debug(f"Data directory: {DATA_DIR}")
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# Environment
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@cache
+def load_environment():
+    """Load environment variables from .env (once)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # Model Provider Configuration
 # ═══════════════════════════════════════════════════════════════════════════════
 
-llm = None
+@cache
+def get_llm():
+    """
+    Build the chat model for the configured provider on first use.
+    Groq is tried first, then OpenAI. Raises RuntimeError if neither is configured.
+    """
+    load_environment()
 
-# Try Groq first
-groq_key = os.environ.get("GROQ_API_KEY")
-groq_model = os.environ.get("GROQ_LLM")
+    # Try Groq first
+    groq_key = os.environ.get("GROQ_API_KEY")
+    groq_model = os.environ.get("GROQ_LLM")
 
-if groq_key and groq_model:
-    logger.info(f"Initializing Groq provider with model: {groq_model}")
-    llm = ChatGroq(
-        model=groq_model,
-        api_key=groq_key
-    )
-    logger.success("Groq provider initialized successfully")
+    if groq_key and groq_model:
+        from langchain_groq import ChatGroq
+
+        logger.info(f"Initializing Groq provider with model: {groq_model}")
+        llm = ChatGroq(
+            model=groq_model,
+            api_key=groq_key
+        )
+        logger.success("Groq provider initialized successfully")
+        return llm
 
-# Try OpenAI as fallback
-if llm is None:
+    # Try OpenAI as fallback
     openai_key = os.environ.get("OPENAI_API_KEY")
     openai_model = os.environ.get("OPENAI_LLM")
 
     if openai_key and openai_model:
+        from langchain_openai import ChatOpenAI
+
         logger.info(f"Initializing OpenAI provider with model: {openai_model}")
         llm = ChatOpenAI(
             model=openai_model,
             api_key=openai_key
         )
         logger.success("OpenAI provider initialized successfully")
+        return llm
 
-# No provider configured
-if llm is None:
+    # No provider configured
     logger.error("No LLM provider configured!")
     logger.error("Please set either:")
     logger.error("  - OPENAI_API_KEY and OPENAI_LLM")
     logger.error("  - GROQ_API_KEY and GROQ_LLM")
-    # Don't exit here, let the calling code handle it
+    raise RuntimeError(
+        "No LLM provider configured. Set OPENAI_API_KEY and OPENAI_LLM, or GROQ_API_KEY and GROQ_LLM."
+    )
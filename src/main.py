@@ -5,20 +5,29 @@ Essen Sales Agent - Terminal Interface
 An interactive CLI for Essen sales consultants to create customized sales quotes.
 """
 
+import argparse
 import os
 import sys
 import uuid
+import asyncio
+import signal
 import threading
 import itertools
 import time
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Set
 
 from loguru import logger
 from langchain.messages import HumanMessage
 
-from agents.coordinator import coordinator
+from config import load_environment
+from agents.coordinator import get_coordinator
 from agents.state import SalesQuoteState
+from agents.sessions import SessionRegistry, registry_from_env
+from agents.streaming import StreamEvent, astream_turn
+from agents.tracing import get_tracer
+from agents.turn_stats import StatsHistory, TurnStatsHandler
+from agents.tools.data_manager import data_manager
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -69,31 +78,31 @@ class Colors:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class Spinner:
-    """Animated spinner for loading states"""
+    """Animated spinner for loading states, drawn by a task on the running event loop"""
 
     def __init__(self, message: str = "Procesando"):
         self.message = message
         self.running = False
-        self.thread: Optional[threading.Thread] = None
+        self.task: Optional[asyncio.Task] = None
         self.frames = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
 
-    def _spin(self):
+    async def _spin(self):
         for frame in itertools.cycle(self.frames):
-            if not self.running:
-                break
             sys.stdout.write(f"\r{Colors.CYAN}{frame}{Colors.RESET} {Colors.DIM}{self.message}...{Colors.RESET}  ")
             sys.stdout.flush()
-            time.sleep(0.1)
+            await asyncio.sleep(0.1)
 
     def start(self):
         self.running = True
-        self.thread = threading.Thread(target=self._spin, daemon=True)
-        self.thread.start()
+        self.task = asyncio.get_running_loop().create_task(self._spin())
 
     def stop(self):
+        if not self.running:
+            return
         self.running = False
-        if self.thread:
-            self.thread.join()
+        if self.task:
+            self.task.cancel()
+            self.task = None
         sys.stdout.write("\r" + " " * 50 + "\r")
         sys.stdout.flush()
 
@@ -157,6 +166,52 @@ def display_quote_status(state: dict):
     print(f"{Colors.BRIGHT_BLACK}└───────────────────────────────────────────────────────┘{Colors.RESET}\n")
 
 
+def display_memory_usage(usage: dict):
+    """Display the conversation memory reported by the session registry"""
+    megabytes = usage["bytes"] / (1024 * 1024)
+    cap = usage["memory_cap"] / (1024 * 1024)
+
+    print(f"\n{Colors.BRIGHT_BLACK}┌─ Memoria de Conversaciones ──────────────────────────┐{Colors.RESET}")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Conversaciones en memoria: {usage['threads_in_memory']}")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Uso: {megabytes:.2f} MB de {cap:.0f} MB")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Liberadas: {usage['released']}")
+    print(f"{Colors.BRIGHT_BLACK}└───────────────────────────────────────────────────────┘{Colors.RESET}\n")
+
+
+# Display names of the agents in /stats
+AGENT_LABELS = {
+    "coordinator": "Coordinador",
+    "catalog_agent": "Catálogo",
+    "promotions_agent": "Promociones",
+}
+
+
+def display_turn_stats(history: StatsHistory):
+    """Display where the time and tokens of the last turn went, and session totals"""
+    last = history.last
+    if last is None:
+        print_info("Todavía no hay turnos para mostrar.")
+        return
+
+    print(f"\n{Colors.BRIGHT_BLACK}┌─ Último Turno ───────────────────────────────────────┐{Colors.RESET}")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Tiempo total: {last.wall_seconds:.2f}s")
+    for agent, usage in sorted(last.llm.items(), key=lambda item: -item[1].seconds):
+        label = AGENT_LABELS.get(agent, agent)
+        print(
+            f"{Colors.BRIGHT_BLACK}│{Colors.RESET} LLM {label}: {usage.calls} llamada(s), {usage.seconds:.2f}s, "
+            f"{usage.prompt_tokens} → {usage.completion_tokens} tokens"
+        )
+    for tool, usage in sorted(last.tools.items(), key=lambda item: -item[1].seconds):
+        errors = f", {usage.errors} error(es)" if usage.errors else ""
+        print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} {Colors.DIM}Herramienta{Colors.RESET} {tool}: {usage.calls} llamada(s), {usage.seconds:.2f}s{errors}")
+
+    totals = history.totals()
+    print(f"{Colors.BRIGHT_BLACK}├─ Sesión ─────────────────────────────────────────────┤{Colors.RESET}")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Turnos: {totals['turns']}  Promedio: {totals['mean_wall_seconds']:.2f}s  Máximo: {totals['max_wall_seconds']:.2f}s")
+    print(f"{Colors.BRIGHT_BLACK}│{Colors.RESET} Tokens: {totals['prompt_tokens']} → {totals['completion_tokens']}")
+    print(f"{Colors.BRIGHT_BLACK}└───────────────────────────────────────────────────────┘{Colors.RESET}\n")
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # UI Components
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -193,6 +248,8 @@ def print_commands():
     print(f"  {Colors.CYAN}/nuevo{Colors.RESET}     Iniciar nuevo presupuesto")
     print(f"  {Colors.CYAN}/estado{Colors.RESET}    Ver estado del presupuesto actual")
     print(f"  {Colors.CYAN}/ayuda{Colors.RESET}     Ver instrucciones detalladas")
+    print(f"  {Colors.CYAN}/stats{Colors.RESET}     Ver tiempos y tokens del último turno")
+    print(f"  {Colors.CYAN}/memoria{Colors.RESET}   Ver memoria usada por las conversaciones")
     print(f"  {Colors.CYAN}/limpiar{Colors.RESET}   Limpiar pantalla")
     print(f"  {Colors.CYAN}/salir{Colors.RESET}     Salir del programa")
     print(f"{Colors.BRIGHT_BLACK}─────────────────────────────────────────────────────────────────{Colors.RESET}\n")
@@ -242,12 +299,22 @@ def print_separator():
     print(f"\n{Colors.BRIGHT_BLACK}─────────────────────────────────────────────────────────────────{Colors.RESET}\n")
 
 
+def print_assistant_header():
+    """Print the assistant header before a reply"""
+    print(f"\n{Colors.GREEN}▶{Colors.RESET} {Colors.BOLD}Asistente:{Colors.RESET}")
+
+
 def print_assistant_message(message: str):
     """Print assistant message with formatting"""
-    print(f"\n{Colors.GREEN}▶{Colors.RESET} {Colors.BOLD}Asistente:{Colors.RESET}")
+    print_assistant_header()
     print(f"  {message}")
 
 
+def print_tool_progress(message: str):
+    """Print a tool progress line"""
+    print(f"  {Colors.DIM}↳ {message}…{Colors.RESET}")
+
+
 def print_error(message: str):
     """Print error message"""
     print(f"\n{Colors.RED}✖ Error:{Colors.RESET} {message}")
@@ -274,8 +341,8 @@ def get_user_input() -> str:
 class Session:
     """Manages the conversation session state"""
 
-    def __init__(self):
-        self.thread_id = str(uuid.uuid4())
+    def __init__(self, thread_id: Optional[str] = None):
+        self.thread_id = thread_id or str(uuid.uuid4())
         self.config = {"configurable": {"thread_id": self.thread_id}}
         self.state = {
             "products": {},
@@ -285,8 +352,11 @@ class Session:
             "total_amount": 0.0,
             "messages": []
         }
+        self.resume_from: Optional[str] = None  # checkpoint before a cancelled turn
+        self.registry: Optional[SessionRegistry] = None  # set once the coordinator is built
+        self.stats = StatsHistory()
         self.start_time = datetime.now()
-        logger.info(f"New session started: {self.thread_id}")
+        logger.info(f"{'Session resumed' if thread_id else 'New session started'}: {self.thread_id}")
 
     def reset(self):
         """Reset session for a new quote"""
@@ -300,9 +370,28 @@ class Session:
             "customer_information": None,
             "messages": []
         }
+        self.resume_from = None
         self.start_time = datetime.now()
+        if self.registry:
+            self.registry.forget(old_thread)  # the old quote is not coming back
         logger.info(f"Session reset: {old_thread} -> {self.thread_id}")
 
+    @property
+    def turn_config(self) -> dict:
+        """Config for the next turn: continues from before a cancelled turn, if any"""
+        if self.resume_from:
+            return {"configurable": {"thread_id": self.thread_id, "checkpoint_id": self.resume_from}}
+        return self.config
+
+    def discard_turn(self, checkpoint_id: Optional[str]):
+        """Forget a cancelled turn; the next turn continues from the given checkpoint"""
+        if checkpoint_id is None:
+            # Cancelled before anything was saved: start over on a clean thread
+            self.thread_id = str(uuid.uuid4())
+            self.config = {"configurable": {"thread_id": self.thread_id}}
+        self.resume_from = checkpoint_id
+        logger.info(f"Turn cancelled, thread {self.thread_id} resumes from {checkpoint_id}")
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Main REPL Loop
@@ -317,6 +406,8 @@ def handle_command(command: str, session: Session) -> bool:
 
     if cmd in ['/salir', '/exit', '/quit']:
         print(f"\n{Colors.CYAN}¡Hasta luego! Que tengas un excelente día.{Colors.RESET}\n")
+        if session.registry and session.registry.durable:
+            print(f"{Colors.DIM}Para continuar esta conversación: python src/main.py --thread {session.thread_id}{Colors.RESET}\n")
         logger.info(f"Session ended by user: {session.thread_id}")
         return False
 
@@ -330,6 +421,17 @@ def handle_command(command: str, session: Session) -> bool:
         display_quote_status(session.state)
         return True
 
+    if cmd in ['/stats', '/estadisticas']:
+        display_turn_stats(session.stats)
+        return True
+
+    if cmd in ['/memoria', '/memory']:
+        if session.registry:
+            display_memory_usage(session.registry.usage())
+        else:
+            print_info("Todavía no hay conversaciones en memoria.")
+        return True
+
     if cmd in ['/ayuda', '/help']:
         print_help()
         return True
@@ -346,34 +448,260 @@ def handle_command(command: str, session: Session) -> bool:
     return None  # Not a command
 
 
-def process_message(user_input: str, session: Session) -> str:
+# Session state fields mirrored from the agent state
+STATE_KEYS = ["products", "payment_method", "payment_plan", "customer_information", "total_amount"]
+
+
+def update_session_state(session: Session, values: dict):
+    """Copy the quote fields of an agent state into the session"""
+    for key in STATE_KEYS:
+        if key in values:
+            session.state[key] = values[key]
+
+
+async def process_message(user_input: str, session: Session, callbacks: Optional[list] = None) -> str:
     """Process user message through the coordinator agent"""
     logger.debug(f"Processing message: {user_input[:50]}...")
 
     message = HumanMessage(content=user_input)
 
-    response = coordinator.invoke(
-        {"messages": [message]},
-        config=session.config
-    )
+    spinner = Spinner("Pensando")
+    spinner.start()
+    try:
+        response = await get_coordinator().ainvoke(
+            {"messages": [message]},
+            config={**session.turn_config, "callbacks": callbacks or []}
+        )
+    finally:
+        spinner.stop()
 
     # Update local state if available
     if response:
-        for key in ["products", "payment_method", "payment_plan", "customer_information", "total_amount"]:
-            if key in response:
-                session.state[key] = response[key]
+        update_session_state(session, response)
 
     # Extract response message
     if response and "messages" in response:
         last_message = response["messages"][-1]
         if hasattr(last_message, 'content'):
+            print_assistant_message(last_message.content)
             return last_message.content
 
-    return "Lo siento, hubo un problema procesando tu solicitud."
+    reply = "Lo siento, hubo un problema procesando tu solicitud."
+    print_assistant_message(reply)
+    return reply
+
+
+class ReplyPrinter:
+    """Prints a streamed turn: tool progress lines and reply tokens as they arrive"""
+
+    def __init__(self):
+        self.spinner = Spinner("Pensando")
+        self.header_printed = False
+        self.in_text = False
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def start(self):
+        self.spinner.start()
+
+    def on_event(self, event: StreamEvent):
+        self.spinner.stop()
+
+        if event.kind == "tool":
+            if self.in_text:
+                print()
+                self.in_text = False
+            print_tool_progress(event.text)
+            self.spinner = Spinner(event.text)
+            self.spinner.start()
+            return
+
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            logger.debug(f"Time to first token: {self.first_token_at - self.started:.2f}s")
+        if not self.header_printed:
+            print_assistant_header()
+            self.header_printed = True
+        if not self.in_text:
+            sys.stdout.write("  ")
+            self.in_text = True
+        sys.stdout.write(event.text)
+        sys.stdout.flush()
+
+    def close(self):
+        self.spinner.stop()
+        if self.in_text:
+            print()
+            self.in_text = False
+
+
+async def stream_message(user_input: str, session: Session, callbacks: Optional[list] = None) -> str:
+    """
+    Process user message through the coordinator agent, printing reply
+    tokens and tool progress as they arrive. Returns the final reply.
+    """
+    logger.debug(f"Streaming message: {user_input[:50]}...")
+
+    coordinator = get_coordinator()
+    printer = ReplyPrinter()
+    printer.start()
+    try:
+        config = {**session.turn_config, "callbacks": callbacks or []}
+        async for event in astream_turn(coordinator, user_input, config):
+            printer.on_event(event)
+    finally:
+        printer.close()
+
+    values = (await coordinator.aget_state(session.config)).values
+    update_session_state(session, values)
+
+    messages = values.get("messages") or []
+    reply = messages[-1].content if messages else ""
+    if not printer.header_printed:
+        # Nothing was streamed (e.g. a provider without streaming support)
+        print_assistant_message(reply or "Lo siento, hubo un problema procesando tu solicitud.")
+    return reply
+
+
+def _log_startup_failure(task: asyncio.Task):
+    """Log (and mark as retrieved) an error building the agents in the background"""
+    if not task.cancelled() and task.exception():
+        logger.error(f"Could not build the coordinator: {task.exception()}")
+
+
+class Repl:
+    """
+    Asyncio REPL. Input is read off the event loop and each turn runs as a
+    task, so Ctrl-C cancels only the turn in flight (with its sub-agent
+    calls) and other work can run on the loop between turns.
+    """
+
+    def __init__(self, session: Session, streaming: bool = True):
+        self.session = session
+        self.streaming = streaming
+        self.turn: Optional[asyncio.Task] = None
+        self.prompt: Optional[asyncio.Future] = None
+        self.background: Set[asyncio.Task] = set()
+        self.coordinator_ready: Optional[asyncio.Task] = None
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Run background work (prefetching, writing files) alongside the conversation"""
+        task = asyncio.create_task(coro)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+        return task
+
+    def interrupt(self):
+        """Ctrl-C: cancel the turn in flight, or leave when waiting for input"""
+        if self.turn and not self.turn.done():
+            self.turn.cancel()
+        elif self.prompt and not self.prompt.done():
+            self.prompt.set_result(None)
+
+    async def read_input(self) -> Optional[str]:
+        """Read a line without blocking the loop. Returns None on Ctrl-C."""
+        loop = asyncio.get_running_loop()
+        prompt = self.prompt = loop.create_future()
+
+        def read():
+            line = get_user_input()
+            loop.call_soon_threadsafe(lambda: prompt.done() or prompt.set_result(line))
+
+        # Daemon thread: a pending input() must not keep the program alive on exit
+        threading.Thread(target=read, daemon=True, name="stdin-reader").start()
+        return await prompt
+
+    async def run_turn(self, user_input: str):
+        """Run one turn as a cancellable task; a cancelled turn leaves no trace in the thread"""
+        coordinator = await self.coordinator_ready
+        if self.session.registry is None:
+            self.session.registry = registry_from_env(coordinator.checkpointer)
+        registry = self.session.registry
+
+        thread_id = self.session.thread_id
+        before = await coordinator.aget_state(self.session.turn_config)
+        checkpoint_id = before.config.get("configurable", {}).get("checkpoint_id")
+
+        run = stream_message if self.streaming else process_message
+        stats = TurnStatsHandler(self.session.thread_id)
+        callbacks = [stats]
+        tracer = get_tracer()
+        if tracer:
+            callbacks.append(tracer)
+        self.turn = asyncio.create_task(run(user_input, self.session, callbacks))
+        try:
+            with registry.active(self.session.thread_id):
+                response = await self.turn
+            self.session.stats.add(stats.finish())
+            self.session.resume_from = None
+            logger.debug(f"Agent response received: {len(response)} chars")
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise  # the REPL itself is being cancelled
+            self.session.discard_turn(checkpoint_id)
+            if checkpoint_id is None and coordinator.checkpointer:
+                # The session moved to a clean thread: drop what the cancelled first turn saved
+                await coordinator.checkpointer.adelete_thread(thread_id)
+                registry.forget(thread_id)
+            print_info("Respuesta cancelada.")
+        finally:
+            self.turn = None
+        registry.sweep()
+
+    async def run(self):
+        """Main REPL loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.interrupt)
+            handles_sigint = True
+        except NotImplementedError:
+            handles_sigint = False  # e.g. Windows: Ctrl-C ends the program instead
+
+        # Build the LLM and agents while the consultant types the first message
+        self.coordinator_ready = self.spawn(asyncio.to_thread(get_coordinator))
+        self.coordinator_ready.add_done_callback(_log_startup_failure)
+
+        while True:
+            try:
+                user_input = await self.read_input()
+
+                if user_input is None:
+                    print(f"\n\n{Colors.CYAN}¡Hasta luego!{Colors.RESET}\n")
+                    logger.info("Session interrupted by user")
+                    break
+
+                if not user_input:
+                    continue
+
+                # Check if it's a command
+                command_result = handle_command(user_input, self.session)
+                if command_result is False:
+                    break
+                elif command_result is True:
+                    print_separator()
+                    continue
+
+                # Process through agent
+                await self.run_turn(user_input)
+                print_separator()
+
+            except Exception as e:
+                logger.exception(f"Error processing request: {e}")
+                print_error(str(e))
+                print(f"{Colors.DIM}Por favor, intenta de nuevo o escribe /ayuda para instrucciones.{Colors.RESET}")
+                print_separator()
+
+        for task in list(self.background):
+            task.cancel()
+        if handles_sigint:
+            loop.remove_signal_handler(signal.SIGINT)
 
 
 def main():
-    """Main REPL interaction loop"""
+    """Start the terminal interface"""
+    parser = argparse.ArgumentParser(description="Essen Sales Agent terminal interface")
+    parser.add_argument("--thread", help="continue a saved conversation (SQLite checkpointer) by its thread ID")
+    args = parser.parse_args()
 
     # Configure logger
     logger.remove()
@@ -391,57 +719,34 @@ def main():
     )
 
     logger.info("Essen Sales Agent starting...")
+    load_environment()
+
+    # Pick up catalog, price and promotion changes without restarting
+    data_manager.start_watching()
+
+    # Stream replies token by token unless disabled
+    streaming = os.environ.get("STREAM_REPLIES", "1").lower() not in ("0", "false", "no")
 
     # Initialize session
-    session = Session()
+    session = Session(args.thread)
 
     # Print welcome
     print_banner()
     print_commands()
 
-    print_assistant_message("¡Hola! ¿En qué puedo ayudarte hoy?")
+    if args.thread:
+        print_info(f"Continuando la conversación {args.thread}.")
+    else:
+        print_assistant_message("¡Hola! ¿En qué puedo ayudarte hoy?")
     print_separator()
 
-    # Main loop
-    while True:
-        try:
-            user_input = get_user_input()
-
-            if not user_input:
-                continue
-
-            # Check if it's a command
-            command_result = handle_command(user_input, session)
-            if command_result is False:
-                break
-            elif command_result is True:
-                print_separator()
-                continue
-
-            # Process through agent
-            spinner = Spinner("Pensando")
-            spinner.start()
-
-            try:
-                response = process_message(user_input, session)
-                logger.debug(f"Agent response received: {len(response)} chars")
-            finally:
-                spinner.stop()
-
-            print_assistant_message(response)
-            print_separator()
-
-        except KeyboardInterrupt:
-            print(f"\n\n{Colors.CYAN}¡Hasta luego!{Colors.RESET}\n")
-            logger.info("Session interrupted by user")
-            break
-
-        except Exception as e:
-            logger.exception(f"Error processing request: {e}")
-            print_error(str(e))
-            print(f"{Colors.DIM}Por favor, intenta de nuevo o escribe /ayuda para instrucciones.{Colors.RESET}")
-            print_separator()
+    try:
+        asyncio.run(Repl(session, streaming).run())
+    except KeyboardInterrupt:
+        print(f"\n\n{Colors.CYAN}¡Hasta luego!{Colors.RESET}\n")
+        logger.info("Session interrupted by user")
 
+    data_manager.stop_watching()
     logger.info("Essen Sales Agent stopped")
 
 
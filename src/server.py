@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Essen Sales Agent - HTTP Server
+
+Serves many consultant conversations from one process. Each conversation
+is a session mapped to a thread_id on the shared coordinator graph. Turns
+of different sessions run concurrently on the event loop; turns of the
+same session run one at a time, in arrival order. Idle sessions are
+released periodically to keep checkpoint memory under a cap. A session
+unknown to the server but still in the checkpointer (with the SQLite
+checkpointer, e.g. after a restart) is reopened on its first request.
+
+Endpoints (JSON):
+    GET    /health
+    POST   /sessions                         create a session -> {"thread_id"}
+    GET    /sessions/{thread_id}             quote state of a session
+    DELETE /sessions/{thread_id}             close a session (409 while a turn is running)
+    GET    /usage                            conversation memory per session
+    POST   /sessions/{thread_id}/messages    {"message": "..."} -> {"reply", "state"}
+                                             with "stream": true the response is
+                                             NDJSON: token/tool events, then the result
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, is_dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+from langchain.messages import HumanMessage
+
+from config import load_environment
+from agents.coordinator import get_coordinator
+from agents.sessions import SWEEP_INTERVAL, SessionRegistry, registry_from_env
+from agents.streaming import StreamEvent, astream_turn
+from agents.tracing import get_tracer
+from agents.tools.data_manager import data_manager
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Server Configuration
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Turns running at once across all sessions (each holds LLM and tool work)
+MAX_CONCURRENT_TURNS = 32
+
+# Largest accepted request body, in bytes
+MAX_BODY_SIZE = 64 * 1024
+
+# Seconds a keep-alive connection may stay idle between requests
+KEEP_ALIVE_TIMEOUT = 30
+
+# Quote fields returned with every reply
+STATE_KEYS = ["products", "payment_method", "payment_plan", "customer_information", "total_amount"]
+
+_STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+_SESSION_PATH = re.compile(r"^/sessions/([\w-]+)(/messages)?$")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HTTP Protocol
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class HTTPError(Exception):
+    """An error answered to the client with a status code and a JSON message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    def json(self) -> dict:
+        """Parse the body as a JSON object (empty body -> {})"""
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        return payload
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read one HTTP/1.1 request. Returns None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, f"Body larger than {MAX_BODY_SIZE} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    return Request(method=method.upper(), path=target.split("?", 1)[0], headers=headers, body=body)
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, 'Unknown')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool = True):
+    """Write a complete JSON response"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(_head(status, {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }) + body)
+    await writer.drain()
+
+
+class NDJSONStream:
+    """Chunked response with one JSON object per line, flushed as it is written"""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    async def start(self, status: int = 200):
+        self.writer.write(_head(status, {
+            "Content-Type": "application/x-ndjson; charset=utf-8",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive",
+        }))
+        await self.writer.drain()
+
+    async def send(self, payload: dict):
+        line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.writer.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        await self.writer.drain()
+
+    async def end(self):
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Sessions
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class ServerSession:
+    """One conversation: a thread on the coordinator graph and the lock that orders its turns"""
+    thread_id: str
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    created_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+    turns: int = 0
+    resume_from: Optional[str] = None  # checkpoint before a failed turn
+
+    @property
+    def config(self) -> dict:
+        return {"configurable": {"thread_id": self.thread_id}}
+
+    @property
+    def turn_config(self) -> dict:
+        """Config for the next turn: continues from before a failed turn, if any"""
+        if self.resume_from:
+            return {"configurable": {"thread_id": self.thread_id, "checkpoint_id": self.resume_from}}
+        return self.config
+
+
+def _plain(value):
+    """JSON-friendly copy of a state value (dataclasses become dicts)"""
+    if is_dataclass(value):
+        return asdict(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def quote_state(values: dict) -> dict:
+    """The quote fields of an agent state, as plain JSON values"""
+    return {key: _plain(values.get(key)) for key in STATE_KEYS}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Server
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SalesAgentServer:
+    """HTTP front end running many sessions on one shared agent graph"""
+
+    def __init__(
+        self,
+        agent=None,
+        max_concurrent_turns: int = MAX_CONCURRENT_TURNS,
+        registry: Optional[SessionRegistry] = None
+    ):
+        self._agent = agent
+        self._registry = registry
+        self.sessions: Dict[str, ServerSession] = {}
+        self.turn_slots = asyncio.Semaphore(max_concurrent_turns)
+
+    @property
+    def agent(self):
+        """The agent graph shared by every session (the coordinator unless one was given)"""
+        return self._agent if self._agent is not None else get_coordinator()
+
+    @property
+    def registry(self) -> SessionRegistry:
+        """Activity and memory tracking for the threads of the agent's checkpointer"""
+        if self._registry is None:
+            self._registry = registry_from_env(self.agent.checkpointer)
+        return self._registry
+
+    # ── Sessions ───────────────────────────────────────────────────────────────
+
+    def create_session(self) -> ServerSession:
+        session = ServerSession(thread_id=str(uuid.uuid4()))
+        self.sessions[session.thread_id] = session
+        logger.info(f"Session created: {session.thread_id}")
+        return session
+
+    async def get_session(self, thread_id: str) -> ServerSession:
+        session = self.sessions.get(thread_id) or await self.restore_session(thread_id)
+        if session is None:
+            raise HTTPError(404, f"Unknown session: {thread_id}")
+        return session
+
+    async def restore_session(self, thread_id: str) -> Optional[ServerSession]:
+        """Reopen a session whose thread is still in the checkpointer (e.g. on disk after a restart)"""
+        checkpointer = self.agent.checkpointer
+        if not checkpointer:
+            return None
+        saved = await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id}})
+        if saved is None:
+            return None
+        messages = saved.checkpoint["channel_values"].get("messages") or []
+        turns = sum(1 for message in messages if message.type == "human")
+        session = self.sessions.setdefault(thread_id, ServerSession(thread_id=thread_id, turns=turns))
+        logger.info(f"Session restored: {thread_id}")
+        return session
+
+    async def close_session(self, thread_id: str):
+        session = await self.get_session(thread_id)
+        # Releasing the thread under a running or queued turn would free its memory mid-turn
+        if session.lock.locked():
+            raise HTTPError(409, f"Session has a turn in progress: {thread_id}")
+        self.sessions.pop(session.thread_id)
+        self.registry.forget(thread_id)
+        logger.info(f"Session closed: {thread_id}")
+
+    def sweep_sessions(self):
+        """
+        Release idle threads. With a durable checkpointer their sessions stay
+        open and reload on the next message; otherwise they are closed.
+        """
+        released = self.registry.sweep()
+        if not self.registry.durable:
+            for thread_id in released:
+                if self.sessions.pop(thread_id, None):
+                    logger.info(f"Session expired: {thread_id}")
+
+    async def sweep_forever(self, interval: float = SWEEP_INTERVAL):
+        """Sweep idle sessions every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep_sessions()
+            except Exception as e:
+                logger.exception(f"Error sweeping sessions: {e}")
+
+    async def session_state(self, session: ServerSession) -> dict:
+        values = (await self.agent.aget_state(session.config)).values
+        return quote_state(values)
+
+    async def run_turn(
+        self,
+        session: ServerSession,
+        message: str,
+        on_event: Optional[Callable[[StreamEvent], Awaitable[None]]] = None
+    ) -> dict:
+        """
+        Run one turn of a session and return {"thread_id", "reply", "state"}.
+        Turns of the same session wait for each other, in arrival order.
+        With ``on_event``, tokens and tool progress are passed on as they happen.
+        """
+        agent = self.agent
+        # Busy while queued or running, so the sweeper never releases it mid-turn
+        with self.registry.active(session.thread_id):
+            async with session.lock:
+                before = await agent.aget_state(session.turn_config)
+                checkpoint_id = before.config.get("configurable", {}).get("checkpoint_id")
+                tracer = get_tracer()
+                config = {**session.turn_config, "callbacks": [tracer] if tracer else []}
+
+                try:
+                    async with self.turn_slots:
+                        if on_event is None:
+                            await agent.ainvoke({"messages": [HumanMessage(content=message)]}, config=config)
+                        else:
+                            async for event in astream_turn(agent, message, config):
+                                await on_event(event)
+                except BaseException:
+                    # Failed or cancelled (e.g. client gone): the next turn continues from before this one
+                    session.resume_from = checkpoint_id
+                    if checkpoint_id is None and agent.checkpointer:
+                        await agent.checkpointer.adelete_thread(session.thread_id)
+                    raise
+
+                session.resume_from = None
+                session.turns += 1
+                session.last_active = time.time()
+                values = (await agent.aget_state(session.config)).values
+
+        messages = values.get("messages") or []
+        return {
+            "thread_id": session.thread_id,
+            "reply": messages[-1].content if messages else "",
+            "state": quote_state(values),
+        }
+
+    # ── HTTP ───────────────────────────────────────────────────────────────────
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                try:
+                    await self.dispatch(request, writer)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, request.keep_alive)
+                except Exception as e:
+                    logger.exception(f"Error handling {request.method} {request.path}: {e}")
+                    await send_json(writer, 500, {"error": str(e)}, request.keep_alive)
+
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        """Route a request to its handler"""
+        if request.path in ("/health", "/usage") and request.method != "GET":
+            raise HTTPError(405, f"Use GET for {request.path}")
+
+        if request.path == "/health":
+            await send_json(writer, 200, {"status": "ok", "sessions": len(self.sessions)}, request.keep_alive)
+            return
+
+        if request.path == "/usage":
+            usage = {"sessions": len(self.sessions), **self.registry.usage()}
+            await send_json(writer, 200, usage, request.keep_alive)
+            return
+
+        if request.path == "/sessions":
+            if request.method != "POST":
+                raise HTTPError(405, "Use POST to create a session")
+            session = self.create_session()
+            await send_json(writer, 201, {"thread_id": session.thread_id}, request.keep_alive)
+            return
+
+        match = _SESSION_PATH.match(request.path)
+        if not match:
+            raise HTTPError(404, f"Not found: {request.path}")
+        thread_id, messages = match.groups()
+
+        if messages:
+            if request.method != "POST":
+                raise HTTPError(405, "Use POST to send a message")
+            await self.post_message(await self.get_session(thread_id), request, writer)
+        elif request.method == "GET":
+            session = await self.get_session(thread_id)
+            payload = {"thread_id": thread_id, "turns": session.turns, "state": await self.session_state(session)}
+            await send_json(writer, 200, payload, request.keep_alive)
+        elif request.method == "DELETE":
+            await self.close_session(thread_id)
+            await send_json(writer, 200, {"thread_id": thread_id, "closed": True}, request.keep_alive)
+        else:
+            raise HTTPError(405, f"Method not allowed: {request.method}")
+
+    async def post_message(self, session: ServerSession, request: Request, writer: asyncio.StreamWriter):
+        payload = request.json()
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "Field 'message' must be a non-empty string")
+
+        if not payload.get("stream"):
+            result = await self.run_turn(session, message)
+            await send_json(writer, 200, result, request.keep_alive)
+            return
+
+        stream = NDJSONStream(writer)
+        await stream.start()
+
+        async def on_event(event: StreamEvent):
+            await stream.send({"type": event.kind, "text": event.text})
+
+        try:
+            result = await self.run_turn(session, message, on_event)
+            await stream.send({"type": "result", **result})
+        except Exception as e:
+            logger.exception(f"Error in turn of session {session.thread_id}: {e}")
+            await stream.send({"type": "error", "error": str(e)})
+        await stream.end()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        """Start listening; returns the asyncio server"""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"Listening on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        return server
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Entry Point
+# ═══════════════════════════════════════════════════════════════════════════════
+
+async def serve(host: str, port: int):
+    app = SalesAgentServer()
+    server = await app.start(host, port)
+    sweeper = asyncio.create_task(app.sweep_forever())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+
+def main():
+    """Run the HTTP server"""
+    load_environment()  # SERVER_HOST/SERVER_PORT may come from .env
+    parser = argparse.ArgumentParser(description="Essen Sales Agent HTTP server")
+    parser.add_argument("--host", default=os.environ.get("SERVER_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVER_PORT", DEFAULT_PORT)))
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(
+        "logs/essen_server_{time:YYYY-MM-DD}.log",
+        rotation="1 day",
+        retention="7 days",
+        level="DEBUG",
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}"
+    )
+    logger.add(sys.stderr, level="INFO", format="{time:HH:mm:ss} | {level} | {message}")
+
+    get_coordinator()  # fail fast if no LLM provider is configured
+    data_manager.start_watching()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+    finally:
+        data_manager.stop_watching()
+
+
+if __name__ == "__main__":
+    main()
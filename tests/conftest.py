@@ -3,9 +3,14 @@
 Pytest configuration and fixtures for Essen Sales Agent tests.
 """
 
+import json
 import sys
 import pytest
 from pathlib import Path
+from typing import Any
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 
 # Add src to path for imports
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -65,3 +70,55 @@ def sample_promotion():
         "wallets": [],
         "reimbursement": None
     }
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that replies with a fixed list of messages, streaming word by word.
+    ``replies`` may also be a function of the conversation returning the reply.
+    """
+    replies: Any
+    position: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self, messages) -> AIMessage:
+        if callable(self.replies):
+            reply = self.replies(messages)
+        else:
+            reply = self.replies[self.position % len(self.replies)]
+            self.position += 1
+        return AIMessage(content=reply) if isinstance(reply, str) else reply
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._next(messages)
+        words = reply.content.split(" ") if reply.content else []
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        if reply.tool_calls or not words:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ]))
+
+
+@pytest.fixture
+def scripted_llm():
+    """
+    Return a factory for chat models that answer with scripted replies
+    (strings or AIMessages with tool calls), cycling through them, or with
+    a function of the conversation.
+    """
+    return lambda replies: ScriptedChatModel(replies=replies if callable(replies) else list(replies))
@@ -0,0 +1,818 @@
+# tests/test_agents.py
+"""
+Tests for running agent turns (with scripted chat models, no provider needed).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def tool_call_agent(scripted_llm):
+    """Agent whose model calls get_available_promotions once, then replies"""
+    from langchain.agents import create_agent
+    from langchain.messages import AIMessage
+    from langgraph.checkpoint.memory import InMemorySaver
+    from agents.tools.coordinator import get_available_promotions
+
+    model = scripted_llm([
+        AIMessage(content="", tool_calls=[{
+            "name": "get_available_promotions",
+            "args": {"banks": ["GALICIA"], "installments": [12], "credit_cards": ["VISA"]},
+            "id": "call_1"
+        }]),
+        "Hay promociones con Galicia"
+    ])
+    return create_agent(model=model, tools=[get_available_promotions], checkpointer=InMemorySaver())
+
+
+class TestStreaming:
+    """Tests for streamed coordinator turns"""
+
+    def test_stream_turn_yields_tool_progress_then_tokens(self, tool_call_agent):
+        """Test that a tool progress event comes before the reply tokens"""
+        from agents.streaming import stream_turn
+        config = {"configurable": {"thread_id": "stream-1"}}
+        events = list(stream_turn(tool_call_agent, "promos galicia visa 12", config))
+
+        assert events[0].kind == "tool"
+        assert events[0].text == "Consultando promociones"
+        tokens = [e.text for e in events if e.kind == "token"]
+        assert len(tokens) > 1, "The reply should arrive in several tokens"
+        assert "".join(tokens) == "Hay promociones con Galicia"
+
+    def test_stream_turn_leaves_final_state(self, tool_call_agent):
+        """Test that the checkpointed state has the full turn once the stream ends"""
+        from agents.streaming import stream_turn
+        config = {"configurable": {"thread_id": "stream-2"}}
+        for _ in stream_turn(tool_call_agent, "promos", config):
+            pass
+        messages = tool_call_agent.get_state(config).values["messages"]
+        assert messages[-1].content == "Hay promociones con Galicia"
+        assert "PROMO001" in messages[-2].content
+
+    def test_nested_agent_tokens_are_not_streamed(self, scripted_llm):
+        """Test that only the coordinator model's tokens are streamed, not a sub-agent's"""
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage
+        from langchain.tools import tool
+        from agents.streaming import stream_turn
+
+        inner = create_agent(model=scripted_llm(["inner agent words"]), tools=[])
+
+        @tool
+        def lookup_products(products: list[str]) -> str:
+            """Look up products"""
+            return inner.invoke({"messages": [("user", products[0])]})["messages"][-1].content
+
+        outer = create_agent(model=scripted_llm([
+            AIMessage(content="", tool_calls=[{"name": "lookup_products", "args": {"products": ["x"]}, "id": "1"}]),
+            "outer reply"
+        ]), tools=[lookup_products])
+
+        events = list(stream_turn(outer, "hola", {}))
+        assert [(e.kind, e.text) for e in events][0] == ("tool", "Buscando productos")
+        assert "".join(e.text for e in events if e.kind == "token") == "outer reply"
+
+
+class TestCancellation:
+    """Tests for cancelling a turn in the asyncio REPL"""
+
+    @pytest.fixture
+    def slow_agent(self, scripted_llm):
+        """Agent that answers, then on the second turn calls a tool that never finishes"""
+        import asyncio
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage
+        from langchain.tools import tool
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        @tool
+        async def lookup_products(products: list[str]) -> str:
+            """Look up products"""
+            await asyncio.Event().wait()
+
+        model = scripted_llm([
+            "primera respuesta",
+            AIMessage(content="", tool_calls=[{"name": "lookup_products", "args": {"products": ["x"]}, "id": "c1"}]),
+            "respuesta despues de cancelar",
+        ])
+        return create_agent(model=model, tools=[lookup_products], checkpointer=InMemorySaver())
+
+    def test_cancelled_turn_is_discarded(self, slow_agent, monkeypatch):
+        """Test that Ctrl-C cancels only the turn and the thread continues from before it"""
+        import asyncio
+        import main
+
+        monkeypatch.setattr(main, "get_coordinator", lambda: slow_agent)
+        session = main.Session()
+        repl = main.Repl(session, streaming=True)
+
+        async def scenario():
+            repl.coordinator_ready = asyncio.create_task(asyncio.sleep(0, result=slow_agent))
+            await repl.run_turn("hola")
+
+            turn = asyncio.create_task(repl.run_turn("busca algo"))
+            while repl.turn is None:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)  # let the turn reach the tool call
+            repl.interrupt()
+            await turn
+            assert repl.turn is None
+
+            await repl.run_turn("seguimos")
+
+        asyncio.run(scenario())
+
+        messages = slow_agent.get_state(session.config).values["messages"]
+        assert [m.content for m in messages] == ["hola", "primera respuesta", "seguimos", "respuesta despues de cancelar"]
+        assert session.resume_from is None
+
+    def test_cancelled_first_turn_drops_its_thread(self, scripted_llm, monkeypatch):
+        """Test that a cancelled first turn moves to a clean thread and deletes the partial one"""
+        import asyncio
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage
+        from langchain.tools import tool
+        from langgraph.checkpoint.memory import InMemorySaver
+        import main
+
+        @tool
+        async def lookup_products(products: list[str]) -> str:
+            """Look up products"""
+            await asyncio.Event().wait()
+
+        agent = create_agent(model=scripted_llm([
+            AIMessage(content="", tool_calls=[{"name": "lookup_products", "args": {"products": ["x"]}, "id": "c1"}]),
+        ]), tools=[lookup_products], checkpointer=InMemorySaver())
+        monkeypatch.setattr(main, "get_coordinator", lambda: agent)
+        session = main.Session()
+        first_thread = session.thread_id
+        repl = main.Repl(session, streaming=True)
+
+        async def scenario():
+            repl.coordinator_ready = asyncio.create_task(asyncio.sleep(0, result=agent))
+            turn = asyncio.create_task(repl.run_turn("busca algo"))
+            while repl.turn is None:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)  # let the turn save checkpoints and reach the tool call
+            assert agent.checkpointer.storage.get(first_thread)
+            repl.interrupt()
+            await turn
+
+        asyncio.run(scenario())
+        assert session.thread_id != first_thread
+        assert not agent.checkpointer.storage.get(first_thread)
+        assert first_thread not in session.registry.usage()["per_thread"]
+
+    def test_run_without_signal_handlers(self, monkeypatch):
+        """Test that the REPL starts and exits on loops that cannot install a SIGINT handler"""
+        import asyncio
+        import main
+
+        async def no_input(self):
+            return None
+
+        def unsupported(*args):
+            raise NotImplementedError
+
+        monkeypatch.setattr(main.Repl, "read_input", no_input)
+        monkeypatch.setattr(main, "get_coordinator", lambda: None)
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            monkeypatch.setattr(loop, "add_signal_handler", unsupported)
+            monkeypatch.setattr(loop, "remove_signal_handler", unsupported)
+            await main.Repl(main.Session(), streaming=True).run()
+
+        asyncio.run(scenario())
+
+    def test_async_lookup_cancels_sub_agent_runs(self, monkeypatch):
+        """Test that cancelling lookup_products cancels its pending sub-agent calls"""
+        import asyncio
+        from types import SimpleNamespace
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products, lookup_cache
+
+        lookup_cache.clear()
+        started, cancelled = [], []
+
+        async def ainvoke(payload):
+            started.append(payload)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(payload)
+                raise
+
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: SimpleNamespace(ainvoke=ainvoke))
+
+        async def scenario():
+            task = asyncio.create_task(lookup_products.ainvoke({"products": ["combo uno", "combo dos"]}))
+            while len(started) < 2:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert len(cancelled) == 2
+
+
+class TestSQLiteSaver:
+    """Tests for the durable checkpointer"""
+
+    @staticmethod
+    def make_agent(scripted_llm, checkpointer):
+        from langchain.agents import create_agent
+        from agents.state import SalesQuoteState
+        model = scripted_llm(lambda messages: f"eco: {messages[-1].content}")
+        return create_agent(model=model, tools=[], state_schema=SalesQuoteState, checkpointer=checkpointer)
+
+    @staticmethod
+    def contents(agent, thread_id):
+        values = agent.get_state({"configurable": {"thread_id": thread_id}}).values
+        return [m.content for m in values.get("messages", [])]
+
+    def test_survives_restart(self, scripted_llm, tmp_path):
+        """Test that a conversation is restored from the database by a new saver"""
+        from agents.checkpointer import SQLiteSaver
+        config = {"configurable": {"thread_id": "t1"}}
+
+        saver = SQLiteSaver(tmp_path / "cp.sqlite")
+        self.make_agent(scripted_llm, saver).invoke({"messages": [("user", "hola")]}, config)
+        saver.close()
+
+        agent = self.make_agent(scripted_llm, SQLiteSaver(tmp_path / "cp.sqlite"))
+        assert self.contents(agent, "t1") == ["hola", "eco: hola"]
+        agent.invoke({"messages": [("user", "sigo")]}, config)
+        assert self.contents(agent, "t1") == ["hola", "eco: hola", "sigo", "eco: sigo"]
+
+    def test_prunes_old_turns(self, scripted_llm, tmp_path):
+        """Test that only the last turns' checkpoints are kept, without losing state"""
+        from agents.checkpointer import SQLiteSaver
+        saver = SQLiteSaver(tmp_path / "cp.sqlite", keep_turns=2)
+        agent = self.make_agent(scripted_llm, saver)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        for i in range(6):
+            agent.invoke({"messages": [("user", f"m{i}")]}, config)
+            if i == 1:
+                per_turn = saver.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] / 2
+
+        stored = saver.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        assert stored <= 2 * per_turn + 1, "Older turns should be pruned"
+        assert len(saver.storage["t1"][""]) == stored
+        assert len(self.contents(agent, "t1")) == 12, "The latest state keeps the whole conversation"
+
+        # Every stored checkpoint can still be loaded with all its values
+        for item in saver.list(config):
+            assert "messages" in item.checkpoint["channel_values"]
+
+    def test_prunes_sub_agent_namespaces(self, scripted_llm, tmp_path):
+        """Test that the checkpoints a sub-agent writes in its own namespace are pruned with their turn"""
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage
+        from langchain.tools import tool
+        from agents.checkpointer import SQLiteSaver
+
+        inner = create_agent(model=scripted_llm(["sub-agent answer"]), tools=[])
+
+        @tool
+        def lookup_products(products: list[str]) -> str:
+            """Look up products"""
+            return inner.invoke({"messages": [("user", products[0])]})["messages"][-1].content
+
+        def reply(messages):
+            if messages[-1].type == "tool":
+                return "listo"
+            return AIMessage(content="", tool_calls=[{"name": "lookup_products", "args": {"products": ["x"]}, "id": "1"}])
+
+        saver = SQLiteSaver(tmp_path / "cp.sqlite", keep_turns=2)
+        agent = create_agent(model=scripted_llm(reply), tools=[lookup_products], checkpointer=saver)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        def rows():
+            return {
+                table: saver.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("checkpoints", "writes", "blobs")
+            }
+
+        for i in range(6):
+            agent.invoke({"messages": [("user", f"m{i}")]}, config)
+            if i == 2:
+                after_three = rows()
+
+        namespaces = {row[0] for row in saver.conn.execute("SELECT DISTINCT checkpoint_ns FROM checkpoints")}
+        assert any(ns.startswith("tools:") for ns in namespaces), "The sub-agent should checkpoint in its own namespace"
+        assert len(namespaces) <= 1 + 2 * 2, "Only the sub-agent runs of the kept turns should remain"
+        assert rows() == after_three, "Rows across all namespaces should not grow with more turns"
+        assert set(saver.storage["t1"]) == namespaces
+        assert len(saver.blobs) == rows()["blobs"]
+
+    def test_rolled_back_turns_keep_resume_point(self, scripted_llm, tmp_path):
+        """Test that more failed turns than keep_turns do not prune the checkpoint they roll back to"""
+        from langchain.agents import create_agent
+        from agents.checkpointer import SQLiteSaver
+
+        def reply(messages):
+            if messages[-1].content == "falla":
+                raise RuntimeError("provider down")
+            return f"eco: {messages[-1].content}"
+
+        saver = SQLiteSaver(tmp_path / "cp.sqlite", keep_turns=2)
+        agent = create_agent(model=scripted_llm(reply), tools=[], checkpointer=saver)
+        config = {"configurable": {"thread_id": "t1"}}
+        agent.invoke({"messages": [("user", "hola")]}, config)
+        resume_from = agent.get_state(config).config["configurable"]["checkpoint_id"]
+
+        # Each failed turn is retried from the checkpoint before it, as the REPL and the server do
+        resume = {"configurable": {"thread_id": "t1", "checkpoint_id": resume_from}}
+        for _ in range(saver.keep_turns + 1):
+            with pytest.raises(RuntimeError):
+                agent.invoke({"messages": [("user", "falla")]}, resume)
+        agent.invoke({"messages": [("user", "sigo")]}, resume)
+
+        assert self.contents(agent, "t1") == ["hola", "eco: hola", "sigo", "eco: sigo"]
+        stored = {row[0] for row in saver.conn.execute("SELECT checkpoint_id FROM checkpoints WHERE checkpoint_ns = ''")}
+        assert resume_from in stored
+        assert stored == set(saver.storage["t1"][""]), "Checkpoints of the failed turns should be pruned"
+
+    def test_hot_thread_lru(self, scripted_llm, tmp_path):
+        """Test that at most max_hot_threads stay in memory and cold ones reload"""
+        from agents.checkpointer import SQLiteSaver
+        saver = SQLiteSaver(tmp_path / "cp.sqlite", max_hot_threads=2)
+        agent = self.make_agent(scripted_llm, saver)
+
+        for thread_id in ("a", "b", "c"):
+            agent.invoke({"messages": [("user", thread_id)]}, {"configurable": {"thread_id": thread_id}})
+
+        assert set(saver.storage) == {"b", "c"}
+        assert not any(key[0] == "a" for key in saver.blobs)
+        assert self.contents(agent, "a") == ["a", "eco: a"]
+        assert set(saver.storage) == {"a", "c"}
+        assert sorted(saver.thread_ids()) == ["a", "b", "c"]
+
+    def test_delete_thread(self, scripted_llm, tmp_path):
+        """Test that deleting a thread removes it from memory and the database"""
+        from agents.checkpointer import SQLiteSaver
+        saver = SQLiteSaver(tmp_path / "cp.sqlite")
+        agent = self.make_agent(scripted_llm, saver)
+        agent.invoke({"messages": [("user", "hola")]}, {"configurable": {"thread_id": "t1"}})
+
+        saver.delete_thread("t1")
+        assert saver.thread_ids() == []
+        assert self.contents(agent, "t1") == []
+
+    def test_get_checkpointer(self, tmp_path, monkeypatch):
+        """Test that CHECKPOINTER selects the implementation"""
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.checkpointer import SQLiteSaver, get_checkpointer
+        monkeypatch.setenv("CHECKPOINT_DB", str(tmp_path / "cp.sqlite"))
+        monkeypatch.setenv("CHECKPOINTER", "sqlite")
+        assert isinstance(get_checkpointer(), SQLiteSaver)
+        monkeypatch.setenv("CHECKPOINTER", "memory")
+        checkpointer = get_checkpointer()
+        assert isinstance(checkpointer, InMemorySaver) and not isinstance(checkpointer, SQLiteSaver)
+        monkeypatch.setenv("CHECKPOINTER", "redis")
+        with pytest.raises(ValueError):
+            get_checkpointer()
+
+
+class TestSessionRegistry:
+    """Tests for idle-session eviction and memory accounting"""
+
+    class Clock:
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    @staticmethod
+    def converse(agent, thread_id, *messages):
+        for message in messages:
+            agent.invoke({"messages": [("user", message)]}, {"configurable": {"thread_id": thread_id}})
+
+    def test_memory_by_thread(self, scripted_llm):
+        """Test that bytes are counted per thread and grow with the conversation"""
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.sessions import memory_by_thread
+        saver = InMemorySaver()
+        agent = TestSQLiteSaver.make_agent(scripted_llm, saver)
+
+        self.converse(agent, "a", "hola")
+        self.converse(agent, "b", "hola")
+        usage = memory_by_thread(saver)
+        assert set(usage) == {"a", "b"}
+        assert usage["a"] > 0
+
+        self.converse(agent, "a", "x" * 5000)
+        assert memory_by_thread(saver)["a"] > usage["a"] + 5000
+
+    def test_idle_ttl_releases_thread(self, scripted_llm):
+        """Test that threads idle past the TTL are deleted from an in-memory checkpointer"""
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.sessions import SessionRegistry
+        saver = InMemorySaver()
+        agent = TestSQLiteSaver.make_agent(scripted_llm, saver)
+        clock = self.Clock()
+        registry = SessionRegistry(saver, idle_ttl=60, clock=clock)
+
+        for thread_id in ("old", "new"):
+            with registry.active(thread_id):
+                self.converse(agent, thread_id, "hola")
+            clock.now += 45
+
+        assert registry.sweep() == ["old"]
+        assert "old" not in saver.storage and "new" in saver.storage
+        assert registry.usage()["threads"] == 1
+        assert registry.usage()["released"] == 1
+
+    def test_memory_cap_releases_least_recent_idle(self, scripted_llm):
+        """Test that the cap releases idle threads oldest first and never a busy one"""
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.sessions import SessionRegistry, memory_by_thread
+        saver = InMemorySaver()
+        agent = TestSQLiteSaver.make_agent(scripted_llm, saver)
+        clock = self.Clock()
+
+        for thread_id in ("busy", "a", "b", "c"):
+            self.converse(agent, thread_id, "hola")
+        per_thread = max(memory_by_thread(saver).values())
+        registry = SessionRegistry(saver, memory_cap=int(per_thread * 2.5), clock=clock)
+        for thread_id in ("busy", "a", "b", "c"):
+            registry.touch(thread_id)
+            clock.now += 1
+
+        with registry.active("busy"):
+            assert registry.sweep() == ["a", "b"]
+        assert set(saver.storage) == {"busy", "c"}
+        assert registry.usage()["bytes"] <= registry.memory_cap
+
+    def test_durable_threads_are_spilled(self, scripted_llm, tmp_path):
+        """Test that a released SQLite thread leaves memory but comes back on its next use"""
+        from agents.checkpointer import SQLiteSaver
+        from agents.sessions import SessionRegistry
+        saver = SQLiteSaver(tmp_path / "cp.sqlite")
+        agent = TestSQLiteSaver.make_agent(scripted_llm, saver)
+        clock = self.Clock()
+        registry = SessionRegistry(saver, idle_ttl=60, clock=clock)
+        assert registry.durable
+
+        with registry.active("t1"):
+            self.converse(agent, "t1", "hola")
+        clock.now += 120
+        assert registry.sweep() == ["t1"]
+        assert "t1" not in saver.storage
+        assert registry.usage()["threads_in_memory"] == 0
+
+        assert TestSQLiteSaver.contents(agent, "t1") == ["hola", "eco: hola"]
+
+    def test_reset_forgets_old_thread(self, scripted_llm):
+        """Test that starting a new quote frees the previous conversation"""
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.sessions import SessionRegistry
+        from main import Session
+        saver = InMemorySaver()
+        agent = TestSQLiteSaver.make_agent(scripted_llm, saver)
+
+        session = Session()
+        session.registry = SessionRegistry(saver)
+        old_thread = session.thread_id
+        with session.registry.active(old_thread):
+            self.converse(agent, old_thread, "hola")
+
+        session.reset()
+        assert old_thread not in saver.storage
+        assert session.registry.usage()["threads"] == 0
+
+
+class TestBackgroundSummarization:
+    """Tests for summarization after the reply"""
+
+    @staticmethod
+    def replies(messages):
+        text = messages[-1].content
+        return "RESUMEN" if "Context Extraction" in text else f"eco: {text[:20]}"
+
+    def make_agent(self, scripted_llm, **kwargs):
+        from langchain.agents import create_agent
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.summarization import BackgroundSummarizationMiddleware
+        model = scripted_llm(self.replies)
+        summarizer = BackgroundSummarizationMiddleware(model=model, trigger=("tokens", 40), keep=("messages", 1), **kwargs)
+        agent = create_agent(model=model, tools=[], checkpointer=InMemorySaver(), middleware=[summarizer])
+        return agent, summarizer
+
+    def test_summary_is_made_after_the_reply(self, scripted_llm):
+        """Test that the turn over the trigger is answered unsummarized and the next one starts compacted"""
+        from concurrent.futures import wait
+        agent, summarizer = self.make_agent(scripted_llm, hard_limit=10_000)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        result = agent.invoke({"messages": [("user", "necesito una sartén " * 20)]}, config)
+        assert not any("RESUMEN" in m.content for m in result["messages"])
+        assert "t1" in summarizer._jobs
+        wait([summarizer._jobs["t1"]])
+
+        result = agent.invoke({"messages": [("user", "sigo")]}, config)
+        contents = [m.content for m in result["messages"]]
+        assert "RESUMEN" in contents[0]
+        assert contents[-2:] == ["sigo", "eco: sigo"]
+        assert len(contents) == 4  # summary, last reply, this turn
+
+    def test_async_turns(self, scripted_llm):
+        """Test that async turns apply the background summary too"""
+        import asyncio
+        agent, summarizer = self.make_agent(scripted_llm, hard_limit=10_000)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def scenario():
+            await agent.ainvoke({"messages": [("user", "necesito una sartén " * 20)]}, config)
+            await asyncio.wrap_future(summarizer._jobs["t1"])
+            return await agent.ainvoke({"messages": [("user", "sigo")]}, config)
+
+        assert "RESUMEN" in asyncio.run(scenario())["messages"][0].content
+
+    def test_unclaimed_summaries_expire(self, scripted_llm):
+        """Test that a summary of a thread that never comes back is dropped after the TTL"""
+        from concurrent.futures import wait
+        now = [0.0]
+        agent, summarizer = self.make_agent(scripted_llm, hard_limit=10_000, summary_ttl=60, clock=lambda: now[0])
+
+        agent.invoke({"messages": [("user", "necesito una sartén " * 20)]}, {"configurable": {"thread_id": "t1"}})
+        wait([summarizer._jobs["t1"]])
+        agent.invoke({"messages": [("user", "hola")]}, {"configurable": {"thread_id": "t2"}})
+        assert "t1" in summarizer._jobs, "A summary within the TTL should wait for its thread"
+
+        now[0] += 120
+        agent.invoke({"messages": [("user", "hola")]}, {"configurable": {"thread_id": "t3"}})
+        assert "t1" not in summarizer._jobs
+
+    def test_inline_over_hard_limit(self, scripted_llm):
+        """Test that a conversation far over the limit is summarized before the model call"""
+        agent, summarizer = self.make_agent(scripted_llm, hard_limit=60)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        agent.invoke({"messages": [("user", "hola")]}, config)
+        result = agent.invoke({"messages": [("user", "necesito una sartén " * 20)]}, config)
+        assert "RESUMEN" in result["messages"][0].content
+
+
+class TestTokenCounting:
+    """Tests for the running token count of a conversation"""
+
+    class CountingCounter:
+        """Approximate token counter that records how many messages it was given"""
+
+        def __init__(self):
+            self.calls = []
+            self.counted = []
+
+        def __call__(self, messages):
+            from langchain_core.messages.utils import count_tokens_approximately
+            messages = list(messages)
+            self.calls.append(len(messages))
+            self.counted.extend(message.id for message in messages)
+            return count_tokens_approximately(messages)
+
+    def make_agent(self, scripted_llm, counter, trigger=10_000, hard_limit=20_000):
+        from langchain.agents import create_agent
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agents.summarization import BackgroundSummarizationMiddleware
+        model = scripted_llm(TestBackgroundSummarization.replies)
+        summarizer = BackgroundSummarizationMiddleware(
+            model=model, trigger=("tokens", trigger), keep=("messages", 1),
+            hard_limit=hard_limit, token_counter=counter
+        )
+        agent = create_agent(model=model, tools=[], checkpointer=InMemorySaver(), middleware=[summarizer])
+        return agent, summarizer
+
+    @staticmethod
+    def state(agent):
+        return agent.get_state({"configurable": {"thread_id": "t1"}}).values
+
+    def test_counts_each_message_once(self, scripted_llm):
+        """Test that every turn counts only its new messages and the total matches a full count"""
+        from langchain_core.messages.utils import count_tokens_approximately
+        counter = self.CountingCounter()
+        agent, _ = self.make_agent(scripted_llm, counter)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        for text in ("hola", "necesito una sartén", "y una olla de 20cm"):
+            agent.invoke({"messages": [("user", text)]}, config)
+
+        values = self.state(agent)
+        assert sum(counter.calls) == len(values["messages"]) == 6
+        assert values["token_count"] == count_tokens_approximately(values["messages"])
+
+    def test_corrected_after_summary(self, scripted_llm):
+        """Test that the count is recomputed for the compacted history"""
+        from concurrent.futures import wait
+        from langchain_core.messages.utils import count_tokens_approximately
+        agent, summarizer = self.make_agent(scripted_llm, self.CountingCounter(), trigger=40)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        agent.invoke({"messages": [("user", "necesito una sartén " * 20)]}, config)
+        wait([summarizer._jobs["t1"]])
+        agent.invoke({"messages": [("user", "sigo")]}, config)
+
+        values = self.state(agent)
+        assert "RESUMEN" in values["messages"][0].content
+        assert values["token_count"] == count_tokens_approximately(values["messages"])
+
+    def test_recounts_rewritten_history(self, scripted_llm):
+        """Test that a history changed behind the counter's back is counted from scratch"""
+        from langchain.messages import AIMessage, HumanMessage
+        counter = self.CountingCounter()
+        _, summarizer = self.make_agent(scripted_llm, counter)
+        messages = [HumanMessage("hola", id="1"), AIMessage("eco", id="2"), HumanMessage("chau", id="3")]
+
+        stale = {"messages": messages, "token_count": 999, "token_counted": 2, "token_mark": "x"}
+        assert summarizer._count_tokens(stale) == counter(messages)
+        shorter = {"messages": messages[:1], "token_count": 999, "token_counted": 3, "token_mark": "3"}
+        assert summarizer._count_tokens(shorter) == counter(messages[:1])
+
+    def test_per_turn_overhead_is_flat(self, scripted_llm):
+        """Test that each turn of a 200-turn conversation only counts its own new messages"""
+        counter = self.CountingCounter()
+        agent, _ = self.make_agent(scripted_llm, counter, trigger=10**9, hard_limit=10**9)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        counted = []
+        for turn in range(200):
+            calls = len(counter.calls)
+            agent.invoke({"messages": [("user", f"turno {turn}: necesito una sartén de 24cm")]}, config)
+            counted.append(sum(counter.calls[calls:]))
+
+        messages = self.state(agent)["messages"]
+        assert len(messages) == 400
+        assert set(counted) == {2}  # the new question and its reply, whatever the history length
+        assert counter.counted == [message.id for message in messages]  # each message once, in order
+
+
+class TestTurnStats:
+    """Tests for per-turn latency and token accounting"""
+
+    @staticmethod
+    def reply(text="", prompt=0, completion=0, **kwargs):
+        from langchain.messages import AIMessage
+        usage = {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+        return AIMessage(content=text, usage_metadata=usage, **kwargs)
+
+    @pytest.fixture
+    def lookup_agent(self, scripted_llm, monkeypatch):
+        """Coordinator calling the real lookup_products, backed by a scripted catalog agent"""
+        from langchain.agents import create_agent
+        from langgraph.checkpoint.memory import InMemorySaver
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products, lookup_cache
+
+        lookup_cache.clear()
+        catalog = create_agent(
+            model=scripted_llm(lambda messages: self.reply("Sin resultados", 30, 5)), tools=[], name="catalog_agent"
+        )
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: catalog)
+
+        call = {"name": "lookup_products", "args": {"products": ["zzqx uno", "zzqx dos"]}, "id": "c1"}
+        model = scripted_llm([self.reply(prompt=100, completion=20, tool_calls=[call]), self.reply("Listo", 200, 10)])
+        return create_agent(model=model, tools=[lookup_products], checkpointer=InMemorySaver(), name="coordinator")
+
+    def check(self, stats):
+        assert set(stats.llm) == {"coordinator", "catalog_agent"}
+        coordinator, catalog = stats.llm["coordinator"], stats.llm["catalog_agent"]
+        assert (coordinator.calls, coordinator.prompt_tokens, coordinator.completion_tokens) == (2, 300, 30)
+        assert (catalog.calls, catalog.prompt_tokens, catalog.completion_tokens) == (2, 60, 10)
+        assert stats.tools["lookup_products"].calls == 1
+        assert (stats.prompt_tokens, stats.completion_tokens) == (360, 40)
+        assert stats.wall_seconds >= stats.tools["lookup_products"].seconds > 0
+
+    def test_sync_turn(self, lookup_agent):
+        """Test that a turn's LLM calls are split by agent, including sub-agent runs on worker threads"""
+        import json
+        from loguru import logger
+        from agents.turn_stats import TurnStatsHandler
+
+        handler = TurnStatsHandler("t1")
+        config = {"configurable": {"thread_id": "t1"}, "callbacks": [handler]}
+        lookup_agent.invoke({"messages": [("user", "busca")]}, config)
+
+        logged = []
+        sink = logger.add(logged.append, format="{message}", level="INFO")
+        try:
+            stats = handler.finish()
+        finally:
+            logger.remove(sink)
+
+        self.check(stats)
+        record = json.loads(logged[0].split("Turn stats: ", 1)[1])
+        assert record["thread_id"] == "t1"
+        assert record["llm"]["catalog_agent"]["calls"] == 2
+
+    def test_async_turn(self, lookup_agent):
+        """Test that async turns are accounted the same way"""
+        import asyncio
+        from agents.turn_stats import TurnStatsHandler
+
+        handler = TurnStatsHandler("t1")
+        config = {"configurable": {"thread_id": "t1"}, "callbacks": [handler]}
+        asyncio.run(lookup_agent.ainvoke({"messages": [("user", "busca")]}, config))
+        self.check(handler.finish())
+
+    def test_repl_stats_command(self, lookup_agent, monkeypatch, capsys):
+        """Test that REPL turns are recorded and shown by /stats"""
+        import asyncio
+        import main
+
+        monkeypatch.setattr(main, "get_coordinator", lambda: lookup_agent)
+        session = main.Session()
+        repl = main.Repl(session, streaming=False)
+
+        main.handle_command("/stats", session)
+        assert "Todavía no hay turnos" in capsys.readouterr().out
+
+        async def scenario():
+            repl.coordinator_ready = asyncio.create_task(asyncio.sleep(0, result=lookup_agent))
+            await repl.run_turn("busca")
+
+        asyncio.run(scenario())
+        assert len(session.stats) == 1
+        self.check(session.stats.last)
+
+        capsys.readouterr()
+        main.handle_command("/stats", session)
+        output = capsys.readouterr().out
+        assert "LLM Coordinador: 2 llamada(s)" in output
+        assert "LLM Catálogo: 2 llamada(s)" in output
+        assert "lookup_products" in output
+        assert "Turnos: 1" in output
+
+
+class TestTracing:
+    """Tests for local span tracing"""
+
+    @pytest.fixture
+    def traced_turn(self, scripted_llm, monkeypatch, tmp_path):
+        """Run a coordinator turn whose lookup_products calls a catalog agent twice; return the spans"""
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage
+        from langgraph.checkpoint.memory import InMemorySaver
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products, lookup_cache
+        from agents.tracing import SpanTracer, load_spans
+
+        lookup_cache.clear()
+        catalog = create_agent(model=scripted_llm(lambda messages: "Sin resultados"), tools=[], name="catalog_agent")
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: catalog)
+        call = {"name": "lookup_products", "args": {"products": ["zzqx uno", "zzqx dos"]}, "id": "c1"}
+        agent = create_agent(
+            model=scripted_llm([AIMessage(content="", tool_calls=[call]), "Listo"]),
+            tools=[lookup_products], checkpointer=InMemorySaver(), name="coordinator"
+        )
+
+        tracer = SpanTracer(tmp_path / "spans.jsonl")
+        agent.invoke({"messages": [("user", "busca")]}, {"configurable": {"thread_id": "t1"}, "callbacks": [tracer]})
+        tracer.close()
+        return load_spans(tmp_path / "spans.jsonl")
+
+    def test_span_tree(self, traced_turn):
+        """Test that nodes, tools and nested agent runs are spans linked to their parents"""
+        spans = {span["span_id"]: span for span in traced_turn}
+
+        def path(span):
+            names = [span["name"]]
+            while span["parent_id"]:
+                span = spans[span["parent_id"]]
+                names.append(span["name"])
+            return " > ".join(reversed(names))
+
+        paths = sorted(path(span) for span in traced_turn)
+        assert paths.count("coordinator > tools > lookup_products > catalog_agent > model > ScriptedChatModel") == 2
+        assert paths.count("coordinator > model > ScriptedChatModel") == 2
+        assert "coordinator" in paths
+
+        root = next(span for span in traced_turn if span["parent_id"] is None)
+        assert (root["kind"], root["thread_id"], root["status"]) == ("agent", "t1", "ok")
+        assert {span["trace_id"] for span in traced_turn} == {root["span_id"]}
+        assert all(span["duration_ms"] <= root["duration_ms"] for span in traced_turn)
+
+    def test_chrome_trace(self, traced_turn):
+        """Test that the timeline export gives each agent run its own lane"""
+        from agents.tracing import to_chrome_trace
+        events = to_chrome_trace(traced_turn)["traceEvents"]
+
+        lanes = [event for event in events if event["ph"] == "M"]
+        assert sorted(lane["args"]["name"] for lane in lanes) == ["catalog_agent", "catalog_agent", "coordinator"]
+        complete = [event for event in events if event["ph"] == "X"]
+        assert len(complete) == len(traced_turn)
+        assert {event["cat"] for event in complete} == {"agent", "node", "tool", "llm"}
+
+    def test_tracing_off_by_default(self, monkeypatch):
+        """Test that no tracer is built unless SPAN_TRACE_FILE is set"""
+        from agents.tracing import get_tracer
+        monkeypatch.delenv("SPAN_TRACE_FILE", raising=False)
+        get_tracer.cache_clear()
+        try:
+            assert get_tracer() is None
+        finally:
+            get_tracer.cache_clear()
@@ -72,3 +72,65 @@ class TestEnvironmentVariables:
 
         if not (openai_configured or groq_configured):
             pytest.skip("No LLM provider configured - skipping LLM tests")
+
+
+class TestLazyInitialization:
+    """Tests that heavy providers and agents are only built on first use"""
+
+    # Modules that must not be imported until an agent is actually used
+    HEAVY_MODULES = ["langchain_openai", "langchain_groq", "langchain.agents", "dotenv"]
+
+    def _import_in_subprocess(self, project_root, modules):
+        """Import modules in a fresh interpreter; return (heavy modules loaded, get_llm calls)"""
+        import json
+        import subprocess
+        import sys
+
+        script = (
+            "import json, sys\n"
+            "import config\n"
+            "calls = []\n"
+            "build_llm = config.get_llm\n"
+            "config.get_llm = lambda: calls.append(1) or build_llm()\n"
+            f"for name in {modules!r}: __import__(name)\n"
+            f"print(json.dumps([[m for m in {self.HEAVY_MODULES!r} if m in sys.modules], len(calls)]))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=project_root / "src",
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_config_import_does_not_build_llm(self, project_root):
+        """Test that importing config does not import any provider"""
+        loaded, _ = self._import_in_subprocess(project_root, ["config"])
+        assert loaded == []
+
+    def test_agent_modules_are_lazy(self, project_root):
+        """Test that importing the agent modules does not build any agent"""
+        loaded, _ = self._import_in_subprocess(
+            project_root, ["agents.coordinator", "agents.catalog_agent", "agents.promotions_agent"]
+        )
+        assert loaded == []
+
+    def test_imports_do_not_call_get_llm(self, project_root):
+        """Test that importing the agents and the data layer never asks for the LLM"""
+        loaded, llm_calls = self._import_in_subprocess(
+            project_root, ["agents.coordinator", "agents.catalog_agent", "agents.tools.data_manager"]
+        )
+        assert loaded == []
+        assert llm_calls == 0
+
+    def test_get_llm_without_provider_raises(self, monkeypatch):
+        """Test that a missing provider is reported on first use, not at import"""
+        from config import get_llm, load_environment
+        load_environment()
+        for var in ["GROQ_API_KEY", "GROQ_LLM", "OPENAI_API_KEY", "OPENAI_LLM"]:
+            monkeypatch.delenv(var, raising=False)
+        get_llm.cache_clear()
+        with pytest.raises(RuntimeError):
+            get_llm()
+        get_llm.cache_clear()
@@ -0,0 +1,297 @@
+# tests/test_server.py
+"""
+Tests for the multi-session HTTP server, against a scripted chat model.
+"""
+
+import asyncio
+import json
+import pytest
+
+
+async def http(port: int, method: str, path: str, payload: dict = None):
+    """Send one request; return (status, body) with NDJSON bodies as a list of objects"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    if b"Transfer-Encoding: chunked" in head:
+        data = b""
+        while True:
+            size, _, rest = content.partition(b"\r\n")
+            size = int(size, 16)
+            if size == 0:
+                break
+            data, content = data + rest[:size], rest[size + 2:]
+        return status, [json.loads(line) for line in data.decode().splitlines()]
+    return status, json.loads(content)
+
+
+def echo_replies(messages):
+    """Reply with the last user message, so concurrent sessions get deterministic answers"""
+    return f"eco: {messages[-1].content}"
+
+
+@pytest.fixture
+def agent(scripted_llm):
+    from langchain.agents import create_agent
+    from langgraph.checkpoint.memory import InMemorySaver
+    return create_agent(model=scripted_llm(echo_replies), tools=[], checkpointer=InMemorySaver())
+
+
+def run_with_server(agent, scenario):
+    """Run scenario(server, port) against a server listening on a free port"""
+    from server import SalesAgentServer
+
+    async def main():
+        app = SalesAgentServer(agent)
+        server = await app.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await scenario(app, port)
+
+    return asyncio.run(main())
+
+
+class TestServerSessions:
+    """Tests for session endpoints"""
+
+    def test_create_and_message(self, agent):
+        """Test that a session answers messages and keeps its history"""
+        async def scenario(app, port):
+            status, created = await http(port, "POST", "/sessions")
+            assert status == 201
+            thread_id = created["thread_id"]
+
+            status, result = await http(port, "POST", f"/sessions/{thread_id}/messages", {"message": "hola"})
+            assert status == 200
+            assert result["reply"] == "eco: hola"
+            assert result["state"]["products"] is None
+
+            await http(port, "POST", f"/sessions/{thread_id}/messages", {"message": "chau"})
+            messages = agent.get_state({"configurable": {"thread_id": thread_id}}).values["messages"]
+            assert [m.content for m in messages] == ["hola", "eco: hola", "chau", "eco: chau"]
+
+            status, info = await http(port, "GET", f"/sessions/{thread_id}")
+            assert status == 200 and info["turns"] == 2
+
+            status, _ = await http(port, "DELETE", f"/sessions/{thread_id}")
+            assert status == 200
+            status, _ = await http(port, "GET", f"/sessions/{thread_id}")
+            assert status == 404
+
+        run_with_server(agent, scenario)
+
+    def test_errors(self, agent):
+        """Test error statuses for unknown sessions, bad bodies and unknown paths"""
+        async def scenario(app, port):
+            assert (await http(port, "POST", "/sessions/nope/messages", {"message": "x"}))[0] == 404
+            _, created = await http(port, "POST", "/sessions")
+            path = f"/sessions/{created['thread_id']}/messages"
+            assert (await http(port, "POST", path, {"text": "x"}))[0] == 400
+            assert (await http(port, "GET", path))[0] == 405
+            assert (await http(port, "GET", "/nothing"))[0] == 404
+            assert (await http(port, "GET", "/health"))[1]["sessions"] == 1
+            assert (await http(port, "POST", "/health"))[0] == 405
+            assert (await http(port, "DELETE", "/usage"))[0] == 405
+
+        run_with_server(agent, scenario)
+
+    def test_streaming(self, agent):
+        """Test that a streamed turn sends tokens, then the result"""
+        async def scenario(app, port):
+            _, created = await http(port, "POST", "/sessions")
+            status, events = await http(
+                port, "POST", f"/sessions/{created['thread_id']}/messages", {"message": "hola que tal", "stream": True}
+            )
+            assert status == 200
+            tokens = [e["text"] for e in events if e["type"] == "token"]
+            assert len(tokens) > 1
+            assert "".join(tokens) == "eco: hola que tal"
+            assert events[-1]["type"] == "result"
+            assert events[-1]["reply"] == "eco: hola que tal"
+
+        run_with_server(agent, scenario)
+
+    def test_failed_turn_is_rolled_back(self, scripted_llm):
+        """Test that a turn that fails leaves no trace in the session's thread"""
+        from langchain.agents import create_agent
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        def replies(messages):
+            if messages[-1].content == "boom":
+                raise RuntimeError("provider down")
+            return echo_replies(messages)
+
+        agent = create_agent(model=scripted_llm(replies), tools=[], checkpointer=InMemorySaver())
+
+        async def scenario(app, port):
+            _, created = await http(port, "POST", "/sessions")
+            path = f"/sessions/{created['thread_id']}/messages"
+            await http(port, "POST", path, {"message": "hola"})
+            status, error = await http(port, "POST", path, {"message": "boom"})
+            assert status == 500 and "provider down" in error["error"]
+            status, result = await http(port, "POST", path, {"message": "sigo"})
+            assert status == 200
+
+            messages = agent.get_state({"configurable": {"thread_id": created["thread_id"]}}).values["messages"]
+            assert [m.content for m in messages] == ["hola", "eco: hola", "sigo", "eco: sigo"]
+
+        run_with_server(agent, scenario)
+
+    def test_sessions_survive_restart(self, scripted_llm, tmp_path):
+        """Test that a new server reopens a session kept by the SQLite checkpointer"""
+        from langchain.agents import create_agent
+        from agents.checkpointer import SQLiteSaver
+
+        def make_agent():
+            return create_agent(model=scripted_llm(echo_replies), tools=[], checkpointer=SQLiteSaver(tmp_path / "cp.sqlite"))
+
+        async def first(app, port):
+            _, created = await http(port, "POST", "/sessions")
+            await http(port, "POST", f"/sessions/{created['thread_id']}/messages", {"message": "hola"})
+            app.agent.checkpointer.close()
+            return created["thread_id"]
+
+        thread_id = run_with_server(make_agent(), first)
+        agent = make_agent()
+
+        async def second(app, port):
+            status, info = await http(port, "GET", f"/sessions/{thread_id}")
+            assert status == 200 and info["turns"] == 1
+            status, result = await http(port, "POST", f"/sessions/{thread_id}/messages", {"message": "sigo"})
+            assert status == 200 and result["reply"] == "eco: sigo"
+            assert (await http(port, "GET", "/sessions/nope"))[0] == 404
+
+        run_with_server(agent, second)
+        messages = agent.get_state({"configurable": {"thread_id": thread_id}}).values["messages"]
+        assert [m.content for m in messages] == ["hola", "eco: hola", "sigo", "eco: sigo"]
+
+
+class TestServerConcurrency:
+    """Tests for concurrent sessions and per-session ordering"""
+
+    @pytest.fixture
+    def gated_agent(self, scripted_llm):
+        """Agent whose tool waits until `gate.expected` calls are in flight at once"""
+        from langchain.agents import create_agent
+        from langchain.messages import AIMessage, ToolMessage
+        from langchain.tools import tool
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        gate = {"expected": 0, "arrived": 0, "event": None, "order": [], "active": 0, "max_active": 0, "hold": 0}
+
+        @tool
+        async def wait_gate(text: str) -> str:
+            """Wait at the gate"""
+            gate["order"].append(text)
+            gate["arrived"] += 1
+            gate["active"] += 1
+            gate["max_active"] = max(gate["max_active"], gate["active"])
+            if gate["arrived"] >= gate["expected"]:
+                gate["event"].set()
+            await asyncio.wait_for(gate["event"].wait(), timeout=5)
+            await asyncio.sleep(gate["hold"])
+            gate["active"] -= 1
+            return text
+
+        def replies(messages):
+            last = messages[-1]
+            if isinstance(last, ToolMessage):
+                return f"listo: {last.content}"
+            return AIMessage(content="", tool_calls=[{"name": "wait_gate", "args": {"text": last.content}, "id": last.content}])
+
+        agent = create_agent(model=scripted_llm(replies), tools=[wait_gate], checkpointer=InMemorySaver())
+        return agent, gate
+
+    def test_sessions_run_concurrently(self, gated_agent):
+        """Test that turns of different sessions overlap (all must wait at the gate together)"""
+        agent, gate = gated_agent
+
+        async def scenario(app, port):
+            gate["expected"], gate["event"] = 3, asyncio.Event()
+            sessions = [(await http(port, "POST", "/sessions"))[1]["thread_id"] for _ in range(3)]
+            results = await asyncio.gather(*(
+                http(port, "POST", f"/sessions/{thread_id}/messages", {"message": f"m{i}"})
+                for i, thread_id in enumerate(sessions)
+            ))
+            assert [r[1]["reply"] for r in results] == ["listo: m0", "listo: m1", "listo: m2"]
+            assert gate["max_active"] == 3
+
+        run_with_server(agent, scenario)
+
+    def test_same_session_turns_are_ordered(self, gated_agent):
+        """Test that turns of one session run one at a time, in arrival order"""
+        agent, gate = gated_agent
+
+        async def scenario(app, port):
+            gate["expected"], gate["event"], gate["hold"] = 1, asyncio.Event(), 0.3
+            _, created = await http(port, "POST", "/sessions")
+            path = f"/sessions/{created['thread_id']}/messages"
+
+            first = asyncio.create_task(http(port, "POST", path, {"message": "primero"}))
+            await asyncio.sleep(0.05)
+            second = asyncio.create_task(http(port, "POST", path, {"message": "segundo"}))
+            results = await asyncio.gather(first, second)
+
+            assert [r[1]["reply"] for r in results] == ["listo: primero", "listo: segundo"]
+            assert gate["order"] == ["primero", "segundo"]
+            assert gate["max_active"] == 1, "The second turn must wait for the first"
+            messages = agent.get_state({"configurable": {"thread_id": created["thread_id"]}}).values["messages"]
+            assert [m.content for m in messages if m.type == "human"] == ["primero", "segundo"]
+
+        run_with_server(agent, scenario)
+
+    def test_delete_during_turn_conflicts(self, gated_agent):
+        """Test that a session cannot be closed while one of its turns is running"""
+        agent, gate = gated_agent
+
+        async def scenario(app, port):
+            gate["expected"], gate["event"] = 2, asyncio.Event()
+            _, created = await http(port, "POST", "/sessions")
+            thread_id = created["thread_id"]
+            turn = asyncio.create_task(http(port, "POST", f"/sessions/{thread_id}/messages", {"message": "hola"}))
+            while not gate["arrived"]:
+                await asyncio.sleep(0.01)
+
+            assert (await http(port, "DELETE", f"/sessions/{thread_id}"))[0] == 409
+            gate["event"].set()
+            assert (await turn)[1]["reply"] == "listo: hola"
+            assert (await http(port, "DELETE", f"/sessions/{thread_id}"))[0] == 200
+
+        run_with_server(agent, scenario)
+
+
+class TestServerMemory:
+    """Tests for idle-session release and usage reporting"""
+
+    def test_usage_and_idle_sessions_expire(self, agent):
+        """Test that /usage reports memory and that expired in-memory sessions are closed"""
+        from agents.sessions import SessionRegistry
+        now = [0.0]
+
+        async def scenario(app, port):
+            app._registry = SessionRegistry(agent.checkpointer, idle_ttl=60, clock=lambda: now[0])
+            thread_id = (await http(port, "POST", "/sessions"))[1]["thread_id"]
+            await http(port, "POST", f"/sessions/{thread_id}/messages", {"message": "hola"})
+
+            status, usage = await http(port, "GET", "/usage")
+            assert status == 200
+            assert usage["sessions"] == 1
+            assert usage["per_thread"][thread_id] > 0
+            assert usage["bytes"] >= usage["per_thread"][thread_id]
+
+            now[0] += 120
+            app.sweep_sessions()
+            assert (await http(port, "GET", f"/sessions/{thread_id}"))[0] == 404
+            status, usage = await http(port, "GET", "/usage")
+            assert usage["sessions"] == 0 and usage["bytes"] == 0
+
+        run_with_server(agent, scenario)
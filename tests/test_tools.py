@@ -53,6 +53,271 @@ class TestSearchCatalogTools:
         assert "not found" in result.lower(), "Should indicate product not found"
 
 
+class TestCatalogIndex:
+    """Tests for the inverted catalog index"""
+
+    def test_tokenize_folds_case_and_accents(self):
+        """Test that tokens are lowercased and accent-free"""
+        from agents.tools.catalog_index import tokenize
+        assert tokenize("Sartén TERRA") == ["sarten", "terra"]
+
+    def test_tokenize_splits_units(self):
+        """Test that sizes like 24CM are split into number and unit"""
+        from agents.tools.catalog_index import tokenize
+        assert tokenize("SARTEN 24CM") == ["sarten", "24", "cm"]
+        assert tokenize("FLIP 2.2") == ["flip", "2.2"]
+
+    def test_search_intersects_tokens(self):
+        """Test that every query token must match"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "SARTEN 18CM CAPRI", "CACEROLA 24CM TERRA"])
+        assert index.search("sartén 24") == [0]
+        assert index.search("24 cm") == [0, 2]
+        assert index.search("24cm") == [0, 2]
+        assert index.search("capri") == [0, 1]
+
+    def test_search_matches_prefixes(self):
+        """Test that partial words still find products"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "CACEROLA 24CM TERRA"])
+        assert index.search("cacer") == [1]
+
+    def test_search_no_results(self):
+        """Test that unknown or empty queries return nothing"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI"])
+        assert index.search("wok") == []
+        assert index.search("") == []
+
+    def test_rank_orders_by_relevance(self):
+        """Test that shorter, more specific descriptions rank first"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex([
+            "COMBO ESSEN+ REIN & SARTEN 24 CAPRI",
+            "SARTEN 24CM CAPRI",
+        ])
+        total, page = index.rank("sarten")
+        assert total == 2
+        assert page == [1, 0]
+
+    def test_exact_word_outranks_prefix_match(self):
+        """Test that a word matching the query exactly ranks above a rarer word it only starts"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex([
+            "TAPABOCAS X5", "VAPORIZADOR CON TAPA", "TAPA VIDRIO 24CM", "OLLA CON TAPA",
+            "SARTEN 24CM CAPRI", "SARTEN 18CM TERRA", "BIFERA CAPRI", "JARRA MEDIDORA", "ROBOT DE COCINA",
+        ])
+        total, page = index.rank("tapa")
+        assert total == 4
+        assert page[-1] == 0
+        assert index.rank("tapab")[1] == [0]
+
+    def test_rank_pages_results(self):
+        """Test that offset and limit select consecutive pages"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex([f"SARTEN {n}CM" for n in range(10)])
+        total, first = index.rank("sarten", limit=4)
+        _, second = index.rank("sarten", limit=4, offset=4)
+        _, last = index.rank("sarten", limit=4, offset=8)
+        assert total == 10
+        assert first == [0, 1, 2, 3]
+        assert second == [4, 5, 6, 7]
+        assert last == [8, 9]
+
+    def test_search_products_offset(self):
+        """Test that search_products reports how to get the next page"""
+        from agents.tools.search_catalog import search_products, PAGE_SIZE
+        from agents.tools.data_manager import data_manager
+        total, _ = data_manager.current().repository.index.rank("capri")
+        assert total > PAGE_SIZE, "Expected a broad query for this test"
+        result = search_products.invoke({"query": "capri"})
+        assert f"Use offset={PAGE_SIZE}" in result
+        result = search_products.invoke({"query": "capri", "offset": PAGE_SIZE})
+        assert f"Showing results {PAGE_SIZE + 1}-" in result
+
+    def test_similar_finds_misspelled_words(self):
+        """Test that trigram similarity resolves typos to indexed words"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "CACEROLA 24CM TERRA"])
+        assert "sarten" in index.similar("saten")
+        assert "cacerola" in index.similar("caserola")
+        assert index.similar("wok") == {}
+
+    def test_search_tolerates_typos(self):
+        """Test that a query with typos still finds the intended product"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "CACEROLA 24CM TERRA", "SARTEN 18CM TERRA"])
+        assert index.search("saten 24") == [0]
+        assert index.search("cacerola tera") == [1]
+
+    def test_exact_match_outranks_typo_match(self):
+        """Test that fuzzy matches only apply when nothing matches exactly"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["TAPA 24CM", "TAPITA 24CM"])
+        assert index.search("tapa") == [0]
+
+    def test_best_match_unambiguous(self):
+        """Test that a query fully describing one product resolves to it"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["COMBO REIN & SARTEN 24CM CAPRI", "SARTEN 24CM CAPRI", "ROBOT DE COCINA"])
+        assert index.best_match("sartén 24cm capri") == 1
+        assert index.best_match("robot") == 2
+
+    def test_best_match_ambiguous(self):
+        """Test that ambiguous or typo-corrected queries do not resolve"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "SARTEN 24CM TERRA"])
+        assert index.best_match("sarten 24cm") is None
+        assert index.best_match("saten 24cm capri") is None
+        assert index.best_match("") is None
+
+    def test_best_match_ignores_units(self):
+        """Test that unit tokens are not needed to resolve a product"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN 24CM CAPRI", "SARTEN 24CM TERRA", "SARTEN CHEF", "SARTEN CHEF TERRA"])
+        assert index.best_match("sarten 24 capri") == 0
+        assert index.best_match("sarten 24cm capri") == 0
+        assert index.best_match("sarten 24") is None
+
+    def test_variants_list_products_with_every_word(self):
+        """Test that variants are the other products containing all of the match's words"""
+        from agents.tools.catalog_index import CatalogIndex
+        index = CatalogIndex(["SARTEN CHEF", "SARTEN CHEF TERRA", "SARTEN CHEF AQUA", "SARTEN 24CM CAPRI"])
+        assert index.best_match("sarten chef") == 0
+        assert sorted(index.variants(0, "sarten chef")) == [1, 2]
+        assert index.variants(3, "sarten 24 capri") == []
+
+    def test_search_products_accent_insensitive(self):
+        """Test that search_products ignores accents in the query"""
+        from agents.tools.search_catalog import search_products
+        result = search_products.invoke({"query": "sartén 24"})
+        assert "SARTEN 24" in result
+
+
+class TestProductRepository:
+    """Tests for the shared product repository"""
+
+    def test_repository_joins_catalog_and_prices(self):
+        """Test that products carry their price list row"""
+        from agents.tools.product_repository import ProductRepository
+        repo = ProductRepository(
+            [{"id": "TEST001", "description": "Test Product"}],
+            {"TEST001": {"id": "TEST001", "base_price": "100000"}}
+        )
+        product = repo.get("TEST001")
+        assert product.description == "Test Product"
+        assert repo.price("TEST001", "base_price") == 10_000_000
+
+    def test_repository_unknown_id(self):
+        """Test that unknown IDs return None"""
+        from agents.tools.data_manager import data_manager
+        repository = data_manager.current().repository
+        assert repository.get("NONEXISTENT123") is None
+        assert "NONEXISTENT123" not in repository
+
+    def test_repository_get_many_keeps_request_order(self):
+        """Test batch lookups return one entry per requested ID, in order"""
+        from agents.tools.data_manager import data_manager
+        repository = data_manager.current().repository
+        first, second = repository.products[1].id, repository.products[0].id
+        result = repository.get_many([first, "NONEXISTENT123", second])
+        assert list(result) == [first, "NONEXISTENT123", second]
+        assert result[first].id == first
+        assert result["NONEXISTENT123"] is None
+
+    def test_repository_matches_catalog(self):
+        """Test that every catalog row is in the repository"""
+        from agents.tools.data_manager import data_manager
+        from agents.tools.product_repository import load_catalog
+        repository = data_manager.current().repository
+        assert len(repository) == len(load_catalog())
+
+    def test_parse_price_to_cents(self):
+        """Test that price strings are parsed once into integer cents"""
+        from agents.tools.product_repository import parse_price
+        assert parse_price("3400425") == 340_042_500
+        assert parse_price("1500,50") == 150_050
+        assert parse_price("435.094") == 43_509_400  # dot-grouped thousands
+        assert parse_price("2.500") == 250_000  # three digits after a dot are never decimals
+        assert parse_price("2.50") == 250
+        assert parse_price("") is None
+        assert parse_price(None) is None
+
+    def test_parse_price_rejects_garbage(self):
+        """Test that malformed prices raise ValueError"""
+        from agents.tools.product_repository import parse_price
+        with pytest.raises(ValueError):
+            parse_price("abc")
+        with pytest.raises(ValueError):
+            parse_price("-100")
+
+    def test_format_price(self):
+        """Test that cents are formatted back without float drift"""
+        from agents.tools.product_repository import format_price
+        assert format_price(340_042_500) == "3400425"
+        assert format_price(150_050) == "1500.50"
+        assert format_price(None) == "N/A"
+
+    def test_price_list_columns(self, sample_price):
+        """Test that the price list stores every column as cents"""
+        from agents.tools.product_repository import PriceList
+        price_list = PriceList({"TEST001": {**sample_price, "installments_6": "", "cash_price": "oops"}})
+        assert price_list.get("TEST001", "base_price") == 10_000_000
+        assert price_list.get("TEST001", "installments_12") == 1_000_000
+        assert price_list.get("TEST001", "installments_6") is None
+        assert price_list.get("TEST001", "cash_price") is None
+        assert price_list.get("NONEXISTENT123", "base_price") is None
+
+    def test_get_multiple_products(self):
+        """Test get_multiple_products reports found and missing products"""
+        from agents.tools.search_catalog import get_multiple_products
+        result = get_multiple_products.invoke({"product_ids": ["80010010", "NONEXISTENT123"]})
+        assert "Product ID: 80010010" in result
+        assert "Product with ID NONEXISTENT123 not found" in result
+
+
+class TestPricingMatrix:
+    """Tests for the multi-plan pricing engine"""
+
+    @pytest.fixture
+    def matrix(self, sample_price):
+        from agents.tools.product_repository import PriceList
+        from agents.tools.pricing import PricingMatrix
+        return PricingMatrix(PriceList({
+            "TEST001": sample_price,
+            "TEST002": {"id": "TEST002", "base_price": "50000", "cash_price": "0",
+                        "installments_12": "", "installments_9": "", "installments_6": ""}
+        }))
+
+    def test_plan_for(self):
+        """Test that payment methods map to the right pricing plan"""
+        from agents.tools.pricing import plan_for
+        assert plan_for("CASH") == "CASH"
+        assert plan_for("WIRE") == "CASH"
+        assert plan_for("CREDIT_CARD", 12) == "INSTALLMENTS_12"
+        assert plan_for("CREDIT_CARD", 12, "001") == "BASE"
+        assert plan_for("CREDIT_CARD", 3) == "BASE"
+        assert plan_for("CREDIT_CARD") == "BASE"
+
+    def test_unit_prices_resolve_fallbacks(self, matrix):
+        """Test that missing cash and installment prices fall back to base price"""
+        assert matrix.unit_price("TEST001", "CASH") == 9_500_000
+        assert matrix.unit_price("TEST001", "INSTALLMENTS_12") == 12 * 1_000_000
+        assert matrix.unit_price("TEST002", "CASH") == 5_000_000
+        assert matrix.unit_price("TEST002", "INSTALLMENTS_6") == 5_000_000
+        assert matrix.unit_price("NONEXISTENT123", "BASE") == 0
+
+    def test_cart_totals_for_every_plan(self, matrix):
+        """Test that a cart is priced for all plans at once"""
+        totals, missing = matrix.cart_totals({"TEST001": 2, "TEST002": 1, "NONEXISTENT123": 1})
+        assert missing == ["NONEXISTENT123"]
+        assert totals["CASH"] == 2 * 9_500_000 + 5_000_000
+        assert totals["BASE"] == 2 * 10_000_000 + 5_000_000
+        assert totals["INSTALLMENTS_9"] == 2 * 9 * 1_250_000 + 5_000_000
+        from agents.tools.pricing import PLANS
+        assert set(totals) == set(PLANS)
+
+
 class TestQueryPromotionsTools:
     """Tests for promotions query tools"""
 
@@ -116,6 +381,498 @@ class TestQueryPromotionsTools:
         assert "not found" in result.lower(), "Should indicate promotion not found"
 
 
+    def test_find_promotions_and_across_criteria(self):
+        """Test that find_promotions requires a bank AND a card AND an installment match"""
+        from agents.tools.query_promotions import find_promotions
+        matches = find_promotions(["GALICIA", "NACION"], ["VISA"], [12])
+        assert matches, "Should find promotions"
+        for match in matches:
+            promo = match.promotion
+            assert set(match.banks) <= {"GALICIA", "NACION"} and set(match.banks) & set(promo["banks"])
+            assert match.credit_cards == ["VISA"] and "VISA" in promo["credit_cards"]
+            assert match.installments == [12] and 12 in promo["installments"]
+
+    def test_find_promotions_card_alias(self):
+        """Test that card aliases (Mastercard) match the names used in the data (MASTER)"""
+        from agents.tools.query_promotions import find_promotions
+        by_alias = find_promotions(credit_cards=["Mastercard"])
+        by_name = find_promotions(credit_cards=["MASTER"])
+        assert by_alias, "Mastercard should match promotions"
+        assert [m.promotion["id"] for m in by_alias] == [m.promotion["id"] for m in by_name]
+        assert by_alias[0].credit_cards == ["Mastercard"], "Matches should report the requested value"
+
+    def test_find_promotions_no_match(self):
+        """Test that an unknown bank matches nothing"""
+        from agents.tools.query_promotions import find_promotions
+        assert find_promotions(["NONEXISTENT"], ["VISA"], [12]) == []
+
+    def test_format_promotion_matches(self):
+        """Test the compact one-line-per-promotion format"""
+        from agents.tools.query_promotions import find_promotions, format_promotion_matches
+        matches = find_promotions(["GALICIA"], ["VISA"], [12])
+        result = format_promotion_matches(matches, ["GALICIA"], ["VISA"], [12])
+        lines = result.splitlines()
+        assert lines[0].startswith(f"Found {len(matches)} available promotions")
+        assert len(lines) == len(matches) + 1
+        assert "GALICIA + VISA in 12 installments" in lines[1]
+        assert "No available promotions" in format_promotion_matches([], ["X"], None, None)
+
+    def test_format_promotion_matches_reimbursement_kinds(self, sample_promotion):
+        """Test that reimbursements given as text or as a dict both format"""
+        from agents.tools.query_promotions import PromotionMatch, format_promotion_matches
+        text = dict(sample_promotion, reimbursement="20% off, max $5000")
+        details = dict(sample_promotion, id="TEST002", reimbursement={"description": "10% back"})
+        matches = [PromotionMatch(promo, ["GALICIA"], ["VISA"], [12]) for promo in (text, details)]
+
+        lines = format_promotion_matches(matches, ["GALICIA"], ["VISA"], [12]).splitlines()
+        assert lines[1].endswith("Reimbursement: 20% off, max $5000")
+        assert lines[2].endswith("Reimbursement: 10% back")
+
+    def test_coordinator_get_available_promotions_is_local(self, monkeypatch):
+        """Test that the coordinator tool answers without the promotions agent"""
+        import agents.promotions_agent
+        from agents.tools.coordinator import get_available_promotions
+
+        def fail():
+            raise AssertionError("promotions agent should not be used")
+        monkeypatch.setattr(agents.promotions_agent, "get_promotions_agent", fail)
+
+        result = get_available_promotions.invoke({"banks": ["GALICIA"], "installments": [12], "credit_cards": ["VISA"]})
+        assert "PROMO001" in result
+
+
+class TestDataManager:
+    """Tests for hot reloading of the data files"""
+
+    @pytest.fixture
+    def data_files(self, tmp_path, sample_product, sample_price, sample_promotion):
+        import csv
+        import json
+        catalog_file = tmp_path / "catalog.csv"
+        price_file = tmp_path / "price_list.csv"
+        promotions_file = tmp_path / "promotions.json"
+        with open(catalog_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(sample_product))
+            writer.writeheader()
+            writer.writerow(sample_product)
+        with open(price_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(sample_price))
+            writer.writeheader()
+            writer.writerow(sample_price)
+        promotions_file.write_text(json.dumps([sample_promotion]), encoding="utf-8")
+        return catalog_file, price_file, promotions_file
+
+    def test_snapshot_contains_all_data(self, data_files):
+        """Test that a snapshot is built from all three files"""
+        from agents.tools.data_manager import DataManager
+        snapshot = DataManager(*data_files).current()
+        assert snapshot.repository.get("TEST001").description == "Test Product"
+        assert snapshot.pricing.unit_price("TEST001", "CASH") == 9_500_000
+        assert snapshot.promotion_index.get("TEST001") is not None
+
+    def test_reload_swaps_snapshot(self, data_files):
+        """Test that a changed file is picked up and the old snapshot stays intact"""
+        import os
+        from agents.tools.data_manager import DataManager
+        _, price_file, _ = data_files
+        manager = DataManager(*data_files)
+        old = manager.current()
+
+        assert not manager.reload_if_changed()
+
+        price_file.write_text(price_file.read_text().replace("95000", "90000"))
+        os.utime(price_file, ns=(0, 1))
+        assert manager.reload_if_changed()
+
+        assert manager.current().version != old.version
+        assert manager.current().pricing.unit_price("TEST001", "CASH") == 9_000_000
+        assert old.pricing.unit_price("TEST001", "CASH") == 9_500_000
+
+    def test_reload_ignores_touch(self, data_files):
+        """Test that a new mtime with the same content does not rebuild"""
+        import os
+        from agents.tools.data_manager import DataManager
+        manager = DataManager(*data_files)
+        os.utime(data_files[0], ns=(0, 1))
+        assert not manager.reload_if_changed()
+
+    def test_reload_keeps_old_data_on_broken_file(self, data_files):
+        """Test that an unreadable file does not replace good data"""
+        from agents.tools.data_manager import DataManager
+        _, _, promotions_file = data_files
+        manager = DataManager(*data_files)
+        old = manager.current()
+        promotions_file.write_text("[{broken", encoding="utf-8")
+        assert not manager.reload_if_changed()
+        assert manager.current() is old
+
+    def test_snapshot_file_round_trip(self, data_files, tmp_path):
+        """Test that a compiled snapshot is loaded instead of the source files"""
+        from agents.tools.data_manager import DataManager
+        from agents.tools.snapshot_file import write_snapshot
+        snapshot_file = tmp_path / "snapshot.bin"
+        built = DataManager(*data_files, snapshot_file=None).current()
+        write_snapshot(built, snapshot_file)
+
+        loaded = DataManager(*data_files, snapshot_file=snapshot_file).current()
+        assert loaded is not built
+        assert loaded.version == built.version
+        assert loaded.repository.get("TEST001") == built.repository.get("TEST001")
+        assert loaded.pricing.unit_price("TEST001", "CASH") == 9_500_000
+        assert loaded.repository.index.search("test") == [0]
+
+    def test_stale_snapshot_file_falls_back(self, data_files, tmp_path):
+        """Test that a snapshot of different sources is ignored"""
+        from agents.tools.snapshot_file import write_snapshot, read_snapshot
+        from agents.tools.data_manager import DataManager
+        snapshot_file = tmp_path / "snapshot.bin"
+        write_snapshot(DataManager(*data_files, snapshot_file=None).current(), snapshot_file)
+
+        _, price_file, _ = data_files
+        price_file.write_text(price_file.read_text().replace("95000", "90000"))
+        manager = DataManager(*data_files, snapshot_file=snapshot_file)
+        assert manager.current().pricing.unit_price("TEST001", "CASH") == 9_000_000
+        assert read_snapshot("0" * 16, snapshot_file) is None
+
+    def test_snapshot_file_rejects_other_indexing_code(self, data_files, tmp_path, monkeypatch):
+        """Test that a snapshot built by other parsing or indexing code is not loaded"""
+        import agents.tools.snapshot_file as snapshot_file_module
+        from agents.tools.data_manager import DataManager
+        from agents.tools.snapshot_file import read_snapshot, write_snapshot
+
+        snapshot_file = tmp_path / "snapshot.bin"
+        built = DataManager(*data_files, snapshot_file=None).current()
+        write_snapshot(built, snapshot_file)
+        assert read_snapshot(built.version, snapshot_file) is not None
+
+        monkeypatch.setattr(snapshot_file_module, "code_version", lambda: "f" * 16)
+        assert read_snapshot(built.version, snapshot_file) is None
+
+    def test_snapshot_is_opt_in(self, monkeypatch, tmp_path):
+        """Test that DATA_SNAPSHOT turns the snapshot file on"""
+        from agents.tools.snapshot_file import SNAPSHOT_FILE, snapshot_path
+        monkeypatch.delenv("DATA_SNAPSHOT", raising=False)
+        assert snapshot_path() is None
+        monkeypatch.setenv("DATA_SNAPSHOT", "1")
+        assert snapshot_path() == SNAPSHOT_FILE
+        monkeypatch.setenv("DATA_SNAPSHOT", str(tmp_path / "s.bin"))
+        assert snapshot_path() == tmp_path / "s.bin"
+
+    def test_corrupt_snapshot_file_is_ignored(self, tmp_path):
+        """Test that garbage in the snapshot file is not loaded"""
+        from agents.tools.snapshot_file import read_snapshot
+        snapshot_file = tmp_path / "snapshot.bin"
+        snapshot_file.write_bytes(b"not a snapshot at all, really not")
+        assert read_snapshot("0" * 16, snapshot_file) is None
+        assert read_snapshot("0" * 16, tmp_path / "missing.bin") is None
+
+
+class TestPromotionIndex:
+    """Tests for the promotion bitset index"""
+
+    @pytest.fixture
+    def index(self, sample_promotion):
+        from agents.tools.promotion_index import PromotionIndex
+        return PromotionIndex([
+            sample_promotion,
+            {**sample_promotion, "id": "TEST002", "banks": ["NACION"], "credit_cards": ["AMEX"], "installments": [18]},
+            {**sample_promotion, "id": "TEST003", "banks": ["galicia"], "credit_cards": ["CABAL"], "installments": [12]},
+        ])
+
+    def test_match_single_values(self, index):
+        """Test AND across bank, card and installments"""
+        ids = [p["id"] for p in index.select(index.match(["GALICIA"], ["VISA"], [12]))]
+        assert ids == ["TEST001"]
+
+    def test_match_multiple_values(self, index):
+        """Test OR within a criterion, case-insensitively"""
+        ids = [p["id"] for p in index.select(index.match(["Galicia", "NACION"], ["amex", "cabal"]))]
+        assert ids == ["TEST002", "TEST003"]
+
+    def test_match_no_criteria_returns_all(self, index):
+        """Test that no criteria matches every promotion"""
+        assert len(index.select(index.match())) == 3
+
+    def test_match_within_mask(self, index):
+        """Test that results are restricted to a given mask"""
+        assert index.select(index.match(["GALICIA"], within=index.mask_of("TEST003")))[0]["id"] == "TEST003"
+        assert index.match(["NACION"], within=0) == 0
+
+    def test_get_by_id(self, index):
+        """Test lookups by promotion ID"""
+        assert index.get("TEST002")["banks"] == ["NACION"]
+        assert index.get("NONEXISTENT123") is None
+
+    def test_availability_schedule_windows(self, sample_promotion):
+        """Test that the active mask follows date ranges, ends inclusive"""
+        from agents.tools.promotion_index import AvailabilitySchedule
+        schedule = AvailabilitySchedule([
+            sample_promotion,
+            {**sample_promotion, "availability": {"type": "date_range", "start": "2025-01-01", "end": "2025-01-31"}},
+            {**sample_promotion, "availability": {"type": "weekly", "days": ["TUESDAY"]}},
+        ])
+        assert schedule.active_mask(datetime(2024, 12, 31)) == 0b001
+        assert schedule.active_mask(datetime(2025, 1, 1)) == 0b011
+        assert schedule.active_mask(datetime(2025, 1, 31)) == 0b011
+        assert schedule.active_mask(datetime(2025, 1, 31, 0, 0, 1)) == 0b001
+        assert schedule.next_change(datetime(2024, 6, 1)) == datetime(2025, 1, 1)
+
+    def test_availability_schedule_caches_until_boundary(self, sample_promotion):
+        """Test that the active set is only recomputed when a boundary passes"""
+        from agents.tools.promotion_index import AvailabilitySchedule
+        schedule = AvailabilitySchedule([
+            {**sample_promotion, "availability": {"type": "date_range", "start": "2025-01-01", "end": "2025-01-31"}},
+        ])
+        calls = []
+        compute = schedule._compute
+        schedule._compute = lambda date: calls.append(date) or compute(date)
+        schedule.active_mask(datetime(2025, 1, 2))
+        schedule.active_mask(datetime(2025, 1, 20))
+        assert len(calls) == 1
+        assert schedule.active_mask(datetime(2025, 2, 2)) == 0
+        assert len(calls) == 2
+
+    def test_availability_schedule_invalid_dates(self, sample_promotion):
+        """Test that malformed windows make a promotion unavailable instead of failing"""
+        from agents.tools.promotion_index import AvailabilitySchedule
+        schedule = AvailabilitySchedule([{**sample_promotion, "availability": {"type": "date_range"}}])
+        assert schedule.active_mask() == 0
+
+    def test_search_promotions_multiple_banks(self):
+        """Test that search_promotions answers several banks in one call"""
+        from agents.tools.query_promotions import search_promotions
+        result = search_promotions.invoke({"banks": ["GALICIA", "MACRO"], "installments": [12]})
+        assert "PROMO001" in result and "PROMO002" in result
+
+
+    def test_card_aliases(self, sample_promotion):
+        """Test that card aliases and bank spelling are normalized on both sides"""
+        from agents.tools.promotion_index import PromotionIndex
+        index = PromotionIndex([dict(sample_promotion, credit_cards=["MASTER"], banks=["BCO_NEUQUEN"])])
+        assert index.match(credit_cards=["mastercard"]) == 1
+        assert index.match(banks=["bco neuquen"]) == 1
+        assert index.accepts(0, ["BCO NEUQUEN", "GALICIA"], ["Mastercard", "VISA"], [3, 24]) == (
+            ["BCO NEUQUEN"], ["Mastercard"], [3]
+        )
+
+
+class TestCoordinatorPricing:
+    """Tests for the coordinator's quote pricing"""
+
+    @pytest.fixture
+    def cart_state(self):
+        from agents.state import ProductLine
+        return {
+            "products": {
+                "38252430": ProductLine(product_id="38252430", description="SARTEN 24CM CAPRI", quantity=2)
+            },
+            "payment_method": "CASH"
+        }
+
+    def test_calculate_budget_in_cents(self, cart_state):
+        """Test that budget lines are priced in integer cents"""
+        from agents.tools.coordinator import _calculate_budget, _calculate_total
+        from agents.tools.data_manager import data_manager
+        repository = data_manager.current().repository
+        budget = _calculate_budget(cart_state)
+        cash_price = repository.price("38252430", "cash_price")
+        assert budget[0]["unit_price"] == cash_price
+        assert _calculate_total(budget) == 2 * cash_price
+
+    def test_compare_payment_options(self, cart_state):
+        """Test that every payment option is listed for the cart"""
+        from types import SimpleNamespace
+        from agents.tools.coordinator import compare_payment_options
+        result = compare_payment_options.func(runtime=SimpleNamespace(state=cart_state))
+        assert "Cash / Wire: $726.138" in result
+        assert "12 installments without promotion" in result
+
+    def test_compare_payment_options_empty_cart(self):
+        """Test that an empty cart is reported"""
+        from types import SimpleNamespace
+        from agents.tools.coordinator import compare_payment_options
+        result = compare_payment_options.func(runtime=SimpleNamespace(state={}))
+        assert "No products in cart" in result
+
+
+class TestLookupProducts:
+    """Tests for the coordinator's product lookup fast path"""
+
+    @pytest.fixture(autouse=True)
+    def empty_lookup_cache(self):
+        """Start every test with an empty sub-agent response cache"""
+        from agents.tools.coordinator import lookup_cache
+        lookup_cache.clear()
+        yield lookup_cache
+        lookup_cache.clear()
+
+    @pytest.fixture
+    def fake_catalog_agent(self, monkeypatch):
+        """Replace the catalog sub-agent and record what it is asked"""
+        from types import SimpleNamespace
+        import agents.tools.coordinator as coordinator_tools
+        calls = []
+
+        def invoke(payload):
+            calls.append(payload["messages"][0].content)
+            return {"messages": [SimpleNamespace(content="SUB-AGENT RESULT")]}
+
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: SimpleNamespace(invoke=invoke))
+        return calls
+
+    def test_unambiguous_lookups_skip_sub_agent(self, fake_catalog_agent):
+        """Test that exact matches are answered from the index"""
+        from agents.tools.coordinator import lookup_products
+        result = lookup_products.invoke({"products": ["sarten 24cm capri", "80010010"]})
+        assert fake_catalog_agent == []
+        assert "Product ID: 38252430" in result
+        assert "Product ID: 80010010" in result
+
+    def test_exact_match_lists_variants(self, fake_catalog_agent):
+        """Test that an exact match also names the products that extend it"""
+        from agents.tools.coordinator import lookup_products
+        result = lookup_products.invoke({"products": ["sarten chef"]})
+        assert fake_catalog_agent == []
+        assert "Other products containing all its words:" in result
+        assert "SARTEN CHEF TERRA" in result
+
+    def test_ambiguous_lookups_use_sub_agent(self, fake_catalog_agent):
+        """Test that only ambiguous queries are sent to the sub-agent"""
+        from agents.tools.coordinator import lookup_products
+        result = lookup_products.invoke({"products": ["sarten 24cm capri", "combo"]})
+        assert len(fake_catalog_agent) == 1
+        assert "- combo" in fake_catalog_agent[0]
+        assert "sarten 24cm capri" not in fake_catalog_agent[0]
+        assert "Product ID: 38252430" in result
+        assert "SUB-AGENT RESULT" in result
+
+    def test_ambiguous_lookups_run_concurrently(self, monkeypatch):
+        """Test that each ambiguous query gets its own concurrent sub-agent run, merged in order"""
+        import threading
+        from types import SimpleNamespace
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products
+
+        queries = ["combo uno", "combo dos", "combo tres"]
+        barrier = threading.Barrier(len(queries), timeout=5)
+
+        def invoke(payload):
+            # Every lookup must be in flight at once for the barrier to open
+            barrier.wait()
+            query = payload["messages"][0].content.split("- ", 1)[1].strip()
+            return {"messages": [SimpleNamespace(content=f"RESULT {query}")]}
+
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: SimpleNamespace(invoke=invoke))
+        result = lookup_products.invoke({"products": [queries[0], "80010010", *queries[1:]]})
+        sections = result.split("\n---\n")
+        assert sections[0] == "RESULT combo uno"
+        assert "Product ID: 80010010" in sections[1]
+        assert sections[2:] == ["RESULT combo dos", "RESULT combo tres"]
+
+    def test_failed_lookup_does_not_fail_others(self, monkeypatch):
+        """Test that one failing sub-agent run is reported without losing the rest"""
+        from types import SimpleNamespace
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products
+
+        def invoke(payload):
+            if "combo uno" in payload["messages"][0].content:
+                raise RuntimeError("rate limited")
+            return {"messages": [SimpleNamespace(content="OK")]}
+
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: SimpleNamespace(invoke=invoke))
+        result = lookup_products.invoke({"products": ["combo uno", "combo dos"]})
+        assert "Error looking up 'combo uno': rate limited" in result
+        assert result.endswith("OK")
+
+    def test_repeated_lookups_use_cache(self, fake_catalog_agent, empty_lookup_cache):
+        """Test that a normalized repeat of a query is answered from the cache"""
+        from agents.tools.coordinator import lookup_products
+        lookup_products.invoke({"products": ["Combo Sartén"]})
+        result = lookup_products.invoke({"products": ["  combo   sarten "]})
+        assert len(fake_catalog_agent) == 1
+        assert result == "SUB-AGENT RESULT"
+        assert empty_lookup_cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_duplicate_queries_run_once(self, fake_catalog_agent):
+        """Test that the same query twice in one call runs a single sub-agent lookup"""
+        from agents.tools.coordinator import lookup_products
+        result = lookup_products.invoke({"products": ["combo", "combo"]})
+        assert len(fake_catalog_agent) == 1
+        assert result == "SUB-AGENT RESULT\n---\nSUB-AGENT RESULT"
+
+    def test_normalized_duplicates_run_once(self, fake_catalog_agent):
+        """Test that spelling variants of one query share a lookup prompted with the first text"""
+        from agents.tools.coordinator import lookup_products
+        result = lookup_products.invoke({"products": ["Combo Sartén", "combo  sarten"]})
+        assert len(fake_catalog_agent) == 1
+        assert "- Combo Sartén" in fake_catalog_agent[0]
+        assert result == "SUB-AGENT RESULT\n---\nSUB-AGENT RESULT"
+
+    def test_failed_lookups_are_not_cached(self, monkeypatch, empty_lookup_cache):
+        """Test that errors are retried on the next call"""
+        from types import SimpleNamespace
+        import agents.tools.coordinator as coordinator_tools
+        from agents.tools.coordinator import lookup_products
+
+        def invoke(payload):
+            raise RuntimeError("timeout")
+
+        monkeypatch.setattr(coordinator_tools, "get_catalog_agent", lambda: SimpleNamespace(invoke=invoke))
+        lookup_products.invoke({"products": ["combo"]})
+        assert len(empty_lookup_cache) == 0
+
+
+class TestResponseCache:
+    """Tests for the sub-agent response cache"""
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        from agents.tools.response_cache import ResponseCache
+        now = [0.0]
+        cache = ResponseCache(ttl=10, clock=lambda: now[0])
+        cache.put("a", "v1", "A")
+        now[0] = 9.9
+        assert cache.get("a", "v1") == "A"
+        now[0] = 10.0
+        assert cache.get("a", "v1") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        from agents.tools.response_cache import ResponseCache
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", "v1", "A")
+        cache.put("b", "v1", "B")
+        cache.get("a", "v1")
+        cache.put("c", "v1", "C")
+        assert cache.get("b", "v1") is None
+        assert cache.get("a", "v1") == "A"
+        assert cache.get("c", "v1") == "C"
+
+    def test_snapshot_change_invalidates(self):
+        """Test that a new data snapshot version drops every entry"""
+        from agents.tools.response_cache import ResponseCache
+        cache = ResponseCache()
+        cache.put("a", "v1", "A")
+        assert cache.get("a", "v2") is None
+        assert len(cache) == 0
+        cache.put("a", "v2", "A2")
+        assert cache.get("a", "v2") == "A2"
+
+    def test_late_put_for_old_version_is_dropped(self):
+        """Test that an answer computed from a replaced snapshot cannot roll the cache back"""
+        from agents.tools.response_cache import ResponseCache
+        cache = ResponseCache()
+        cache.get("a", "v1")
+        cache.get("b", "v2")
+        cache.put("b", "v2", "B2")
+        cache.put("a", "v1", "A1")
+        assert cache.get("b", "v2") == "B2"
+        assert cache.get("a", "v1") is None
+        assert cache.get("b", "v2") == "B2"
+
+
 class TestStateSchema:
     """Tests for state schema definitions"""
 
@@ -156,3 +913,82 @@ class TestStateSchema:
         assert product.product_id == "TEST001"
         assert product.description == "Test Product"
         assert product.quantity == 2
+
+
+class TestCompactOutput:
+    """Tests for the compact table format of the catalog and promotion tools"""
+
+    @pytest.fixture
+    def compact(self, monkeypatch):
+        monkeypatch.setenv("TOOL_OUTPUT", "compact")
+
+    def test_table_hoists_shared_columns(self):
+        """Test that a column with one value on every row is written once above the table"""
+        from agents.tools.tool_output import table
+        output = table(["id", "cards", "inst"], [("001", ["VISA", "AMEX"], [3, 6]), ("002", ["VISA", "AMEX"], [12])])
+        assert output.splitlines() == ["cards=VISA,AMEX", "id\tinst", "001\t3,6", "002\t12"]
+
+    def test_table_sanitizes_cells(self):
+        """Test that tabs and newlines inside values cannot break the table"""
+        from agents.tools.tool_output import table
+        assert table(["id", "desc"], [("1", "a\tb\nc")]).splitlines() == ["id\tdesc", "1\ta b c"]
+
+    def test_table_keeps_empty_columns(self):
+        """Test that a column empty on every row is not hoisted as 'header='"""
+        from agents.tools.tool_output import table
+        output = table(["id", "reimb"], [("001", None), ("002", "")])
+        assert output.splitlines() == ["id\treimb", "001\t", "002\t"]
+
+    def test_verbose_is_default(self, monkeypatch):
+        """Test that tools keep the verbose format unless compact is selected"""
+        from agents.tools.search_catalog import search_products
+        monkeypatch.delenv("TOOL_OUTPUT", raising=False)
+        assert "Description:" in search_products.invoke({"query": "sarten"})
+
+    def test_search_products_compact(self, compact):
+        """Test that search results are one tab-separated row per product"""
+        from agents.tools.search_catalog import search_products
+        lines = search_products.invoke({"query": "sarten 24"}).splitlines()
+        assert lines[1] == "id\tdesc\tbase\tcash"
+        assert any(line.startswith("38252430\tSARTEN 24CM CAPRI\t") for line in lines)
+
+    def test_product_details_compact(self, compact):
+        """Test that product details keep every price column"""
+        from agents.tools.search_catalog import get_product_by_id, get_multiple_products
+        lines = get_product_by_id.invoke({"product_id": "38252430"}).splitlines()
+        assert lines[1:] == ["id\tdesc\tbase\tcash\t12x\t9x\t6x", "38252430\tSARTEN 24CM CAPRI\t504262\t363069\t63033\t75639\t96650"]
+
+        output = get_multiple_products.invoke({"product_ids": ["38252430", "00000000"]})
+        assert output.endswith("Not found: 00000000")
+
+    def test_same_as_base_marker_is_shared(self, compact):
+        """Test that search and details mark a missing cash price the same way"""
+        from agents.tools.search_catalog import search_products, get_product_by_id
+        from agents.tools.tool_output import SAME_AS_BASE
+        search = search_products.invoke({"query": "combo essen rein"}).splitlines()
+        details = get_product_by_id.invoke({"product_id": "80010010"}).splitlines()
+        assert search[1] == f"cash={SAME_AS_BASE}"
+        assert details[2].split("\t")[3] == SAME_AS_BASE
+
+    def test_promotions_compact(self, compact):
+        """Test that promotion tools answer with tables"""
+        from agents.tools.query_promotions import search_promotions, list_all_promotions
+        lines = search_promotions.invoke({"banks": ["GALICIA"]}).splitlines()
+        assert lines[1] == "id\tname\tbanks\tcards\tinst\twallets\treimb"
+        assert lines[2].startswith("001\tPROMO001\tGALICIA\t")
+        assert list_all_promotions.invoke({}).splitlines()[1] == "id\tname\tbanks"
+
+    def test_compact_is_smaller(self, monkeypatch):
+        """Test that the compact format is at most about half the size of the verbose one"""
+        from agents.tools.search_catalog import search_products, get_multiple_products
+        from agents.tools.query_promotions import search_promotions
+        calls = [
+            (search_products, {"query": "sarten"}),
+            (get_multiple_products, {"product_ids": ["80010010", "38252430", "38252830"]}),
+            (search_promotions, {}),
+        ]
+        for tool, args in calls:
+            monkeypatch.setenv("TOOL_OUTPUT", "verbose")
+            verbose = tool.invoke(args)
+            monkeypatch.setenv("TOOL_OUTPUT", "compact")
+            assert len(tool.invoke(args)) < 0.55 * len(verbose), tool.name